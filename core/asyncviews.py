@@ -0,0 +1,93 @@
+"""
+Async (ASGI) support for DRF views.
+
+DRF's ``APIView.dispatch`` is synchronous, so ``AsyncAPIView`` re-implements it
+as a coroutine: authentication and permission checks run on a worker thread,
+async handlers are awaited, and sync handlers are still allowed.
+Under WSGI Django adapts these views with ``async_to_sync`` automatically.
+
+Django's async ORM runs every query through ``sync_to_async`` on a single
+thread per process, so awaiting several of them with ``asyncio.gather`` still
+runs them one after another, and under uvicorn every request's queries queue
+on that same thread. ``gather_queries`` and ``run_sync`` instead give each
+query its own worker thread and database connection, so independent queries
+of one request, and queries of concurrent requests, really run in parallel.
+"""
+import asyncio
+from django.db import close_old_connections, connection
+from rest_framework.views import APIView
+from asgiref.sync import sync_to_async, iscoroutinefunction
+
+
+def _on_own_connection(query):
+    def run():
+        try:
+            return query()
+        finally:
+            # The worker thread's connection is closed, or handed back to the
+            # pool, like a request's connection at the end of the request.
+            close_old_connections()
+    return run
+
+
+async def gather_queries(*queries):
+    """
+    Runs independent zero-argument query callables concurrently and returns
+    their results in order. Inside a transaction (including ATOMIC_REQUESTS
+    and TestCase) they run one by one on the request's connection instead, as
+    other connections could not see its uncommitted rows.
+    """
+    if await sync_to_async(lambda: connection.in_atomic_block)():
+        return [await sync_to_async(query)() for query in queries]
+    return await asyncio.gather(*(
+        sync_to_async(_on_own_connection(query), thread_sensitive=False)() for query in queries
+    ))
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Runs one sync callable (ORM work, auth, cache calls) like ``gather_queries``.
+    """
+    return (await gather_queries(lambda: func(*args, **kwargs)))[0]
+
+
+class AsyncAPIView(APIView):
+    """
+    ``APIView`` whose dispatch is a coroutine. Handlers may be ``async def``
+    or plain methods, which are run with ``run_sync``.
+    """
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await run_sync(self.initial, request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await run_sync(handler, request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncListMixin:
+    """
+    Async ``list()`` for generic views: the page is fetched and serialized on
+    a worker thread while the event loop serves other requests.
+    """
+    async def alist(self, request, *args, **kwargs):
+        return await run_sync(self.list, request, *args, **kwargs)
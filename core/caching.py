@@ -0,0 +1,181 @@
+"""
+Per-user response cache for read-heavy endpoints.
+
+Cached bodies are keyed by view, viewer and URL, plus the current *generation*
+of every data scope the view reads ('crops', 'users'). Writes bump the
+generations of the scopes they touch, so an entry built from old data is
+never read again; it simply expires.
+
+Generations are ``time.time_ns()`` stamps rather than counters, so a later
+generation always compares greater, even across workers sharing a backend.
+The backend is whatever ``CACHES['default']`` names: local memory for a single
+process, or the database/file backends when several workers must agree.
+
+The same generations double as HTTP validators: ``conditional`` turns them into
+an ETag and Last-Modified and answers revalidations with 304 Not Modified
+without touching the database. Only the ETag can answer one: Last-Modified has
+one-second resolution, so two writes within a second would share it.
+"""
+import time
+import hashlib
+from functools import wraps
+from django.conf import settings
+from core.asyncviews import run_sync
+from asgiref.sync import iscoroutinefunction
+from django.db import transaction
+from django.core.cache import cache
+from django.utils.http import http_date
+from rest_framework.response import Response
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+PREFIX = 'rc'
+SCOPES = ('crops', 'users')
+
+
+def _generation_key(scope):
+    return f'{PREFIX}:gen:{scope}'
+
+
+def generations(scopes):
+    """
+    Returns the current generation of each scope, starting one if missing.
+    """
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return tuple(found[key] for key in keys)
+
+
+def invalidate(*scopes):
+    """
+    Starts a new generation for ``scopes`` now and again when the current
+    transaction commits, so a reader that cached uncommitted-state results
+    in between cannot keep serving them.
+    """
+    def bump():
+        cache.set_many({_generation_key(scope): time.time_ns() for scope in scopes}, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def _count(name):
+    key = f'{PREFIX}:stats:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def stats():
+    """
+    Hit/miss counters since the last reset, shared by every worker using the backend.
+    """
+    counts = cache.get_many([f'{PREFIX}:stats:hits', f'{PREFIX}:stats:misses'])
+    hits = counts.get(f'{PREFIX}:stats:hits', 0)
+    misses = counts.get(f'{PREFIX}:stats:misses', 0)
+    return {'hits': hits, 'misses': misses, 'hit_ratio': hits / (hits + misses) if hits + misses else 0.0}
+
+
+def reset_stats():
+    cache.delete_many([f'{PREFIX}:stats:hits', f'{PREFIX}:stats:misses'])
+
+
+def _viewer(request, shared_by_role):
+    user = request.user
+    return f'role:{user.role}' if shared_by_role and user.role == 'admin' else f'user:{user.pk}'
+
+
+def _view_name(view):
+    return f'{view.__class__.__module__}.{view.__class__.__name__}'
+
+
+def response_key(view, request, scopes, shared_by_role=False):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    stamp = '.'.join(str(generation) for generation in generations(scopes))
+    return f'{PREFIX}:resp:{_view_name(view)}:{_viewer(request, shared_by_role)}:{stamp}:{url}'
+
+
+def _wrap(method, before, after):
+    """
+    Builds a sync or async view-method wrapper around ``before(view, request)``,
+    which may return a response to send instead of calling the method, and
+    ``after(response, state)``. Cache calls run in a worker thread for async
+    methods, since the database and file backends are synchronous.
+    """
+    if iscoroutinefunction(method):
+        @wraps(method)
+        async def async_wrapper(view, request, *args, **kwargs):
+            early, state = await run_sync(before, view, request)
+            response = early or await method(view, request, *args, **kwargs)
+            return await run_sync(after, response, state)
+        return async_wrapper
+
+    @wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        early, state = before(view, request)
+        response = early or method(view, request, *args, **kwargs)
+        return after(response, state)
+    return wrapper
+
+
+def cached_response(*scopes, shared_by_role=False):
+    """
+    Caches a view method's successful response data per viewer.
+    - ``scopes``: data the response is built from; writes to them invalidate it
+    - ``shared_by_role``: admins see the same data, so share one entry between them
+    Only the data is cached, so content negotiation still runs on every hit.
+    """
+    for scope in scopes:
+        if scope not in SCOPES:
+            raise ValueError(f'Unknown cache scope {scope!r}.')
+
+    def before(view, request):
+        key = response_key(view, request, scopes, shared_by_role)
+        data = cache.get(key)
+        if data is not None:
+            _count('hits')
+            return Response(data, headers={'X-Cache': 'HIT'}), None
+        _count('misses')
+        return None, key
+
+    def after(response, key):
+        if key and response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+        return response
+
+    return lambda method: _wrap(method, before, after)
+
+
+def conditional(*scopes, shared_by_role=False):
+    """
+    Adds ETag/Last-Modified validators to a view method's responses and returns
+    304 Not Modified for a matching If-None-Match before the method (and its
+    queries) runs. If-Modified-Since alone never gets a 304: a write later in
+    the same second leaves Last-Modified unchanged.
+    """
+    def before(view, request):
+        current = generations(scopes)
+        parts = (_view_name(view), _viewer(request, shared_by_role), request.build_absolute_uri(),
+                 request.META.get('HTTP_ACCEPT', ''), *current)
+        etag = '"%s"' % hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+        last_modified = max(current) // 10 ** 9
+        return get_conditional_response(request, etag=etag), (etag, last_modified)
+
+    def after(response, validators):
+        if response.status_code not in (200, 304):
+            return response
+        etag, last_modified = validators
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Clients may keep the body but must revalidate it on every use.
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    return lambda method: _wrap(method, before, after)
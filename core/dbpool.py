@@ -0,0 +1,76 @@
+"""
+PostgreSQL connection pooling helpers.
+
+With ``DB_POOL`` enabled Django keeps one psycopg ``ConnectionPool`` per
+process and database alias (``OPTIONS['pool']``). A request, or an async
+view's worker thread, borrows a connection when it first queries and hands it
+back when Django closes it at the end of the request (or ``run_sync`` job),
+so no request pays for connection setup and a gunicorn/uvicorn worker never
+holds more than ``DB_POOL_MAX_SIZE`` connections.
+
+Imported by settings, so Django's database layer is only imported lazily.
+"""
+
+
+def check_connection(connection):
+    """
+    Pool health check, run on every connection handed out: one empty
+    round trip that discards connections the server or a proxy has closed.
+    """
+    from psycopg_pool import ConnectionPool
+
+    ConnectionPool.check_connection(connection)
+
+
+def pool_options(environ):
+    """
+    ``OPTIONS['pool']`` built from DB_POOL_* environment variables, or None
+    when pooling is disabled.
+    """
+    if environ.get('DB_POOL', 'True').lower() not in ('true', '1'):
+        return None
+    options = {
+        'min_size': int(environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(environ.get('DB_POOL_MAX_SIZE', 10)),
+        # Seconds a request waits for a free connection before failing.
+        'timeout': float(environ.get('DB_POOL_TIMEOUT', 10)),
+        # Connections idle this long are closed, down to min_size.
+        'max_idle': float(environ.get('DB_POOL_MAX_IDLE', 300)),
+        # Connections are replaced after this long, spreading reconnections.
+        'max_lifetime': float(environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+    }
+    if environ.get('DB_POOL_CHECK', 'True').lower() in ('true', '1'):
+        options['check'] = check_connection
+    return options
+
+
+def pool_stats():
+    """
+    Per database alias: pool size, connections in use and idle, waiting
+    requests and cumulative wait time. Aliases without a pool are skipped.
+    """
+    from django.db import connections
+
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is None:
+            continue
+        raw = pool.get_stats()
+        size, idle = raw.get('pool_size', 0), raw.get('pool_available', 0)
+        stats[alias] = {
+            'min_size': raw.get('pool_min', pool.min_size),
+            'max_size': raw.get('pool_max', pool.max_size),
+            'size': size,
+            'in_use': size - idle,
+            'idle': idle,
+            'waiting': raw.get('requests_waiting', 0),
+            'requests': raw.get('requests_num', 0),
+            'requests_queued': raw.get('requests_queued', 0),
+            'wait_ms_total': raw.get('requests_wait_ms', 0),
+            'timeouts': raw.get('requests_errors', 0),
+            'connections_opened': raw.get('connections_num', 0),
+            'connections_lost': raw.get('connections_lost', 0),
+            'returned_bad': raw.get('returns_bad', 0),
+        }
+    return stats
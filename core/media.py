@@ -0,0 +1,115 @@
+"""
+Serves user-uploaded media (profile icons) in production.
+
+- Content-hashed names (see users/images.py) never change content, so they are
+  sent with a one-year ``immutable`` Cache-Control; other files get
+  ``MEDIA_CACHE_MAX_AGE``.
+- ETag/Last-Modified validators answer revalidations with 304.
+- Single ``Range`` requests get 206 Partial Content (honouring ``If-Range``).
+- With ``MEDIA_ACCEL_REDIRECT`` set, the response only carries the headers and
+  an ``X-Accel-Redirect`` to that nginx internal location, so nginx streams the
+  bytes and the worker is freed immediately.
+"""
+import os
+import re
+import mimetypes
+from django.conf import settings
+from django.utils._os import safe_join
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+
+CONTENT_HASHED = re.compile(r'^[0-9a-f]{64}(_\d+)?\.\w+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+CHUNK_SIZE = 64 * 1024
+
+
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Media file not found.')
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('Media file not found.')
+    if not os.path.isfile(full_path):
+        raise Http404('Media file not found.')
+
+    size, last_modified = stat.st_size, int(stat.st_mtime)
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = requested_range(request, size, etag, last_modified)
+        if byte_range == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        response = file_response(path, full_path, size, byte_range)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if CONTENT_HASHED.match(os.path.basename(path)):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
+
+
+def requested_range(request, size, etag, last_modified):
+    """
+    Returns (start, end) inclusive for a satisfiable single-range request,
+    'unsatisfiable', or None to send the whole file.
+    """
+    header = request.META.get('HTTP_RANGE', '')
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        return None  # The client's copy is outdated: send the current file.
+
+    first, last = match.groups()
+    if first == '':
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def file_response(path, full_path, size, byte_range):
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    if settings.MEDIA_ACCEL_REDIRECT:
+        # nginx serves the bytes (and the Range) itself.
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT.rstrip('/') + '/' + path
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(full_path, 'rb'), content_type=content_type)
+
+    start, end = byte_range
+    response = StreamingHttpResponse(read_range(full_path, start, end), status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    return response
+
+
+def read_range(full_path, start, end):
+    with open(full_path, 'rb') as handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,363 @@
+"""
+Per-request performance instrumentation.
+
+``InstrumentationMiddleware`` times every request and, through a database
+execute wrapper, counts its queries and the time spent in them, including
+queries run on async views' worker threads (the collector travels in a
+context variable). Rendering (JSON encoding) is timed separately; what is left
+of the view's time is application code such as serializers.
+
+- Admins get the breakdown as a ``Server-Timing`` header (browser dev tools
+  show it next to the request).
+- Each worker aggregates latency histograms and totals per URL name and
+  method, and every ``METRICS_FLUSH_INTERVAL`` seconds writes a snapshot to the
+  shared Django cache. ``/metrics`` sums every live worker's snapshot into the
+  Prometheus text format, so it works behind gunicorn with several workers
+  (given a shared ``CACHES['default']``).
+
+Streaming responses (exports) are timed until the body starts streaming.
+"""
+import os
+import time
+import bisect
+import threading
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.db import connections
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.db.backends.signals import connection_created
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+# Latency histogram bucket bounds, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WORKERS_KEY = 'metrics:workers'
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_time = None
+        self.render_started = None
+        self.render_time = 0.0
+        self.lock = threading.Lock()
+
+    def add_query(self, elapsed):
+        # gather_queries may run several queries of one request at once.
+        with self.lock:
+            self.queries += 1
+            self.db_time += elapsed
+
+
+class LatencyAverage:
+    """
+    Exponentially weighted moving average of this worker's query times, used
+    by core.throttling to detect an overloaded database. Reads 0 once no
+    query has finished for ``stale_after`` seconds.
+    """
+    def __init__(self, weight=0.05, stale_after=10.0):
+        self.weight = weight
+        self.stale_after = stale_after
+        self.value = 0.0
+        self.updated = None
+
+    def observe(self, seconds):
+        # Unlocked: concurrent updates can only drop a sample.
+        self.value = seconds if self.updated is None else self.value + self.weight * (seconds - self.value)
+        self.updated = time.monotonic()
+
+    def current(self):
+        if self.updated is None or time.monotonic() - self.updated > self.stale_after:
+            return 0.0
+        return self.value
+
+    def reset(self):
+        self.value, self.updated = 0.0, None
+
+
+db_latency = LatencyAverage()
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.add_query(elapsed)
+        db_latency.observe(elapsed)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Wrappers live on the per-thread DatabaseWrapper and survive reconnects.
+    # Inserted outermost: connection.execute_wrapper() blocks active right now
+    # pop the last entry when they exit.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def install_on_open_connections():
+    # Connections opened before this module was imported sent no signal.
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(None, connection)
+
+
+class Registry:
+    """
+    This worker's aggregates, keyed by (view, method).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.flushed_at = 0.0
+
+    def observe(self, view, method, status, metrics, duration):
+        with self.lock:
+            entry = self.views.get((view, method))
+            if entry is None:
+                entry = self.views[(view, method)] = {
+                    'count': 0, 'seconds': 0.0, 'buckets': [0] * (len(BUCKETS) + 1),
+                    'queries': 0, 'db_seconds': 0.0, 'render_seconds': 0.0, 'statuses': {},
+                }
+            entry['count'] += 1
+            entry['seconds'] += duration
+            entry['buckets'][bisect.bisect_left(BUCKETS, duration)] += 1
+            entry['queries'] += metrics.queries
+            entry['db_seconds'] += metrics.db_time
+            entry['render_seconds'] += metrics.render_time
+            entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            views = [
+                {'view': view, 'method': method, **entry, 'buckets': list(entry['buckets']), 'statuses': dict(entry['statuses'])}
+                for (view, method), entry in self.views.items()
+            ]
+        return {'views': views, 'gauges': worker_gauges()}
+
+    def flush(self, force=False):
+        """
+        Publishes this worker's snapshot to the shared cache, at most every
+        METRICS_FLUSH_INTERVAL seconds unless forced.
+        """
+        now = time.monotonic()
+        if not force and now - self.flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.flushed_at = now
+        key = f'metrics:worker:{os.getpid()}'
+        cache.set(key, self.snapshot(), timeout=settings.METRICS_WORKER_TTL)
+        workers = cache.get(WORKERS_KEY) or []
+        if key not in workers:
+            cache.set(WORKERS_KEY, [*workers, key], timeout=None)
+
+
+registry = Registry()
+
+
+def worker_gauges():
+    """
+    Per-process state of the other subsystems: (name, labels, value, help).
+    Values of every worker are summed, except *_max which takes the maximum.
+    """
+    from core import throttling
+    from core.dbpool import pool_stats
+    from users import hashers
+    from users.revocation import revocations
+    from users.authentication import user_cache
+
+    gauges = [
+        ('auth_user_cache_hits_total', {}, user_cache.hits, 'User rows served from the in-process cache.'),
+        ('auth_user_cache_misses_total', {}, user_cache.misses, 'User rows loaded from the database.'),
+    ]
+    for name, value in revocations.stats.items():
+        gauges.append((f'token_revocation_{name}_total', {}, value, 'Token revocation list activity.'))
+    for name, value in hashers.stats().items():
+        gauges.append((f'password_hashing_{name}', {}, value, 'Password hashing pool.'))
+    for alias, stats in pool_stats().items():
+        for name, value in stats.items():
+            gauges.append((f'db_pool_{name}', {'database': alias}, value, 'Database connection pool.'))
+    for (scope, reason), value in throttling.stats.items():
+        gauges.append(('throttled_requests_total', {'scope': scope, 'reason': reason}, value,
+                       'Requests refused by a token bucket (429) or shed under load (503).'))
+    gauges.append(('db_query_seconds_average_max', {}, db_latency.current(), 'Moving average query time of the slowest worker.'))
+    return gauges
+
+
+class InstrumentationMiddleware:
+    """
+    Times requests, counts their queries and adds Server-Timing for admins.
+    Place it first in MIDDLEWARE so the total covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def start(self, request):
+        install_on_open_connections()
+        metrics = RequestMetrics()
+        request._metrics = metrics
+        return metrics, _current.set(metrics)
+
+    def process_template_response(self, request, response):
+        # Called when the view returned an unrendered (DRF) response: the
+        # view is done and rendering starts.
+        metrics = request._metrics
+        metrics.view_time = time.perf_counter() - metrics.started
+        metrics.render_started = time.perf_counter()
+        response.add_post_render_callback(lambda rendered: self.rendered(metrics))
+        return response
+
+    def rendered(self, metrics):
+        metrics.render_time = time.perf_counter() - metrics.render_started
+
+    def finish(self, request, response, metrics):
+        duration = time.perf_counter() - metrics.started
+        match = request.resolver_match
+        view = (match.view_name if match.url_name else match.route) if match else 'unmatched'
+        registry.observe(view, request.method, response.status_code, metrics, duration)
+        registry.flush()
+
+        user = getattr(request, 'user', None)
+        if getattr(user, 'role', None) == 'admin':
+            response['Server-Timing'] = server_timing(metrics, duration)
+        return response
+
+
+def server_timing(metrics, duration):
+    view_time = metrics.view_time if metrics.view_time is not None else duration
+    app_time = max(view_time - metrics.db_time, 0.0)
+    entries = [
+        ('db', metrics.db_time, f'{metrics.queries} queries'),
+        ('app', app_time, 'view code and serializers'),
+        ('render', metrics.render_time, 'response encoding'),
+        ('total', duration, None),
+    ]
+    return ', '.join(
+        f'{name};dur={seconds * 1000:.2f}' + (f';desc="{desc}"' if desc else '')
+        for name, seconds, desc in entries
+    )
+
+
+def collect():
+    """
+    Sums every live worker's snapshot. Returns (views, gauges).
+    """
+    registry.flush(force=True)
+    keys = cache.get(WORKERS_KEY) or []
+    snapshots = cache.get_many(keys)
+    if len(snapshots) < len(keys):
+        # Drop workers whose snapshots expired.
+        cache.set(WORKERS_KEY, [key for key in keys if key in snapshots], timeout=None)
+
+    views, gauges, help_texts = {}, {}, {}
+    for snapshot in snapshots.values():
+        for entry in snapshot['views']:
+            total = views.setdefault((entry['view'], entry['method']), {
+                'count': 0, 'seconds': 0.0, 'buckets': [0] * (len(BUCKETS) + 1),
+                'queries': 0, 'db_seconds': 0.0, 'render_seconds': 0.0, 'statuses': {},
+            })
+            for field in ('count', 'seconds', 'queries', 'db_seconds', 'render_seconds'):
+                total[field] += entry[field]
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], entry['buckets'])]
+            for status, count in entry['statuses'].items():
+                total['statuses'][status] = total['statuses'].get(status, 0) + count
+        for name, labels, value, help_text in snapshot['gauges']:
+            key = (name, tuple(sorted(labels.items())))
+            combine = max if name.endswith('_max') else (lambda a, b: a + b)
+            gauges[key] = combine(gauges[key], value) if key in gauges else value
+            help_texts[name] = help_text
+    return views, gauges, help_texts
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}' if labels else ''
+
+
+def prometheus_text():
+    from core import caching
+
+    views, gauges, help_texts = collect()
+    lines = [
+        '# HELP http_request_duration_seconds Request latency by URL name and method.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for (view, method), entry in sorted(views.items()):
+        cumulative = 0
+        for bound, count in zip([*BUCKETS, '+Inf'], entry['buckets']):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{_labels(view=view, method=method, le=bound)} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{_labels(view=view, method=method)} {entry["seconds"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{_labels(view=view, method=method)} {entry["count"]}')
+
+    counters = (
+        ('http_requests_total', 'Requests by URL name, method and status.', None),
+        ('http_request_db_queries_total', 'Database queries run by requests.', 'queries'),
+        ('http_request_db_seconds_total', 'Time spent in database queries.', 'db_seconds'),
+        ('http_request_render_seconds_total', 'Time spent rendering (encoding) responses.', 'render_seconds'),
+    )
+    for name, help_text, field in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (view, method), entry in sorted(views.items()):
+            if field is None:
+                for status, count in sorted(entry['statuses'].items()):
+                    lines.append(f'{name}{_labels(view=view, method=method, status=status)} {count}')
+            else:
+                lines.append(f'{name}{_labels(view=view, method=method)} {entry[field]}')
+
+    response_cache = caching.stats()
+    gauges[('response_cache_hits_total', ())] = response_cache['hits']
+    gauges[('response_cache_misses_total', ())] = response_cache['misses']
+    help_texts['response_cache_hits_total'] = help_texts['response_cache_misses_total'] = 'Cached API responses (shared by all workers).'
+
+    described = set()
+    for (name, labels), value in sorted(gauges.items()):
+        if name not in described:
+            described.add(name)
+            lines += [f'# HELP {name} {help_texts[name]}', f'# TYPE {name} {"counter" if name.endswith("_total") else "gauge"}']
+        lines.append(f'{name}{_labels(**dict(labels))} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Requires ``Authorization: Bearer <METRICS_TOKEN>``;
+    disabled while METRICS_TOKEN is unset.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=404)
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=403)
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
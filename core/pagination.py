@@ -0,0 +1,169 @@
+import json
+import base64
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset (cursor) pagination, newest first on (created, id).
+    - Without ``page_size`` or ``cursor`` in the query string the full list is
+      returned unchanged, so existing clients keep working.
+    - Pages are fetched with a range filter on the ordering columns instead of
+      OFFSET, so page N costs the same as page 1.
+    """
+    ordering = ('-created', '-id')
+    page_size = api_settings.PAGE_SIZE or 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    datetime_fields = ('created',)
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'keyset_ordering', self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(params.get(self.cursor_query_param))
+        self.reverse = bool(cursor and cursor.get('r'))
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(_flip(field) for field in ordering)
+        if cursor:
+            queryset = queryset.filter(self.after(ordering, cursor['v']))
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def after(self, ordering, values):
+        """
+        Lexicographic "comes after" filter for ``ordering``, e.g. for
+        (-created, -id): created <= c AND (created < c OR (created = c AND id < i)).
+        The redundant leading bound lets the database start an index range scan
+        at the cursor instead of filtering rows from the top of the index.
+        """
+        condition = Q()
+        for index in reversed(range(len(ordering))):
+            field = ordering[index].lstrip('-')
+            lookup = 'lt' if ordering[index].startswith('-') else 'gt'
+            strictly = Q(**{f'{field}__{lookup}': values[index]})
+            if index == len(ordering) - 1:
+                condition = strictly
+            else:
+                condition = strictly | (Q(**{field: values[index]}) & condition)
+        leading = ordering[0].lstrip('-')
+        bound = 'lte' if ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{leading}__{bound}': values[0]}) & condition
+
+    def position(self, item):
+        values = []
+        for field in self.ordering:
+            field = field.lstrip('-')
+            value = item[field] if isinstance(item, dict) else getattr(item, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def encode_cursor(self, item, reverse):
+        payload = {'v': self.position(item)}
+        if reverse:
+            payload['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, token):
+        """
+        The cursor's position, with each value parsed as its ordering field's
+        type; a tampered cursor is a 404 rather than a failing query.
+        """
+        if not token:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(token.encode()))
+            values = cursor['v']
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            cursor['v'] = [self.parse_value(field.lstrip('-'), value) for field, value in zip(self.ordering, values)]
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def parse_value(self, field, value):
+        """
+        ``created`` is an ISO datetime; every other ordering field (id and the
+        farmer totals) is a 64-bit integer.
+        """
+        if field in self.datetime_fields:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValueError
+            if settings.USE_TZ and timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            return parsed
+        if isinstance(value, bool) or not isinstance(value, int) or not -2 ** 63 <= value < 2 ** 63:
+            raise ValueError
+        return value
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
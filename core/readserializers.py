@@ -0,0 +1,139 @@
+"""
+Compiled read-only serializers for list endpoints.
+
+``ValuesSerializer`` reproduces a DRF serializer's output from
+``QuerySet.values()`` rows. The serializer's readable fields are inspected
+once and turned into (key, column, converter) steps, so listing skips model
+instantiation and DRF's per-field machinery; fields whose DRF representation
+of a database value is the value itself are copied as they are.
+
+- ``sources`` maps fields to another column, e.g. a ``StringRelatedField``
+  to ``farmer__username`` (followed with a join in the same query).
+- ``computed`` maps fields to (columns, function(row, context)) for method
+  fields.
+"""
+from functools import cached_property
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation() returns database values unchanged.
+IDENTITY_FIELDS = (
+    serializers.IntegerField, serializers.CharField, serializers.EmailField, serializers.SlugField,
+    serializers.ChoiceField, serializers.BooleanField, serializers.ReadOnlyField,
+)
+
+
+def _file_url(storage):
+    def bind(context):
+        request = context.get('request')
+
+        def convert(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+    return bind
+
+
+def _datetime(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+
+    def bind(context):
+        # DRF looks the current timezone up for every value; once per list here.
+        zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if zone is None or output_format is None or output_format.lower() != ISO_8601:
+            return field.to_representation
+
+        def convert(value):
+            if value.tzinfo is None:
+                return field.to_representation(value)
+            text = value.astimezone(zone).isoformat()
+            return text[:-6] + 'Z' if text.endswith('+00:00') else text
+        return convert
+    return bind
+
+
+class ValuesSerializer:
+    def __init__(self, serializer_class, sources=None, computed=None):
+        self.serializer_class = serializer_class
+        self.sources = sources or {}
+        self.computed = computed or {}
+
+    @cached_property
+    def compiled(self):
+        """
+        (columns, steps). Steps are (key, column, converter, context-bound
+        converter factory, computed function).
+        """
+        model = self.serializer_class.Meta.model
+        columns, steps = [], []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if name in self.computed:
+                needed, function = self.computed[name]
+                columns += [column for column in needed if column not in columns]
+                steps.append((name, None, None, None, function))
+                continue
+            if isinstance(field, serializers.RelatedField) and name not in self.sources:
+                raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{name} needs a column in sources.')
+            column = self.sources.get(name, field.source)
+            if column not in columns:
+                columns.append(column)
+            if type(field) in IDENTITY_FIELDS or name in self.sources:
+                steps.append((name, column, None, None, None))
+            elif isinstance(field, serializers.FileField) and getattr(field, 'use_url', True):
+                steps.append((name, column, None, _file_url(model._meta.get_field(column).storage), None))
+            elif type(field) is serializers.DateTimeField:
+                steps.append((name, column, None, _datetime(field), None))
+            else:
+                steps.append((name, column, field.to_representation, None, None))
+        return columns, steps
+
+    def values(self, queryset):
+        return queryset.values(*self.compiled[0])
+
+    def serialize(self, rows, context=None):
+        context = context or {}
+        steps = [
+            (key, column, factory(context) if factory else convert, function)
+            for key, column, convert, factory, function in self.compiled[1]
+        ]
+        data = []
+        for row in rows:
+            item = {}
+            for key, column, convert, function in steps:
+                if function is not None:
+                    item[key] = function(row, context)
+                    continue
+                value = row[column]
+                item[key] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+
+class CompiledListMixin:
+    """
+    ``list()`` for generic views through ``read_serializer`` (a ValuesSerializer):
+    one values() query with the joins it needs, paginated like the queryset.
+    ``get_read_context(rows)`` may add data fetched for the listed rows.
+    """
+    read_serializer = None
+
+    def get_read_serializer(self):
+        return self.read_serializer
+
+    def get_read_context(self, rows):
+        return self.get_serializer_context()
+
+    def list(self, request, *args, **kwargs):
+        read_serializer = self.get_read_serializer()
+        rows = read_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(read_serializer.serialize(page, self.get_read_context(page)))
+        rows = list(rows)
+        return Response(read_serializer.serialize(rows, self.get_read_context(rows)))
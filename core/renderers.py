@@ -0,0 +1,73 @@
+"""
+orjson-backed JSON renderer and parser, drop-in replacements for DRF's.
+
+Output is byte-for-byte what ``JSONRenderer`` produces with the default
+settings (compact, UTF-8, ``Z`` for UTC datetimes, U+2028/U+2029 escaped).
+Values orjson does not know (Decimals, lazy translation strings, timedeltas,
+querysets...) go through DRF's own ``JSONEncoder.default``. Requests for
+indented output, a non-UTF-8 charset, or anything orjson cannot encode fall
+back to the stdlib implementation, as does everything when orjson is not
+installed. One difference: NaN and infinite floats are written as null
+instead of failing the response.
+
+orjson reads integers beyond 64 bits as floats, losing digits, so request
+bodies with a run of 19 or more digits are parsed by the stdlib instead.
+"""
+import io
+import re
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Dict keys such as ints are written as strings, like the stdlib encoder does.
+OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+# Every integer outside the 64-bit range has at least 19 digits. Long digit
+# runs in strings or fractions also match; those simply take the slow path.
+LONG_NUMBER = re.compile(rb'\d{19}')
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None or self.encoder_class is not JSONEncoder
+            or not (api_settings.COMPACT_JSON and api_settings.UNICODE_JSON and api_settings.STRICT_JSON)
+            or self.get_indent(accepted_media_type or '', renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the stdlib encoder handles.
+            return super().render(data, accepted_media_type, renderer_context)
+        # Kept out of JSON embedded in HTML <script> blocks, as DRF does.
+        if b'\xe2\x80' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8') or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        content = stream.read()
+        if LONG_NUMBER.search(content):
+            return super().parse(io.BytesIO(content), media_type, parser_context)
+        try:
+            # orjson rejects NaN and Infinity like DRF's strict parser.
+            return orjson.loads(content)
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,89 @@
+"""
+Indexed text search for list endpoints.
+
+``SearchFilter`` is DRF's search backend over a view's ``search_fields``:
+``?search=`` matches a substring of any field (``icontains``), or a prefix with
+``?search_mode=prefix`` (``istartswith``). Both compare ``UPPER(column)`` with
+LIKE, which the indexes created by ``AddSearchIndex`` serve on PostgreSQL.
+"""
+from rest_framework import filters
+from django.db.migrations.operations.base import Operation
+from rest_framework.exceptions import ValidationError
+
+CONTAINS, PREFIX = 'contains', 'prefix'
+
+
+class SearchFilter(filters.SearchFilter):
+    """
+    - Several whitespace-separated terms must all match
+    - Substring terms need ``min_length`` characters: pg_trgm extracts no
+      trigram from shorter ones, so the index could not narrow the scan
+    """
+    mode_param = 'search_mode'
+    min_length = 3
+
+    def filter_queryset(self, request, queryset, view):
+        mode = request.query_params.get(self.mode_param) or CONTAINS
+        if mode not in (CONTAINS, PREFIX):
+            raise ValidationError({self.mode_param: f'Must be one of: {CONTAINS}, {PREFIX}.'})
+        self.prefix = mode == PREFIX
+        if not self.prefix and any(len(term) < self.min_length for term in self.get_search_terms(request)):
+            raise ValidationError({self.search_param: (
+                f'Search terms need at least {self.min_length} characters; '
+                f'use {self.mode_param}={PREFIX} for shorter prefixes.'
+            )})
+        return super().filter_queryset(request, queryset, view)
+
+    def construct_search(self, field_name, queryset):
+        if self.prefix and field_name[0] not in self.lookup_prefixes:
+            field_name = f'^{field_name}'
+        return super().construct_search(field_name, queryset)
+
+
+class AddSearchIndex(Operation):
+    """
+    Indexes ``UPPER(field)`` for ``icontains`` / ``istartswith`` lookups.
+    - PostgreSQL: a pg_trgm GIN index, usable for substring and prefix LIKE
+    - Elsewhere: a functional UPPER() index, so the schema has the same shape
+      (SQLite's LIKE ... ESCAPE cannot use an index; its searches scan)
+    The index is left out of the model state, which has no portable way to
+    declare it.
+    """
+    reversible = True
+
+    def __init__(self, model_name, field, name):
+        self.model_name = model_name
+        self.field = field
+        self.name = name
+
+    def deconstruct(self):
+        return self.__class__.__qualname__, [], {'model_name': self.model_name, 'field': self.field, 'name': self.name}
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        quote = schema_editor.quote_name
+        table, column = quote(model._meta.db_table), quote(model._meta.get_field(self.field).column)
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            schema_editor.execute(f'CREATE INDEX {quote(self.name)} ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)')
+        else:
+            schema_editor.execute(f'CREATE INDEX {quote(self.name)} ON {table} (UPPER({column}))')
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        quote = schema_editor.quote_name
+        schema_editor.execute(schema_editor.sql_delete_index % {'table': quote(model._meta.db_table), 'name': quote(self.name)})
+
+    def describe(self):
+        return f'Create search index {self.name} on {self.model_name}.{self.field}'
+
+    @property
+    def migration_name_fragment(self):
+        return self.name.lower()
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from core.dbpool import pool_options
 from dotenv import load_dotenv
 from datetime import timedelta
 
@@ -29,16 +30,21 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     #Added 
     'users', 
-    'crops'
+    'crops',
+    'jobs',
 ]
 
 AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
+    # Times every request and counts its queries (see core/metrics.py).
+    'core.metrics.InstrumentationMiddleware',
     #Added
     'corsheaders.middleware.CorsMiddleware',
     #Default
     'django.middleware.security.SecurityMiddleware',
+    # Serves collected static files with far-future caching and precompressed variants.
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,9 +83,21 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD'),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        'OPTIONS': {},
     }
 }
 
+# Each worker process keeps a pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE
+# connections (see core/dbpool.py). With DB_POOL=0 connections are opened per
+# request, or kept for DB_CONN_MAX_AGE seconds and health-checked before reuse.
+# Size the pools so workers * DB_POOL_MAX_SIZE stays under max_connections.
+DB_POOL_OPTIONS = pool_options(os.environ)
+if DB_POOL_OPTIONS:
+    DATABASES['default']['OPTIONS']['pool'] = DB_POOL_OPTIONS
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 0))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -98,6 +116,25 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# New passwords are hashed with scrypt; PBKDF2 hashes from before still verify
+# and are re-hashed on the next successful login (see users/hashers.py).
+PASSWORD_HASHERS = [
+    'users.hashers.ScryptPasswordHasher',
+    'users.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+# scrypt cost: n (CPU/memory, a power of two), r (block size) and p. Memory per
+# hash is 128 * n * r bytes (16 MB with the defaults).
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.environ.get('PASSWORD_SCRYPT_PARALLELISM', 1))
+# Hashes computed at once per process, and how many more may wait before
+# logins are answered with 503. Keep workers at or below the CPU count, and
+# workers + queue below the worker threads (gunicorn --threads) so waiting
+# logins never hold every thread.
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 2))
+PASSWORD_HASHING_QUEUE = int(os.environ.get('PASSWORD_HASHING_QUEUE', 4))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -115,6 +152,21 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic writes content-hashed copies of every asset plus .gz (and .br
+# when the Brotli package is installed) variants, which WhiteNoise serves with a
+# one-year immutable Cache-Control. Assets missing from the manifest (e.g. before
+# collectstatic in development) fall back to their plain names.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+WHITENOISE_MANIFEST_STRICT = False
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -125,16 +177,134 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 MEDIA_URL  = '/media/'
 
+# Cache lifetime for media without a content-hashed name (hashed ones are immutable).
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 3600))
+# Internal nginx location mapped to MEDIA_ROOT, e.g. /protected-media/; when set,
+# nginx sends the file bytes instead of the Django worker.
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', '')
+
 CORS_ALLOW_ALL_ORIGINS = True  # For dev, restrict in prod
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # JSON through orjson (core/renderers.py); the stdlib is used when it is
+    # not installed. Point these at rest_framework's JSONRenderer/JSONParser
+    # to switch back.
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Opt-in: lists are only paginated when ?page_size= or ?cursor= is sent.
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # Token buckets and load shedding (core/throttling.py).
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.OverloadThrottle',
+        'core.throttling.UserBucketThrottle',
+        'core.throttling.IPBucketThrottle',
+        'core.throttling.ScopedBucketThrottle',
+    ),
+    # Trusted proxies in front of the app. With 0, throttles key on REMOTE_ADDR
+    # and ignore X-Forwarded-For, which clients can set to anything; behind N
+    # proxies, the address N hops from the end of X-Forwarded-For is used.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Local memory is per process. With several gunicorn workers point every worker
+# at one shared backend, e.g. CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache
+# with CACHE_LOCATION=response_cache (then run `manage.py createcachetable`), or
+# django.core.cache.backends.filebased.FileBasedCache with a directory.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'agri-response-cache'),
+    }
+}
+
+# Seconds a cached stats/list response may live; writes invalidate it sooner.
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Serve the stats and list reads from their async views (set when running under uvicorn).
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() in ('true', '1')
+
+# In-process cache of user rows used by ClaimsJWTAuthentication.
+AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', 10000))
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 60))
+
+# Throttling: each bucket is (tokens per second, burst). Requests take their
+# view's throttle_cost (1 unless set) from the user, IP and view scope buckets,
+# which live in CACHES['default'] so every worker shares them.
+THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', 'True').lower() in ('true', '1')
+THROTTLE_BUCKETS = {
+    'user': (float(os.environ.get('THROTTLE_USER_RATE', 10)), int(os.environ.get('THROTTLE_USER_BURST', 200))),
+    'ip': (float(os.environ.get('THROTTLE_IP_RATE', 30)), int(os.environ.get('THROTTLE_IP_BURST', 600))),
+    # Login, signup and token refresh.
+    'auth': (float(os.environ.get('THROTTLE_AUTH_RATE', 0.2)), int(os.environ.get('THROTTLE_AUTH_BURST', 20))),
 }
+# Requests costing THROTTLE_SHED_COST or more get 503 (Retry-After
+# THROTTLE_OVERLOAD_RETRY_AFTER) while the moving average query time exceeds
+# THROTTLE_OVERLOAD_DB_LATENCY seconds.
+THROTTLE_SHED_COST = int(os.environ.get('THROTTLE_SHED_COST', 5))
+THROTTLE_OVERLOAD_DB_LATENCY = float(os.environ.get('THROTTLE_OVERLOAD_DB_LATENCY', 0.2))
+THROTTLE_OVERLOAD_RETRY_AFTER = int(os.environ.get('THROTTLE_OVERLOAD_RETRY_AFTER', 5))
+
+# Request metrics: each worker publishes its aggregates to CACHES['default']
+# every METRICS_FLUSH_INTERVAL seconds; /metrics sums them for Prometheus and
+# requires "Authorization: Bearer <METRICS_TOKEN>" (it is off while unset).
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+# Snapshots of workers that stopped are dropped after this many seconds.
+METRICS_WORKER_TTL = int(os.environ.get('METRICS_WORKER_TTL', 3600))
+
+# Token revocation (logout): every worker checks a bloom filter of revoked
+# jtis, picks up other workers' revocations within REVOCATION_SYNC_INTERVAL
+# seconds, and rebuilds the filter without expired tokens periodically.
+REVOCATION_SYNC_INTERVAL = float(os.environ.get('REVOCATION_SYNC_INTERVAL', 1.0))
+REVOCATION_REBUILD_INTERVAL = int(os.environ.get('REVOCATION_REBUILD_INTERVAL', 600))
+REVOCATION_PRUNE_INTERVAL = int(os.environ.get('REVOCATION_PRUNE_INTERVAL', 3600))
+# Sized for this many live revocations (about 1.8 MB per process) at this
+# false-positive rate; false positives only cost an indexed lookup.
+REVOCATION_FILTER_CAPACITY = int(os.environ.get('REVOCATION_FILTER_CAPACITY', 1000000))
+REVOCATION_FILTER_ERROR_RATE = float(os.environ.get('REVOCATION_FILTER_ERROR_RATE', 0.001))
+REVOCATION_CONFIRMED_CACHE_SIZE = 10000
+
+# Profile icon thumbnails (square, in pixels), rendered by a background job.
+PROFILE_ICON_SIZES = (64, 128, 256)
+PROFILE_ICON_MAX_BYTES = 5 * 1024 * 1024
+# Largest width x height decoded; a small compressed file can expand to far more.
+PROFILE_ICON_MAX_PIXELS = 4096 * 4096
+
+# Rows per INSERT when bulk-importing crops.
+CROP_IMPORT_BATCH_SIZE = int(os.environ.get('CROP_IMPORT_BATCH_SIZE', 1000))
+
+# Most crops one batch update/delete request may touch.
+CROP_BATCH_MAX_ITEMS = int(os.environ.get('CROP_BATCH_MAX_ITEMS', 1000))
+
+# Background jobs (see jobs/queue.py), run by `manage.py runjobs` with
+# JOBS_PROCESSES processes of JOBS_THREADS threads each.
+JOBS_PROCESSES = int(os.environ.get('JOBS_PROCESSES', 1))
+JOBS_THREADS = int(os.environ.get('JOBS_THREADS', 4))
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 1.0))
+# Default attempts per job; retries wait JOBS_RETRY_DELAY seconds, doubling
+# up to JOBS_RETRY_MAX_DELAY.
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 3))
+JOBS_RETRY_DELAY = float(os.environ.get('JOBS_RETRY_DELAY', 10))
+JOBS_RETRY_MAX_DELAY = float(os.environ.get('JOBS_RETRY_MAX_DELAY', 3600))
+# A job running this long is assumed to have lost its worker and runs again.
+JOBS_LEASE_TIMEOUT = int(os.environ.get('JOBS_LEASE_TIMEOUT', 900))
+JOBS_MAINTENANCE_INTERVAL = 60
+# Finished jobs are deleted after this many days.
+JOBS_RETENTION_DAYS = int(os.environ.get('JOBS_RETENTION_DAYS', 7))
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=5),
@@ -0,0 +1,61 @@
+"""
+Test helpers shared by the apps' test modules.
+
+``APITestCase`` and ``APITransactionTestCase`` are DRF's with throttling off, plus:
+- ``authenticate(user)``: send a fresh access token for ``user``
+- ``use_temporary_media()``: point MEDIA_ROOT at a directory removed after the test
+- ``use_shared_cache()``: a file-based CACHES['default'], which counts as shared
+  between workers, so that role claims are trusted (users/authentication.py)
+"""
+import shutil
+import tempfile
+from rest_framework import test
+from django.test import override_settings
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import RefreshToken
+
+PASSWORD = 'Testpass@123'
+# Hashing dominates otherwise and is irrelevant to most tests.
+MD5 = 'django.contrib.auth.hashers.MD5PasswordHasher'
+
+
+def create_user(username, **fields):
+    """
+    A user named ``username`` with an ``@example.com`` email and PASSWORD.
+    """
+    fields.setdefault('email', f'{username}@example.com')
+    fields.setdefault('password', PASSWORD)
+    return get_user_model().objects.create_user(username=username, **fields)
+
+
+def bearer(user):
+    return f'Bearer {RefreshToken.for_user(user).access_token}'
+
+
+class UserTestMixin:
+    def authenticate(self, user, **headers):
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(user), **headers)
+
+    def use_temporary_media(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        return media
+
+    def use_shared_cache(self, **settings):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+        self.enterContext(override_settings(CACHES=caches, **settings))
+
+
+# Buckets would otherwise carry over between tests sharing a cache; the
+# throttling tests turn it back on.
+@override_settings(THROTTLE_ENABLED=False)
+class APITestCase(UserTestMixin, test.APITestCase):
+    pass
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class APITransactionTestCase(UserTestMixin, test.APITransactionTestCase):
+    pass
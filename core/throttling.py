@@ -0,0 +1,162 @@
+"""
+Token-bucket throttling and load shedding for the API.
+
+Every bucket holds up to ``burst`` tokens and refills at ``rate`` tokens per
+second (``THROTTLE_BUCKETS``). A request takes its view's cost from:
+
+- the caller's ``user`` bucket (authenticated requests),
+- the client's ``ip`` bucket (every request),
+- the bucket of the view's ``throttle_scope``, if it has one (e.g. ``auth``
+  for login, signup and token refresh), per user or else per IP.
+
+Views declare ``throttle_cost`` (default 1) or ``get_throttle_cost(request)``
+for requests that cost the database more. Refused requests get 429 with
+``Retry-After``; the bucket that refused keeps its tokens.
+
+A bucket is stored as one number in ``CACHES['default']``: the time at which it
+would be full again. Taking tokens pushes that time forward with the cache's
+atomic ``incr``, so limits hold across workers on a shared Redis or Memcached
+cache. The database cache's ``incr`` is not atomic; concurrent requests may
+then slightly overdraw a bucket.
+
+``OverloadThrottle`` sheds requests costing ``THROTTLE_SHED_COST`` or more
+with 503 while this worker's moving average query time is above
+``THROTTLE_OVERLOAD_DB_LATENCY`` seconds (see ``core.metrics.db_latency``).
+"""
+import math
+import time
+import threading
+from core import metrics
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.throttling import BaseThrottle
+from rest_framework.exceptions import APIException
+
+PREFIX = 'throttle'
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The service is overloaded, try again later.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = math.ceil(wait)
+
+
+class Stats:
+    """
+    Refused requests in this worker, by (scope, reason).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, scope, reason):
+        with self.lock:
+            self.counts[(scope, reason)] = self.counts.get((scope, reason), 0) + 1
+
+    def items(self):
+        with self.lock:
+            return list(self.counts.items())
+
+
+stats = Stats()
+
+
+def take(key, cost, rate, burst, now=None):
+    """
+    Takes ``cost`` tokens from the bucket at ``key``. Returns 0 when they were
+    taken, else the seconds until they will be available.
+    """
+    now_ms = int((time.time() if now is None else now) * 1000)
+    step = math.ceil(min(cost, burst) * 1000 / rate)
+    capacity = math.ceil(burst * 1000 / rate)
+    timeout = math.ceil(capacity / 1000) + 1
+    try:
+        full_at = cache.incr(key, step)
+    except ValueError:
+        if cache.add(key, now_ms + step, timeout):
+            return 0.0
+        full_at = cache.incr(key, step)
+
+    if full_at < now_ms + step:
+        # The bucket had refilled completely; start again from now.
+        cache.set(key, now_ms + step, timeout)
+        return 0.0
+    if full_at - now_ms > capacity:
+        cache.decr(key, step)
+        return (full_at - now_ms - capacity) / 1000
+    cache.touch(key, timeout)
+    return 0.0
+
+
+def cost_of(request, view):
+    get_cost = getattr(view, 'get_throttle_cost', None)
+    return get_cost(request) if get_cost else getattr(view, 'throttle_cost', 1)
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Takes the request's cost from the bucket named by ``get_bucket()``.
+    """
+    def get_bucket(self, request, view):
+        """
+        (scope, identity) of the bucket to use, or None to skip it.
+        """
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.delay = None
+        if not settings.THROTTLE_ENABLED:
+            return True
+        bucket = self.get_bucket(request, view)
+        if bucket is None:
+            return True
+        scope, identity = bucket
+        rate, burst = settings.THROTTLE_BUCKETS[scope]
+        delay = take(f'{PREFIX}:{scope}:{identity}', cost_of(request, view), rate, burst)
+        if delay:
+            stats.count(scope, 'rate_limited')
+            self.delay = delay
+            return False
+        return True
+
+    def wait(self):
+        return self.delay
+
+
+class UserBucketThrottle(BucketThrottle):
+    def get_bucket(self, request, view):
+        user = request.user
+        return ('user', user.pk) if user and user.is_authenticated else None
+
+
+class IPBucketThrottle(BucketThrottle):
+    def get_bucket(self, request, view):
+        return 'ip', self.get_ident(request)
+
+
+class ScopedBucketThrottle(BucketThrottle):
+    def get_bucket(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return None
+        user = request.user
+        return scope, f'user:{user.pk}' if user and user.is_authenticated else f'ip:{self.get_ident(request)}'
+
+
+class OverloadThrottle(BaseThrottle):
+    """
+    Refuses expensive requests with 503 while the database is slow, leaving
+    the capacity to cheap ones. Listed first, so shed requests take no tokens.
+    """
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED or cost_of(request, view) < settings.THROTTLE_SHED_COST:
+            return True
+        if metrics.db_latency.current() <= settings.THROTTLE_OVERLOAD_DB_LATENCY:
+            return True
+        stats.count('overload', 'shed')
+        raise Overloaded(settings.THROTTLE_OVERLOAD_RETRY_AFTER)
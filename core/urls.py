@@ -1,11 +1,15 @@
 from django.contrib import admin
 from django.conf import settings
-from django.urls import path, include
-from django.conf.urls.static import static
+from core.media import serve_media
+from core.metrics import metrics_view
+from django.urls import path, include, re_path
 
 
 urlpatterns = [
     path('admin/', admin.site.urls), 
     path('api/', include('users.urls')),
-    path('api/', include('crops.urls'))
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    path('api/', include('crops.urls')),
+    path('api/', include('jobs.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    re_path(rf'^{settings.MEDIA_URL.strip("/")}/(?P<path>.+)$', serve_media, name='media'),
+]
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""
+Incrementally maintained crop totals.
+
+Every write to ``Crop`` is translated into deltas keyed by (farmer, crop_type)
+and applied to ``FarmerTotal`` / ``FarmerCropTotal`` inside the writer's
+transaction, so the stats endpoints never aggregate the raw crop table. Farmers
+moving between totals are also counted into ``RankBucket`` for the leaderboard,
+and the same deltas, split by the day each crop was created, keep the
+``DailyCropTotal`` rollups behind the analytics series.
+"""
+from django.utils import timezone
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+class CropDeltas:
+    """
+    Accumulates quantity/count changes per (farmer, crop_type) and applies
+    them to the totals tables in as few statements as possible.
+    """
+    def __init__(self):
+        self._deltas = defaultdict(lambda: [0, 0])
+        self._daily = defaultdict(lambda: [0, 0])
+
+    def add(self, farmer_id, crop_type, quantity, count=1, day=None):
+        """
+        Records a change; ``day`` (the crops' creation date) also feeds the
+        daily rollups. Farmer deletions pass none, as their rollups cascade.
+        """
+        entry = self._deltas[(farmer_id, crop_type)]
+        entry[0] += quantity
+        entry[1] += count
+        if day is not None:
+            entry = self._daily[(farmer_id, crop_type, day)]
+            entry[0] += quantity
+            entry[1] += count
+
+    def add_crop(self, crop, sign=1):
+        self.add(crop.farmer_id, crop.crop_type, sign * crop.quantity, sign, rollup_day(crop.created))
+
+    def add_grouped(self, rows, sign=1):
+        """
+        Adds rows produced by ``grouped_totals()``.
+        """
+        for row in rows:
+            self.add(row['farmer_id'], row['crop_type'], sign * row['total_quantity'], sign * row['crop_count'], row['day'])
+
+    def per_type(self):
+        return {key: tuple(value) for key, value in self._deltas.items() if value != [0, 0]}
+
+    def per_day(self):
+        return {key: tuple(value) for key, value in self._daily.items() if value != [0, 0]}
+
+    def per_farmer(self):
+        totals = defaultdict(lambda: [0, 0])
+        for (farmer_id, _), (quantity, count) in self.per_type().items():
+            totals[farmer_id][0] += quantity
+            totals[farmer_id][1] += count
+        return {key: tuple(value) for key, value in totals.items() if value != [0, 0]}
+
+    def __bool__(self):
+        return bool(self.per_type() or self.per_day())
+
+    def apply(self):
+        from .models import FarmerCropTotal, FarmerTotal
+
+        per_type, per_day = self.per_type(), self.per_day()
+        if not per_type and not per_day:
+            return
+        moves = defaultdict(int)
+        # Sorted keys keep lock order stable between concurrent writers.
+        with transaction.atomic():
+            for (farmer_id, crop_type), (quantity, count) in sorted(per_type.items()):
+                before, after = _increment(FarmerCropTotal, {'farmer_id': farmer_id, 'crop_type': crop_type}, quantity, count)
+                _move(moves, crop_type, before, after)
+            for farmer_id, (quantity, count) in sorted(self.per_farmer().items()):
+                before, after = _increment(FarmerTotal, {'farmer_id': farmer_id}, quantity, count)
+                _move(moves, '', before, after)
+            _apply_moves(moves)
+            _apply_daily(per_day)
+
+
+def rollup_day(created):
+    """
+    The rollup day of a crop created at ``created``, in the current time
+    zone like ``TruncDate``. Unsaved crops count as created now.
+    """
+    return timezone.localdate(created or timezone.now())
+
+
+def _increment(model, lookup, quantity, count):
+    """
+    Adds to a totals row, creating it first when the farmer has none.
+    Returns the total quantity before and after the change.
+    """
+    locked = model.objects.select_for_update().filter(**lookup).values_list('total_quantity', flat=True)
+    before = locked.first()
+    if before is None:
+        # A concurrent writer may create the row first; ignoring the conflict
+        # and re-reading under lock lands both increments on the same row.
+        model.objects.bulk_create([model(**lookup)], ignore_conflicts=True)
+        before = locked.first()
+    after = before + quantity
+    model.objects.filter(**lookup).update(total_quantity=after, crop_count=F('crop_count') + count)
+    return before, after
+
+
+def _move(moves, crop_type, before, after):
+    """
+    Records a farmer moving between RankBucket totals. Zero totals are not
+    ranked, so they have no bucket.
+    """
+    if before == after:
+        return
+    if before:
+        moves[(crop_type, before)] -= 1
+    if after:
+        moves[(crop_type, after)] += 1
+
+
+def _apply_moves(moves):
+    from .models import RankBucket
+
+    for (crop_type, total), farmers in sorted(moves.items()):
+        if not farmers:
+            continue
+        lookup = {'crop_type': crop_type, 'total_quantity': total}
+        if not RankBucket.objects.filter(**lookup).update(farmers=F('farmers') + farmers):
+            RankBucket.objects.bulk_create([RankBucket(**lookup)], ignore_conflicts=True)
+            RankBucket.objects.filter(**lookup).update(farmers=F('farmers') + farmers)
+
+
+def _apply_daily(per_day):
+    from .models import DailyCropTotal
+
+    for (farmer_id, crop_type, day), (quantity, count) in sorted(per_day.items()):
+        lookup = {'farmer_id': farmer_id, 'crop_type': crop_type, 'day': day}
+        changes = {'total_quantity': F('total_quantity') + quantity, 'crop_count': F('crop_count') + count}
+        if not DailyCropTotal.objects.filter(**lookup).update(**changes):
+            DailyCropTotal.objects.bulk_create([DailyCropTotal(**lookup)], ignore_conflicts=True)
+            DailyCropTotal.objects.filter(**lookup).update(**changes)
+
+
+def grouped_totals(queryset):
+    return (
+        queryset.order_by()
+        .values('farmer_id', 'crop_type', day=TruncDate('created'))
+        .annotate(total_quantity=Sum('quantity'), crop_count=Count('id'))
+    )
+
+
+def expected_totals():
+    """
+    Computes the totals straight from the ``Crop`` table.
+    Returns (per_farmer, per_type, per_day) dicts of (total_quantity, crop_count).
+    """
+    from .models import Crop
+
+    deltas = CropDeltas()
+    deltas.add_grouped(grouped_totals(Crop.objects.all()))
+    return deltas.per_farmer(), deltas.per_type(), deltas.per_day()
+
+
+def expected_buckets(per_farmer, per_type):
+    """
+    RankBucket contents implied by the given totals: (crop_type, total) -> farmers.
+    """
+    moves = defaultdict(int)
+    for quantity, _ in per_farmer.values():
+        _move(moves, '', 0, quantity)
+    for (_, crop_type), (quantity, _) in per_type.items():
+        _move(moves, crop_type, 0, quantity)
+    return {key: farmers for key, farmers in moves.items() if farmers}
+
+
+def rebuild_totals():
+    """
+    Replaces the totals and daily rollup tables with values recomputed from ``Crop``.
+    """
+    from .models import DailyCropTotal, FarmerCropTotal, FarmerTotal, RankBucket
+
+    per_farmer, per_type, per_day = expected_totals()
+    with transaction.atomic():
+        DailyCropTotal.objects.all().delete()
+        RankBucket.objects.all().delete()
+        FarmerCropTotal.objects.all().delete()
+        FarmerTotal.objects.all().delete()
+        FarmerTotal.objects.bulk_create(
+            [FarmerTotal(farmer_id=farmer_id, total_quantity=quantity, crop_count=count)
+             for farmer_id, (quantity, count) in per_farmer.items()],
+            batch_size=1000
+        )
+        FarmerCropTotal.objects.bulk_create(
+            [FarmerCropTotal(farmer_id=farmer_id, crop_type=crop_type, total_quantity=quantity, crop_count=count)
+             for (farmer_id, crop_type), (quantity, count) in per_type.items()],
+            batch_size=1000
+        )
+        RankBucket.objects.bulk_create(
+            [RankBucket(crop_type=crop_type, total_quantity=total, farmers=farmers)
+             for (crop_type, total), farmers in expected_buckets(per_farmer, per_type).items()],
+            batch_size=1000
+        )
+        DailyCropTotal.objects.bulk_create(
+            [DailyCropTotal(farmer_id=farmer_id, crop_type=crop_type, day=day, total_quantity=quantity, crop_count=count)
+             for (farmer_id, crop_type, day), (quantity, count) in per_day.items()],
+            batch_size=1000
+        )
+    return len(per_farmer), len(per_type), len(per_day)
+
+
+def verify_totals():
+    """
+    Compares the totals tables against ``Crop``.
+    Returns a list of (table, key, expected, actual) mismatches.
+    """
+    from .models import DailyCropTotal, FarmerCropTotal, FarmerTotal, RankBucket
+
+    per_farmer, per_type, per_day = expected_totals()
+    actual_farmer = {
+        row['farmer_id']: (row['total_quantity'], row['crop_count'])
+        for row in FarmerTotal.objects.values('farmer_id', 'total_quantity', 'crop_count')
+    }
+    actual_type = {
+        (row['farmer_id'], row['crop_type']): (row['total_quantity'], row['crop_count'])
+        for row in FarmerCropTotal.objects.values('farmer_id', 'crop_type', 'total_quantity', 'crop_count')
+    }
+    actual_buckets = {
+        (row['crop_type'], row['total_quantity']): row['farmers']
+        for row in RankBucket.objects.filter(farmers__gt=0).values('crop_type', 'total_quantity', 'farmers')
+    }
+    actual_day = {
+        (row['farmer_id'], row['crop_type'], row['day']): (row['total_quantity'], row['crop_count'])
+        for row in DailyCropTotal.objects.values('farmer_id', 'crop_type', 'day', 'total_quantity', 'crop_count')
+    }
+
+    mismatches = []
+    checks = (
+        ('farmer', per_farmer, actual_farmer, (0, 0)),
+        ('farmer_crop_type', per_type, actual_type, (0, 0)),
+        ('rank_bucket', expected_buckets(per_farmer, per_type), actual_buckets, 0),
+        ('daily_crop_total', per_day, actual_day, (0, 0)),
+    )
+    for table, expected, actual, empty in checks:
+        for key in expected.keys() | actual.keys():
+            # Rows drained to zero are equivalent to missing rows.
+            want, got = expected.get(key, empty), actual.get(key, empty)
+            if want != got:
+                mismatches.append((table, key, want, got))
+    return mismatches
@@ -0,0 +1,97 @@
+"""
+Harvest time series over the maintained daily rollups.
+
+``DailyCropTotal`` holds one row per farmer, crop type and day, so a series
+over any range sums at most (days x crop types) rows for one farmer, never the
+raw crop table. Days are grouped into weeks (starting Monday) or months, and
+periods without harvest are returned as zeros so charts need no gap filling.
+"""
+from datetime import timedelta
+from django.db.models import Sum
+from .models import DailyCropTotal
+
+DAY = 'day'
+WEEK = 'week'
+MONTH = 'month'
+INTERVALS = (DAY, WEEK, MONTH)
+
+# Range used when no ?start= is given, in periods ending with ?end=.
+DEFAULT_PERIODS = {DAY: 30, WEEK: 12, MONTH: 12}
+# Longest range one request may ask for (about ten years).
+MAX_RANGE_DAYS = 3660
+
+
+def period_start(day, interval):
+    if interval == WEEK:
+        return day - timedelta(days=day.weekday())
+    if interval == MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, interval):
+    if interval == WEEK:
+        return start + timedelta(days=7)
+    if interval == MONTH:
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def periods(start, end, interval):
+    """
+    Start dates of every period overlapping start..end (inclusive).
+    """
+    current = period_start(start, interval)
+    while current <= end:
+        yield current
+        current = next_period(current, interval)
+
+
+def within_calendar(start, end, interval):
+    """
+    True when the periods of start..end, and the one following them, fit
+    between date.min and date.max, so walking them cannot overflow.
+    """
+    try:
+        period_start(start, interval)
+        next_period(period_start(end, interval), interval)
+    except OverflowError:
+        return False
+    return True
+
+
+def default_start(end, interval):
+    """
+    Start of the DEFAULT_PERIODS periods ending with ``end``'s. Raises
+    OverflowError when they would begin before date.min.
+    """
+    start = period_start(end, interval)
+    for _ in range(DEFAULT_PERIODS[interval] - 1):
+        start = period_start(start - timedelta(days=1), interval)
+    return start
+
+
+def series(start, end, interval=DAY, farmer_id=None, crop_type=None):
+    """
+    Total quantity and crop count per period between ``start`` and ``end``
+    (inclusive dates), optionally for one farmer and/or one crop type.
+    """
+    rows = DailyCropTotal.objects.filter(day__gte=start, day__lte=end)
+    if farmer_id is not None:
+        rows = rows.filter(farmer_id=farmer_id)
+    if crop_type:
+        rows = rows.filter(crop_type=crop_type)
+
+    # Grouping by the plain day column lets the database use its indexes;
+    # days are folded into weeks or months here, at most a few thousand rows.
+    totals = {period: [0, 0] for period in periods(start, end, interval)}
+    daily = rows.values('day').annotate(quantity=Sum('total_quantity'), count=Sum('crop_count')).order_by()
+    for day, quantity, count in daily.values_list('day', 'quantity', 'count'):
+        entry = totals[period_start(day, interval)]
+        entry[0] += quantity
+        entry[1] += count
+
+    return [
+        {'period': period.isoformat(), 'total_quantity': quantity, 'crop_count': count}
+        for period, (quantity, count) in totals.items()
+    ]
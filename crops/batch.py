@@ -0,0 +1,147 @@
+"""
+Batch corrections of a farmer's crops: partial updates and deletions of many
+crops in one request.
+
+Ownership is checked for the whole batch with one query over the requested
+ids; crops the user does not own are reported as not found, like the detail
+endpoint does. Updates are written with ``bulk_update`` and deletions with a
+single DELETE, all in one transaction. The crop totals are moved once for the
+whole batch from the locked rows, rather than by CropQuerySet for each write.
+"""
+from core import caching
+from .models import Crop
+from django.db import models, transaction
+from .aggregates import CropDeltas, rollup_day
+from rest_framework.fields import empty
+from .serializers import CropSerializer
+from .filters import in_field_range
+from rest_framework.exceptions import ValidationError
+
+UPDATE_FIELDS = ('name', 'crop_type', 'quantity')
+
+
+class BatchAborted(Exception):
+    pass
+
+
+def parse_batch(data, max_items):
+    """
+    Returns (updates, deletes, results) for a request body of the form
+    ``{"update": [{"id": 1, "quantity": 5}, ...], "delete": [2, 3]}``.
+    Items that cannot be applied get their failed result in ``results``,
+    keyed by their position in the request.
+    """
+    if not isinstance(data, dict):
+        raise ValidationError({'non_field_errors': ['Expected an object with "update" and/or "delete" lists.']})
+    updates, deletes = data.get('update', []), data.get('delete', [])
+    if not isinstance(updates, list) or not isinstance(deletes, list):
+        raise ValidationError({'non_field_errors': ['"update" and "delete" must be lists.']})
+    if not updates and not deletes:
+        raise ValidationError({'non_field_errors': ['Nothing to update or delete.']})
+    if len(updates) + len(deletes) > max_items:
+        raise ValidationError({'non_field_errors': [f'At most {max_items} items per batch.']})
+
+    fields = CropSerializer().fields
+    results, seen = {}, set()
+    parsed_updates, parsed_deletes = [], []
+    items = [('update', item) for item in updates] + [('delete', item) for item in deletes]
+    for position, (action, item) in enumerate(items):
+        crop_id = item.get('id') if action == 'update' and isinstance(item, dict) else item
+        if action == 'update' and not isinstance(item, dict):
+            results[position] = failed(None, action, {'non_field_errors': ['Each update must be an object.']})
+            continue
+        if isinstance(crop_id, bool) or not isinstance(crop_id, int):
+            results[position] = failed(crop_id, action, {'id': ['A valid integer is required.']})
+            continue
+        if not in_field_range(crop_id, Crop._meta.pk):
+            # Never sent to the database, which cannot compare it.
+            results[position] = failed(crop_id, action, {'id': ['A valid crop id is required.']})
+            continue
+        if crop_id in seen:
+            results[position] = failed(crop_id, action, {'id': ['Crop appears more than once in the batch.']})
+            continue
+        seen.add(crop_id)
+        if action == 'delete':
+            parsed_deletes.append((position, crop_id))
+            continue
+
+        values, errors = {}, {}
+        for name in UPDATE_FIELDS:
+            if name not in item:
+                continue
+            try:
+                values[name] = fields[name].run_validation(item.get(name, empty))
+            except ValidationError as exc:
+                errors[name] = exc.detail
+        if not values and not errors:
+            errors['non_field_errors'] = [f'Nothing to update; send any of {", ".join(UPDATE_FIELDS)}.']
+        if errors:
+            results[position] = failed(crop_id, action, errors)
+        else:
+            parsed_updates.append((position, crop_id, values))
+    return parsed_updates, parsed_deletes, results
+
+
+def failed(crop_id, action, errors):
+    return {'id': crop_id, 'action': action, 'status': 'failed', 'errors': errors}
+
+
+def apply_batch(user, updates, deletes, results, abort_on_error=False):
+    """
+    Applies parsed ``updates`` and ``deletes`` to ``user``'s crops inside one
+    transaction. Returns a report with the updated/deleted/failed counts and
+    one result per request item, in request order.
+    """
+    report = {'updated': 0, 'deleted': 0, 'failed': 0, 'results': []}
+    try:
+        with transaction.atomic():
+            ids = [crop_id for _, crop_id, _ in updates] + [crop_id for _, crop_id in deletes]
+            # The ownership check for the whole batch, locking the rows it returns.
+            owned = {crop.pk: crop for crop in Crop.objects.select_for_update().filter(farmer=user, pk__in=ids)}
+            missing = {'non_field_errors': ['Crop not found.']}
+
+            deltas, changed, fields = CropDeltas(), [], set()
+            for position, crop_id, values in updates:
+                crop = owned.get(crop_id)
+                if crop is None:
+                    results[position] = failed(crop_id, 'update', missing)
+                    continue
+                farmer_id, crop_type, quantity, created = crop._persisted
+                deltas.add(farmer_id, crop_type, -quantity, -1, rollup_day(created))
+                for name, value in values.items():
+                    setattr(crop, name, value)
+                deltas.add_crop(crop)
+                fields.update(values)
+                changed.append(crop)
+                results[position] = {'id': crop_id, 'action': 'update', 'status': 'updated'}
+
+            doomed = []
+            for position, crop_id in deletes:
+                if crop_id not in owned:
+                    results[position] = failed(crop_id, 'delete', missing)
+                    continue
+                deltas.add_crop(owned[crop_id], sign=-1)
+                doomed.append(crop_id)
+                results[position] = {'id': crop_id, 'action': 'delete', 'status': 'deleted'}
+
+            report['failed'] = sum(result['status'] == 'failed' for result in results.values())
+            if report['failed'] and abort_on_error:
+                raise BatchAborted
+
+            # Plain querysets: the totals move once below, not once per statement.
+            if changed:
+                models.QuerySet(Crop).bulk_update(changed, sorted(fields))
+                for crop in changed:
+                    crop._persisted = crop._tracked_values()
+            if doomed:
+                models.QuerySet(Crop).filter(pk__in=doomed).delete()
+            deltas.apply()
+            if changed or doomed:
+                caching.invalidate('crops')
+            report['updated'], report['deleted'] = len(changed), len(doomed)
+    except BatchAborted:
+        for result in results.values():
+            if result['status'] != 'failed':
+                result['status'] = 'skipped'
+    report['results'] = [results[position] for position in sorted(results)]
+    return report
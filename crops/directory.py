@@ -0,0 +1,62 @@
+"""
+Crop totals for the farmer directory.
+
+Read from the maintained totals rather than aggregated from crops: the total
+quantity and crop count come from a join to ``FarmerTotal``, the last harvest
+from the farmer's newest ``DailyCropTotal`` day (a backward range scan of its
+unique index), and the per-type breakdown from ``FarmerCropTotal`` in one query
+per page.
+"""
+from collections import defaultdict
+from django.db.models import F, OuterRef, PositiveBigIntegerField, PositiveIntegerField, Subquery, Value
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+from .models import DailyCropTotal, FarmerCropTotal
+
+TOTALS = ('total_quantity', 'crop_count')
+ORDERINGS = ('created', *TOTALS)
+
+
+def with_totals(farmers):
+    """
+    Annotates a User queryset with total_quantity, crop_count (0 without
+    crops) and last_harvest (None without crops).
+    """
+    last_day = (
+        DailyCropTotal.objects.filter(farmer=OuterRef('pk'), crop_count__gt=0)
+        .order_by('-day').values('day')[:1]
+    )
+    return farmers.annotate(
+        total_quantity=Coalesce(F('cropTotal__total_quantity'), Value(0), output_field=PositiveBigIntegerField()),
+        crop_count=Coalesce(F('cropTotal__crop_count'), Value(0), output_field=PositiveIntegerField()),
+        last_harvest=Subquery(last_day),
+    )
+
+
+def breakdowns(farmer_ids):
+    """
+    {farmer id: {crop type: {"total_quantity", "crop_count"}}} for the given farmers.
+    """
+    rows = (
+        FarmerCropTotal.objects.filter(farmer_id__in=farmer_ids, crop_count__gt=0)
+        .order_by('farmer_id', 'crop_type')
+        .values_list('farmer_id', 'crop_type', 'total_quantity', 'crop_count')
+    )
+    result = defaultdict(dict)
+    for farmer_id, crop_type, quantity, count in rows:
+        result[farmer_id][crop_type] = {'total_quantity': quantity, 'crop_count': count}
+    return result
+
+
+def ordering(value):
+    """
+    Keyset ordering for ?ordering=, e.g. "-total_quantity" -> ('-total_quantity', '-id').
+    Returns None when ``value`` is empty.
+    """
+    if not value:
+        return None
+    field = value.lstrip('-')
+    if field not in ORDERINGS or value.count('-') > 1:
+        raise ValidationError({'ordering': f'Must be one of: {", ".join(ORDERINGS)}, optionally prefixed with -.'})
+    direction = '-' if value.startswith('-') else ''
+    return (value, f'{direction}id')
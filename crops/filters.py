@@ -0,0 +1,65 @@
+from core import streaming
+from .models import Crop
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.exceptions import ValidationError
+from django.db.backends.base.operations import BaseDatabaseOperations
+
+
+def crop_filters(request):
+    """
+    Filter kwargs from the query string:
+    - crop_type: one of Crop.CROP_TYPES
+    - farmer: farmer id
+    - created_after / created_before: ISO dates or datetimes
+    - quantity_min / quantity_max: inclusive bounds
+    """
+    params = request.query_params
+    filters = streaming.parse_created_range(request)
+
+    crop_type = params.get('crop_type')
+    if crop_type:
+        if crop_type not in dict(Crop.CROP_TYPES):
+            raise ValidationError({'crop_type': f'Must be one of: {", ".join(dict(Crop.CROP_TYPES))}.'})
+        filters['crop_type'] = crop_type
+    farmer = parse_integer(params, 'farmer', Crop._meta.get_field('farmer').target_field, 'A valid farmer id is required.')
+    if farmer is not None:
+        filters['farmer_id'] = farmer
+    for param, lookup in (('quantity_min', 'quantity__gte'), ('quantity_max', 'quantity__lte')):
+        value = parse_integer(params, param, Crop._meta.get_field('quantity'), 'A valid non-negative integer is required.')
+        if value is not None:
+            filters[lookup] = value
+    return filters
+
+
+def parse_integer(params, param, field, message):
+    """
+    The non-negative integer query parameter ``param`` (None when absent),
+    within the range of the model ``field`` it is compared with, so that the
+    database never sees a value it cannot store. Raises a 400 with ``message``.
+    """
+    value = params.get(param)
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValidationError({param: message})
+    if not in_field_range(number, field):
+        raise ValidationError({param: message})
+    return number
+
+
+def in_field_range(number, field):
+    """
+    True when the non-negative ``number`` fits the integer model ``field``.
+    """
+    low, high = BaseDatabaseOperations.integer_field_ranges[field.get_internal_type()]
+    return max(low, 0) <= number <= high
+
+
+class CropFilter(BaseFilterBackend):
+    """
+    Applies ``crop_filters()`` to a crop queryset.
+    """
+    def filter_queryset(self, request, queryset, view):
+        return queryset.filter(**crop_filters(request))
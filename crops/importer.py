@@ -0,0 +1,138 @@
+"""
+Streaming bulk import of crops from CSV or NDJSON request bodies.
+
+Rows are decoded one line at a time, validated with the field rules of
+``CropSerializer`` and inserted with ``bulk_create`` in fixed-size batches, so
+memory use depends on the batch size rather than the upload size.
+``Crop.objects.bulk_create`` keeps the crop totals up to date.
+"""
+import csv
+import json
+import codecs
+from .models import Crop
+from django.db import transaction
+from rest_framework.fields import empty
+from django.contrib.auth import get_user_model
+from .serializers import CropSerializer
+from rest_framework.exceptions import ValidationError
+
+User = get_user_model()
+
+CSV_TYPES = ('text/csv', 'application/csv')
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/jsonlines')
+ROW_FIELDS = ('name', 'crop_type', 'quantity')
+
+
+class ImportAborted(Exception):
+    pass
+
+
+def iter_rows(stream, content_type, encoding='utf-8-sig'):
+    """
+    Yields (line number, row dict or error message) for each record of ``stream``.
+    """
+    lines = codecs.iterdecode(stream, encoding)
+    if content_type in CSV_TYPES:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, 'Too many values in row.'
+            else:
+                yield reader.line_num, row
+        return
+
+    for line_num, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_num, 'Invalid JSON.'
+            continue
+        yield line_num, row if isinstance(row, dict) else 'Each line must be a JSON object.'
+
+
+class CropRowValidator:
+    """
+    Applies CropSerializer's field validation to a single import row.
+    Admins must name the farmer with ``farmer_id``; farmers always import for themselves.
+    """
+    def __init__(self, user):
+        self.user = user
+        self.fields = CropSerializer().fields
+        self.farmers = {}
+
+    def validate(self, row):
+        values, errors = {}, {}
+        for name in ROW_FIELDS:
+            try:
+                values[name] = self.fields[name].run_validation(row.get(name, empty))
+            except ValidationError as exc:
+                errors[name] = exc.detail
+
+        if self.user.role == User.Role.ADMIN:
+            try:
+                values['farmer_id'] = self.farmer(row.get('farmer_id', empty)).id
+            except ValidationError as exc:
+                errors['farmer_id'] = exc.detail
+        else:
+            values['farmer_id'] = self.user.id
+        return values, errors
+
+    def farmer(self, value):
+        # Each farmer is looked up once per import, not once per row.
+        key = str(value)
+        if key not in self.farmers:
+            try:
+                self.farmers[key] = self.fields['farmer_id'].run_validation(value)
+            except ValidationError as exc:
+                self.farmers[key] = exc
+        if isinstance(self.farmers[key], ValidationError):
+            raise self.farmers[key]
+        return self.farmers[key]
+
+
+def import_crops(rows, user, batch_size, abort_on_error=False, max_reported_errors=100):
+    """
+    Validates and inserts ``rows`` inside one transaction.
+    Returns a report with the created/failed counts and the first row errors.
+    """
+    validator = CropRowValidator(user)
+    report = {'created': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+    batch = []
+
+    def flush():
+        Crop.objects.bulk_create(batch)
+        report['created'] += len(batch)
+        batch.clear()
+
+    try:
+        with transaction.atomic():
+            for line_num, row in rows:
+                if isinstance(row, str):
+                    values, errors = None, {'non_field_errors': [row]}
+                else:
+                    values, errors = validator.validate(row)
+
+                if errors:
+                    report['failed'] += 1
+                    if len(report['errors']) < max_reported_errors:
+                        report['errors'].append({'row': line_num, 'errors': errors})
+                    else:
+                        report['errors_truncated'] = True
+                    if abort_on_error:
+                        raise ImportAborted
+                    continue
+
+                batch.append(Crop(**values))
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+    except ImportAborted:
+        report['created'] = 0
+    except UnicodeDecodeError:
+        report['created'] = 0
+        report['failed'] += 1
+        report['errors'].append({'row': None, 'errors': {'non_field_errors': ['File is not valid UTF-8.']}})
+    return report
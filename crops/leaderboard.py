@@ -0,0 +1,116 @@
+"""
+Farmer leaderboards over the maintained crop totals.
+
+Rows come from ``FarmerTotal`` (global) or ``FarmerCropTotal`` (per crop type)
+through their ``(-total_quantity, farmer)`` indexes. Ranks come from
+``RankBucket``, a maintained histogram of how many farmers hold each total:
+a competition rank is one plus the farmers in buckets above, a dense rank one
+plus the number of those buckets. That is one row per distinct total above the
+farmer rather than per farmer, which saves a lot where totals tie. Totals that
+are spread out leave nearly one bucket per farmer, and ranks low in the table
+then cost close to counting the farmers above.
+"""
+from django.db.models import Sum
+from .models import FarmerCropTotal, FarmerTotal, RankBucket
+
+COMPETITION = 'competition'
+DENSE = 'dense'
+TIE_MODES = (COMPETITION, DENSE)
+
+
+def ranking_queryset(crop_type=None):
+    """
+    Farmers with at least some harvest, best first. Ties are listed by farmer id
+    so pages are stable even though tied farmers share a rank.
+    """
+    if crop_type:
+        queryset = FarmerCropTotal.objects.filter(crop_type=crop_type)
+    else:
+        queryset = FarmerTotal.objects.all()
+    return queryset.filter(total_quantity__gt=0).order_by('-total_quantity', 'farmer_id')
+
+
+def buckets(crop_type=None):
+    return RankBucket.objects.filter(crop_type=crop_type or '', farmers__gt=0)
+
+
+def rank_of(total_quantity, crop_type=None, ties=COMPETITION):
+    """
+    Rank a farmer with ``total_quantity`` holds. Farmers without crops rank
+    after everyone who has some. Sums every bucket above the total, so the
+    cost grows with the number of distinct totals above it.
+    """
+    above = buckets(crop_type).filter(total_quantity__gt=total_quantity)
+    if ties == DENSE:
+        return above.count() + 1
+    return (above.aggregate(farmers=Sum('farmers'))['farmers'] or 0) + 1
+
+
+def top(limit, offset=0, crop_type=None, ties=COMPETITION):
+    rows = list(_rows(ranking_queryset(crop_type)[offset:offset + limit]))
+    return _ranked(rows, crop_type, ties)
+
+
+def around(farmer_id, radius, crop_type=None, ties=COMPETITION):
+    """
+    Returns (rank, rows) for ``farmer_id`` and up to ``radius`` farmers on each side.
+    """
+    queryset = ranking_queryset(crop_type)
+    me = list(_rows(queryset.filter(farmer_id=farmer_id)))
+    if not me:
+        return rank_of(0, crop_type, ties), []
+
+    mine = me[0]['total_quantity']
+    # Each neighbour lookup is split into "same total" and "other totals" so
+    # both halves are plain ranges on the (-total_quantity, farmer) index.
+    above = list(_rows(queryset.filter(total_quantity=mine, farmer_id__lt=farmer_id).order_by('-farmer_id')[:radius]))
+    if len(above) < radius:
+        above += _rows(
+            queryset.filter(total_quantity__gt=mine)
+            .order_by('total_quantity', '-farmer_id')[:radius - len(above)]
+        )
+    below = list(_rows(queryset.filter(total_quantity=mine, farmer_id__gt=farmer_id)[:radius]))
+    if len(below) < radius:
+        below += _rows(queryset.filter(total_quantity__lt=mine)[:radius - len(below)])
+
+    rows = _ranked(above[::-1] + me + below, crop_type, ties)
+    return rows[len(above)]['rank'], rows
+
+
+def _rows(queryset):
+    return queryset.values('farmer_id', 'farmer__username', 'total_quantity', 'crop_count')
+
+
+def _ranked(rows, crop_type, ties):
+    """
+    Assigns ranks to consecutive leaderboard rows. The first row is ranked from
+    the buckets above it; each later total steps past the previous bucket.
+    """
+    if not rows:
+        return []
+
+    farmers_at = dict(
+        buckets(crop_type)
+        .filter(total_quantity__gte=rows[-1]['total_quantity'], total_quantity__lte=rows[0]['total_quantity'])
+        .values_list('total_quantity', 'farmers')
+    )
+    ranked = []
+    previous = None
+    for row in rows:
+        total = row['total_quantity']
+        if previous is None:
+            rank = rank_of(total, crop_type, ties)
+        elif total != previous['total_quantity']:
+            step = 1 if ties == DENSE else farmers_at.get(previous['total_quantity'], 1)
+            rank = previous['rank'] + step
+        else:
+            rank = previous['rank']
+        previous = {
+            'rank': rank,
+            'farmer_id': row['farmer_id'],
+            'farmer': row['farmer__username'],
+            'total_quantity': total,
+            'crop_count': row['crop_count'],
+        }
+        ranked.append(previous)
+    return ranked
@@ -0,0 +1,238 @@
+import json
+import time
+import random
+import platform
+import threading
+import subprocess
+from collections import Counter
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from django.db import connection
+from crops.models import Crop
+from django.test import Client
+from django.test.utils import override_settings
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.core.management.base import BaseCommand, CommandError
+
+# Name of the crops added by the create scenario, deleted after the run.
+BENCH_CROP_NAME = 'benchapi'
+
+# (name, role, method, url name, url kwargs, payload). Roles are 'admin',
+# 'farmer' or None; kwargs and payload are called with the acting farmer and
+# one of their crops. Writes leave the data as they found it.
+SCENARIOS = [
+    ('profile', 'farmer', 'get', 'user_profile_view', None, None),
+    ('farmer stats', 'farmer', 'get', 'farmer_crop_stats_view', None, None),
+    ('farmer analytics', 'farmer', 'get', 'farmer_crop_analytics_view', None, None),
+    ('farmer crop list', 'farmer', 'get', 'farmer_crop_list_create_view', None, lambda farmer, crop: {'page_size': 50}),
+    ('farmer crop detail', 'farmer', 'get', 'farmer_crop_detail_view', lambda farmer, crop: {'pk': crop[0]}, None),
+    ('farmer crop rename', 'farmer', 'patch', 'farmer_crop_detail_view', lambda farmer, crop: {'pk': crop[0]}, lambda farmer, crop: {'name': crop[1]}),
+    ('farmer crop create', 'farmer', 'post', 'farmer_crop_list_create_view', None, lambda farmer, crop: {'name': BENCH_CROP_NAME, 'crop_type': 'other', 'quantity': 1}),
+    ('farmer leaderboard', 'farmer', 'get', 'farmer_leaderboard_view', None, None),
+    ('leaderboard', 'farmer', 'get', 'leaderboard_view', None, None),
+    ('admin stats', 'admin', 'get', 'admin_crop_stats_view', None, None),
+    ('admin analytics', 'admin', 'get', 'admin_crop_analytics_view', None, lambda farmer, crop: {'interval': 'week'}),
+    ('admin crop list', 'admin', 'get', 'farmer_crop_list_create_view', None, lambda farmer, crop: {'page_size': 50}),
+    ('admin farmer list', 'admin', 'get', 'farmer_list_create_view', None, lambda farmer, crop: {'page_size': 50}),
+    ('admin farmer detail', 'admin', 'get', 'farmer_detail_view', lambda farmer, crop: {'pk': farmer.pk}, None),
+    ('token refresh', None, 'post', 'token_refresh', None, lambda farmer, crop: {'refresh': str(RefreshToken.for_user(farmer))}),
+]
+# Opt-in: these dominate a run (password hashing, full-table exports).
+EXTRA_SCENARIOS = [
+    ('login', None, 'post', 'login_view', None, None),
+    ('admin crop export', 'admin', 'get', 'admin_crop_export_view', None, None),
+]
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, cwd=settings.BASE_DIR
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks every API endpoint in-process: for each scenario, --concurrency '
+        'authenticated clients send --requests requests in total against the '
+        'current database (see seeddata), and throughput, p50/p95/p99 latency and '
+        'queries per request are reported. Save runs with --output and compare '
+        'two with --compare. Use loadtest to measure a running server instead.'
+    )
+
+    def add_arguments(self, parser):
+        names = [name for name, *_ in SCENARIOS + EXTRA_SCENARIOS]
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=400, help='Requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per scenario.')
+        parser.add_argument('--only', nargs='+', choices=names, metavar='SCENARIO', help='Scenarios to run: ' + ', '.join(names))
+        parser.add_argument('--farmers', type=int, default=200, help='Farmers sampled to act as clients.')
+        parser.add_argument('--password', default='Seed@12345', help='Password of the sampled farmers (login scenario).')
+        parser.add_argument('--unique', action='store_true', help='Add a unique query parameter so no response is served from cache.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='A JSON file from an earlier run to compare against.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        admin = User.objects.filter(role=User.Role.ADMIN, is_active=True).first()
+        if admin is None:
+            raise CommandError('No admin user; run createadmin first.')
+        rng = random.Random(options['seed'])
+        farmer_ids = list(Crop.objects.values_list('farmer_id', flat=True).order_by().distinct()[:options['farmers'] * 5])
+        farmers = list(User.objects.filter(pk__in=rng.sample(farmer_ids, min(len(farmer_ids), options['farmers']))))
+        if not farmers:
+            raise CommandError('No farmers with crops; run seeddata first.')
+        crops = {}
+        for crop_id, name, farmer_id in Crop.objects.filter(farmer__in=farmers).values_list('id', 'name', 'farmer_id'):
+            crops.setdefault(farmer_id, (crop_id, name))
+        tokens = {user.pk: self.access_token(user) for user in [admin, *farmers]}
+
+        selected = options['only'] or [name for name, *_ in SCENARIOS]
+        scenarios = [scenario for scenario in SCENARIOS + EXTRA_SCENARIOS if scenario[0] in selected]
+        results = {}
+        self.stdout.write(f'{"scenario":<22} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8}  statuses')
+        # The test client's host; everything else runs as configured.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], THROTTLE_ENABLED=False):
+            for scenario in scenarios:
+                results[scenario[0]] = result = self.run_scenario(scenario, admin, farmers, crops, tokens, rng, options)
+                self.stdout.write(
+                    f'{scenario[0]:<22} {result["throughput"]:>8.1f} {result["p50_ms"]:>8.1f} {result["p95_ms"]:>8.1f} '
+                    f'{result["p99_ms"]:>8.1f} {result["queries_per_request"]:>8.1f}  '
+                    + ' '.join(f'{status}:{count}' for status, count in sorted(result['statuses'].items()))
+                )
+        self.cleanup()
+
+        report = {
+            'revision': git_revision(),
+            'recorded_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'farmers': User.objects.filter(role=User.Role.FARMER).count(),
+            'crops': Crop.objects.count(),
+            'options': {key: options[key] for key in ('concurrency', 'requests', 'warmup', 'unique', 'seed')},
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f'Saved to {options["output"]}.')
+        if options['compare']:
+            self.compare(options['compare'], report)
+
+    def access_token(self, user):
+        refresh = RefreshToken.for_user(user)
+        refresh['role'] = user.role
+        return str(refresh.access_token)
+
+    def run_scenario(self, scenario, admin, farmers, crops, tokens, rng, options):
+        name, role, method, url_name, kwargs, payload = scenario
+        jobs = []
+        for number in range(options['warmup'] + options['requests']):
+            farmer = rng.choice(farmers)
+            crop = crops[farmer.pk]
+            user = admin if role == 'admin' else farmer
+            data = payload(farmer, crop) if payload else {}
+            if url_name == 'login_view':
+                data = {'email': farmer.email, 'password': options['password']}
+            url = reverse(url_name, kwargs=kwargs(farmer, crop) if kwargs else None)
+            if options['unique'] and method == 'get':
+                data = {**data, '_': number}
+            extra = {'HTTP_AUTHORIZATION': f'Bearer {tokens[user.pk]}'} if role else {}
+            if method != 'get':
+                extra['content_type'] = 'application/json'
+            jobs.append((url, data, extra))
+
+        warmup, timed = jobs[:options['warmup']], jobs[options['warmup']:]
+        self.drive(method, warmup, options['concurrency'])
+        started = time.perf_counter()
+        samples = self.drive(method, timed, options['concurrency'])
+        duration = time.perf_counter() - started
+
+        latencies = sorted(latency for latency, _, _ in samples)
+        return {
+            'requests': len(samples),
+            'seconds': round(duration, 3),
+            'throughput': len(samples) / duration,
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'max_ms': latencies[-1],
+            'queries_per_request': sum(queries for _, queries, _ in samples) / len(samples),
+            'statuses': dict(Counter(str(status) for _, _, status in samples)),
+        }
+
+    def drive(self, method, jobs, concurrency):
+        """
+        Sends the jobs from `concurrency` threads, each with its own client and
+        database connection. Returns (latency ms, queries, status) per request.
+        """
+        pending = iter(jobs)
+        lock = threading.Lock()
+        samples = []
+
+        def client():
+            queries = 0
+
+            def count_queries(execute, sql, params, many, context):
+                nonlocal queries
+                queries += 1
+                return execute(sql, params, many, context)
+
+            browser = Client(raise_request_exception=False)
+            try:
+                while True:
+                    with lock:
+                        job = next(pending, None)
+                    if job is None:
+                        break
+                    url, data, headers = job
+                    queries = 0
+                    started = time.perf_counter()
+                    with connection.execute_wrapper(count_queries):
+                        response = getattr(browser, method)(url, data, **headers)
+                        if response.streaming:
+                            for _ in response.streaming_content:
+                                pass
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        samples.append((elapsed, queries, response.status_code))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples
+
+    def cleanup(self):
+        # Crops added by the create scenario.
+        Crop.objects.filter(name=BENCH_CROP_NAME).delete()
+
+    def compare(self, path, report):
+        try:
+            with open(path) as handle:
+                baseline = json.load(handle)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Cannot read {path}: {error}')
+        self.stdout.write(f'\nCompared with {baseline.get("revision") or path} ({baseline["crops"]} crops):')
+        self.stdout.write(f'{"scenario":<22} {"req/s":>10} {"p95 ms":>10} {"queries":>10}')
+        for name, result in report['results'].items():
+            before = baseline['results'].get(name)
+            if before is None:
+                continue
+            change = lambda key: (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            self.stdout.write(
+                f'{name:<22} {change("throughput"):>+9.1f}% {change("p95_ms"):>+9.1f}% '
+                f'{result["queries_per_request"] - before["queries_per_request"]:>+10.1f}'
+            )
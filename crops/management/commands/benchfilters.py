@@ -0,0 +1,96 @@
+import re
+import time
+import statistics
+from datetime import timedelta
+from django.db import connection
+from django.utils import timezone
+from crops.models import Crop
+from crops.views import FarmerCropListCreateView
+from users.views import FarmerListCreateView
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the crop and farmer list filters and searches as the list endpoints '
+        'build them (a page of --page-size rows, newest first) and reports the '
+        'median time and whether each query plan is driven by an index or scans '
+        'the table. Seed millions of crops with seeddata first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query; the median is reported.')
+        parser.add_argument('--plans', action='store_true', help='Print each query plan.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        admin = User.objects.filter(role=User.Role.ADMIN).first()
+        crop = Crop.objects.order_by('-id').first()
+        if admin is None or crop is None:
+            raise CommandError('Needs an admin and some crops; run seeddata and create an admin first.')
+        farmer = crop.farmer
+        today = timezone.localdate()
+        word = crop.name.split()[0]
+        infix = word[1:4] if len(word) >= 4 else word
+        self.stdout.write(f'{Crop.objects.count()} crops, {User.objects.count()} users on {connection.vendor}.')
+
+        cases = [
+            (FarmerCropListCreateView, {'crop_type': crop.crop_type}),
+            (FarmerCropListCreateView, {'farmer': farmer.id}),
+            (FarmerCropListCreateView, {'created_after': (today - timedelta(days=30)).isoformat(), 'created_before': (today - timedelta(days=29)).isoformat()}),
+            (FarmerCropListCreateView, {'quantity_min': 1000}),
+            (FarmerCropListCreateView, {'quantity_min': 10, 'quantity_max': 20, 'crop_type': crop.crop_type}),
+            (FarmerCropListCreateView, {'search': word[:3], 'search_mode': 'prefix'}),
+            (FarmerCropListCreateView, {'search': infix}),
+            (FarmerCropListCreateView, {'search': infix, 'farmer': farmer.id}),
+            (FarmerListCreateView, {'search': farmer.username[:4], 'search_mode': 'prefix'}),
+            (FarmerListCreateView, {'search': farmer.username[-4:]}),
+            (FarmerListCreateView, {'search': farmer.email.split('@')[1][:6]}),
+        ]
+        self.stdout.write(f'{"list":<8} {"query":<62} {"rows":>5} {"ms":>9}  plan')
+        for view_class, params in cases:
+            queryset = self.page(view_class, params, admin, options['page_size'])
+            elapsed, rows = self.measure(queryset, options['repeat'])
+            plan = queryset.explain()
+            name = 'crops' if view_class is FarmerCropListCreateView else 'farmers'
+            query = '&'.join(f'{key}={value}' for key, value in params.items())
+            self.stdout.write(f'{name:<8} {query:<62} {rows:>5} {elapsed:>9.2f}  {self.summarize(plan)}')
+            if options['plans']:
+                self.stdout.write(plan)
+
+    def page(self, view_class, params, user, page_size):
+        """
+        The values() query the list endpoint runs for one keyset page.
+        """
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+        view = view_class(request=request, format_kwarg=None, args=(), kwargs={})
+        queryset = view.filter_queryset(view.get_queryset())
+        return view.read_serializer.values(queryset).order_by('-created', '-id')[:page_size]
+
+    def measure(self, queryset, repeat):
+        rows = len(list(queryset))  # warm up
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples), rows
+
+    def summarize(self, plan):
+        """
+        The indexes a plan uses, or the tables it reads in full.
+        """
+        if connection.vendor == 'postgresql':
+            indexes = re.findall(r'Index (?:Only )?Scan(?: Backward)? using (\w+)', plan) + re.findall(r'Bitmap Index Scan on (\w+)', plan)
+            scans = re.findall(r'Seq Scan on (\w+)', plan)
+        else:
+            indexes = re.findall(r'(?:SCAN|SEARCH) \w+ USING (?:COVERING )?INDEX (\w+)', plan)
+            scans = re.findall(r'SCAN (\w+)(?! USING)\s*$', plan, re.MULTILINE)
+        used = f'index {", ".join(dict.fromkeys(indexes))}' if indexes else ''
+        scanned = f'SCAN {", ".join(dict.fromkeys(scans))}' if scans else ''
+        return '; '.join(part for part in (used, scanned) if part)
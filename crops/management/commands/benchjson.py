@@ -0,0 +1,66 @@
+import io
+import time
+import statistics
+from datetime import timedelta
+from crops import analytics
+from django.utils import timezone
+from crops.models import Crop
+from crops.views import AdminStatsView
+from crops.serializers import crop_list_serializer
+from users.serializers import user_list_serializer
+from core.renderers import FastJSONParser, FastJSONRenderer
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares DRF\'s JSONRenderer/JSONParser with the orjson-backed ones on '
+        'real endpoint payloads built from the current database: the crop and '
+        'farmer lists (newest --rows rows), the admin stats and a weekly analytics series.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case; the median is reported.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        rows = options['rows']
+        stats = AdminStatsView()
+        payloads = [
+            ('crop list', crop_list_serializer.serialize(crop_list_serializer.values(Crop.objects.order_by('-created', '-id'))[:rows])),
+            ('farmer list', user_list_serializer.serialize(user_list_serializer.values(User.objects.filter(role=User.Role.FARMER).order_by('-created', '-id'))[:rows])),
+            ('admin stats', {
+                'username': 'admin', 'total_farmers': stats.count_farmers(),
+                'total_crops': stats.sum_crops(), 'crops_per_farmer': stats.get_crops_per_farmer(),
+            }),
+            ('analytics', analytics.series(*self.last_year(), analytics.WEEK)),
+        ]
+
+        self.stdout.write(f'{"payload":<12} {"size KB":>9} {"encode ms":>10} {"fast":>8} {"decode ms":>10} {"fast":>8}')
+        for name, data in payloads:
+            body = JSONRenderer().render(data)
+            encode = self.measure(lambda: JSONRenderer().render(data), options['repeat'])
+            fast_encode = self.measure(lambda: FastJSONRenderer().render(data), options['repeat'])
+            decode = self.measure(lambda: JSONParser().parse(io.BytesIO(body)), options['repeat'])
+            fast_decode = self.measure(lambda: FastJSONParser().parse(io.BytesIO(body)), options['repeat'])
+            self.stdout.write(
+                f'{name:<12} {len(body) / 1024:>9.0f} {encode:>10.2f} {fast_encode:>8.2f} '
+                f'{decode:>10.2f} {fast_decode:>8.2f}   {encode / fast_encode:.1f}x / {decode / fast_decode:.1f}x'
+            )
+
+    def last_year(self):
+        end = timezone.localdate()
+        return end - timedelta(days=365), end
+
+    def measure(self, run, repeat):
+        run()  # warm up
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
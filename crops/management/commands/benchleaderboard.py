@@ -0,0 +1,96 @@
+import time
+import random
+import statistics
+from collections import Counter
+from django.db import transaction
+from crops import leaderboard
+from crops.models import FarmerTotal, RankBucket
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+
+TOTALS = {
+    # Harvests vary over orders of magnitude: nearly every total is distinct.
+    'spread': lambda rng: int(rng.lognormvariate(8, 2)) + 1,
+    # Few distinct totals with long runs of ties.
+    'skewed': lambda rng: int(rng.paretovariate(1.5) * 10),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks leaderboard queries at growing farmer counts. '
+        'Synthetic farmers are created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query and size.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--totals', choices=TOTALS, default='spread',
+            help='spread: log-normal totals, mostly distinct; skewed: Pareto totals with long runs of ties.',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f'{"farmers":>10} {"totals":>8} {"query":<22} {"p50 ms":>9} {"p95 ms":>9}')
+
+        with transaction.atomic():
+            seeded = 0
+            histogram = Counter()
+            for size in sorted(options['sizes']):
+                self.seed_farmers(seeded, size, rng, histogram, TOTALS[options['totals']])
+                seeded = size
+                for name, query in self.queries(rng, size, histogram):
+                    timings = self.measure(query, options['repeat'])
+                    self.stdout.write(f'{size:>10} {len(histogram):>8} {name:<22} {timings[0]:>9.2f} {timings[1]:>9.2f}')
+            transaction.set_rollback(True)
+
+    def seed_farmers(self, start, stop, rng, histogram, total, batch_size=5000):
+        User = get_user_model()
+        for offset in range(start, stop, batch_size):
+            ids = range(offset, min(offset + batch_size, stop))
+            users = User.objects.bulk_create([
+                User(username=f'bench_{i}', email=f'bench_{i}@bench.invalid', password='!', role=User.Role.FARMER)
+                for i in ids
+            ])
+            totals = FarmerTotal.objects.bulk_create([
+                FarmerTotal(farmer=user, total_quantity=total(rng), crop_count=1)
+                for user in users
+            ])
+            histogram.update(total.total_quantity for total in totals)
+
+        RankBucket.objects.filter(crop_type='').delete()
+        RankBucket.objects.bulk_create(
+            [RankBucket(crop_type='', total_quantity=total, farmers=farmers) for total, farmers in histogram.items()],
+            batch_size=5000
+        )
+
+    def queries(self, rng, size, histogram):
+        User = get_user_model()
+        farmer_id = User.objects.get(username=f'bench_{rng.randrange(size)}').id
+        # rank_of sums the buckets above a total, so low totals are the slow case.
+        last_id = FarmerTotal.objects.order_by('total_quantity', '-farmer_id').values_list('farmer_id', flat=True).first()
+        totals = sorted(histogram)
+        return [
+            ('top 10', lambda: leaderboard.top(10)),
+            ('top 10 (dense)', lambda: leaderboard.top(10, ties=leaderboard.DENSE)),
+            ('page 10 of 50', lambda: leaderboard.top(50, offset=450)),
+            ('around me', lambda: leaderboard.around(farmer_id, 5)),
+            ('around the last', lambda: leaderboard.around(last_id, 5)),
+            ('rank of top total', lambda: leaderboard.rank_of(totals[-1])),
+            ('rank of median total', lambda: leaderboard.rank_of(totals[len(totals) // 2])),
+            ('rank of lowest total', lambda: leaderboard.rank_of(totals[0])),
+            ('lowest total (dense)', lambda: leaderboard.rank_of(totals[0], ties=leaderboard.DENSE)),
+        ]
+
+    def measure(self, query, repeat):
+        query()  # warm up caches and plans
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        return statistics.median(samples), samples[int(len(samples) * 0.95) - 1 if len(samples) > 1 else 0]
@@ -0,0 +1,57 @@
+import time
+import statistics
+from django.conf import settings
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from crops.models import Crop
+from crops.serializers import CropSerializer, crop_list_serializer
+from users.serializers import UserSerializer, user_list_serializer
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares listing crops and farmers through the DRF serializers with the '
+        'compiled values() serializers used by the list endpoints: query plus '
+        'serialization time for the newest --rows rows (seed them with seeddata).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per serializer; the median is reported.')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        if Crop.objects.count() < rows:
+            self.stdout.write(self.style.WARNING(f'Only {Crop.objects.count()} crops; run seeddata for {rows}.'))
+        if not Crop.objects.exists():
+            raise CommandError('No crops to list.')
+        context = {'request': RequestFactory().get('/api/v1/farmers/')}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            self.compare(rows, options['repeat'], context)
+
+    def compare(self, rows, repeat, context):
+        User = get_user_model()
+        crops = Crop.objects.order_by('-created', '-id')
+        farmers = User.objects.filter(role=User.Role.FARMER).order_by('-created', '-id')
+        cases = [
+            ('crops', 'CropSerializer', lambda: CropSerializer(crops.select_related('farmer')[:rows], many=True).data),
+            ('crops', 'compiled', lambda: crop_list_serializer.serialize(crop_list_serializer.values(crops)[:rows])),
+            ('farmers', 'UserSerializer', lambda: UserSerializer(farmers[:rows], many=True, context=context).data),
+            ('farmers', 'compiled', lambda: user_list_serializer.serialize(user_list_serializer.values(farmers)[:rows], context)),
+        ]
+
+        self.stdout.write(f'{"list":<8} {"serializer":<16} {"rows":>8} {"ms":>9} {"rows/s":>10}')
+        baseline = {}
+        for name, serializer, run in cases:
+            count = len(run())  # warm up
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                samples.append(time.perf_counter() - started)
+            elapsed = statistics.median(samples)
+            speedup = f'  {baseline[name] / elapsed:.1f}x faster' if name in baseline else ''
+            baseline.setdefault(name, elapsed)
+            self.stdout.write(f'{name:<8} {serializer:<16} {count:>8} {elapsed * 1000:>9.1f} {count / elapsed:>10.0f}{speedup}')
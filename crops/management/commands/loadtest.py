@@ -0,0 +1,87 @@
+import time
+import statistics
+import threading
+import http.client
+from collections import Counter
+from urllib.parse import urlsplit
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests a running server: many concurrent keep-alive clients request '
+        'the given URLs and the throughput and latency percentiles are reported. '
+        'Run it once against gunicorn (sync views) and once against uvicorn '
+        'with ASYNC_VIEWS=1 to compare them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Full URLs, requested round-robin.')
+        parser.add_argument('--user', required=True, help='Username to mint an access token for.')
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=10000, help='Total requests across all clients.')
+        parser.add_argument('--unique', action='store_true', help='Add a unique query parameter so no response is served from cache.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'No user named {options["user"]!r}.')
+        refresh = RefreshToken.for_user(user)
+        refresh['role'] = user.role
+        headers = {'Authorization': f'Bearer {refresh.access_token}', 'Accept': 'application/json'}
+
+        targets = [urlsplit(url) for url in options['urls']]
+        for target in targets:
+            if target.scheme != 'http':
+                raise CommandError('Only http:// URLs are supported.')
+
+        counter = iter(range(options['requests']))
+        lock = threading.Lock()
+        latencies, statuses = [], Counter()
+
+        def client():
+            connections = {}
+            while True:
+                with lock:
+                    number = next(counter, None)
+                if number is None:
+                    break
+                target = targets[number % len(targets)]
+                path = target.path + (f'?{target.query}' if target.query else '')
+                if options['unique']:
+                    path += f'{"&" if target.query else "?"}_={number}'
+
+                started = time.perf_counter()
+                try:
+                    connection = connections.get(target.netloc) or http.client.HTTPConnection(target.netloc, timeout=60)
+                    connections[target.netloc] = connection
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException):
+                    connections.pop(target.netloc, None)
+                    status = 'error'
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[status] += 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started
+
+        latencies.sort()
+        percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+        self.stdout.write(f'requests     {len(latencies)} in {duration:.2f}s ({len(latencies) / duration:.1f} req/s)')
+        self.stdout.write(f'concurrency  {options["concurrency"]}')
+        self.stdout.write(f'latency ms   p50 {statistics.median(latencies):.1f}  p95 {percentile(0.95):.1f}  p99 {percentile(0.99):.1f}  max {latencies[-1]:.1f}')
+        self.stdout.write('statuses     ' + '  '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str)))
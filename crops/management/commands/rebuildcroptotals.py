@@ -0,0 +1,37 @@
+from jobs.queue import enqueue
+from django.core.management.base import BaseCommand, CommandError
+from crops.aggregates import rebuild_totals, verify_totals
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds (or verifies) the per-farmer crop totals and daily rollups from the Crop table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare the totals tables against Crop and report mismatches.'
+        )
+        parser.add_argument(
+            '--background',
+            action='store_true',
+            help='Queue the rebuild as a crops.rebuild_totals job for runjobs instead of running it here.'
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = verify_totals()
+            for table, key, expected, actual in mismatches:
+                self.stdout.write(f'{table} {key}: expected {expected}, found {actual}')
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} crop total(s) out of date. Run without --verify to rebuild.')
+            self.stdout.write(self.style.SUCCESS('Crop totals are consistent.'))
+            return
+
+        if options['background']:
+            job = enqueue('crops.rebuild_totals', key='crops.rebuild_totals')
+            self.stdout.write(self.style.SUCCESS(f'Queued job {job.pk}; follow it at /api/v1/jobs/{job.pk}/.'))
+            return
+
+        farmers, rows, days = rebuild_totals()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt totals for {farmers} farmer(s) across {rows} crop type row(s) and {days} daily rollup(s).'))
@@ -0,0 +1,129 @@
+import time
+import random
+from datetime import timedelta
+from contextlib import contextmanager
+from core import caching
+from django.db import models, transaction
+from django.conf import settings
+from django.utils import timezone
+from crops.models import Crop, DailyCropTotal, FarmerCropTotal, FarmerTotal
+from crops.aggregates import rebuild_totals
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+CROP_NAMES = {
+    'cereal': ['Maize', 'Wheat', 'Rice', 'Sorghum', 'Millet', 'Barley'],
+    'legume': ['Beans', 'Groundnut', 'Cowpea', 'Soybean', 'Pigeon Pea'],
+    'vegetable': ['Tomato', 'Cabbage', 'Kale', 'Onion', 'Spinach', 'Carrot'],
+    'fruit': ['Mango', 'Banana', 'Avocado', 'Orange', 'Pineapple'],
+    'root_tuber': ['Cassava', 'Sweet Potato', 'Potato', 'Yam'],
+    'oil_crop': ['Sunflower', 'Sesame', 'Palm'],
+    'fodder': ['Napier Grass', 'Lucerne', 'Rhodes Grass'],
+    'other': ['Coffee', 'Tea', 'Cotton', 'Sugarcane'],
+}
+
+
+@contextmanager
+def explicit_created(*models):
+    """
+    Lets bulk_create keep the given ``created`` values instead of stamping now.
+    """
+    fields = [model._meta.get_field('created') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-generates farmers and crops for load testing. Farmers are named '
+        '<prefix><n> and share one password; crop counts per farmer, crop types '
+        'and quantities are skewed like real harvest data, and creation times '
+        'are spread over the past --days days.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farmers', type=int, default=1000)
+        parser.add_argument('--crops', type=int, default=50000, help='Total crops, spread unevenly across the new farmers.')
+        parser.add_argument('--crop-type-skew', type=float, default=1.0,
+                            help='Zipf exponent of the crop type mix; 0 spreads crops evenly over the types.')
+        parser.add_argument('--days', type=int, default=365, help='Creation times are spread over this many past days.')
+        parser.add_argument('--prefix', default='seed_')
+        parser.add_argument('--password', default='Seed@12345')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Delete farmers with the prefix (and their crops) first.')
+        parser.add_argument('--batch-size', type=int, default=settings.CROP_IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['farmers'] < 1 or options['crops'] < 0 or options['days'] < 1:
+            raise CommandError('--farmers and --days must be positive and --crops not negative.')
+        User = get_user_model()
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        now = timezone.now()
+        with transaction.atomic(), explicit_created(User, Crop):
+            if options['clear']:
+                seeded = User.objects.filter(username__startswith=options['prefix'])
+                # One DELETE per table, leaving the farmers' pre_delete signal
+                # no totals to move out of the rank buckets; those are rebuilt below.
+                for model in (Crop, DailyCropTotal, FarmerCropTotal, FarmerTotal):
+                    models.QuerySet(model).filter(farmer__in=seeded).delete()
+                self.stdout.write(f'Deleted {seeded.delete()[1].get(User._meta.label, 0)} seeded farmers.')
+            farmers = self.create_farmers(rng, now, options)
+            crops = self.create_crops(rng, now, farmers, options)
+            # Cheaper than maintaining the totals row by row for every batch.
+            rebuild_totals()
+        caching.invalidate('users', 'crops')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(farmers)} farmers and {crops} crops in {time.perf_counter() - started:.1f}s '
+            f'(password {options["password"]!r}).'
+        ))
+
+    def spread(self, rng, now, days):
+        return now - timedelta(seconds=rng.uniform(0, days * 86400))
+
+    def create_farmers(self, rng, now, options):
+        User = get_user_model()
+        prefix, start = options['prefix'], User.objects.filter(username__startswith=options['prefix']).count()
+        # Hashed once: a per-user hash would dominate the run.
+        password = make_password(options['password'])
+        farmers = []
+        for offset in range(start, start + options['farmers'], options['batch_size']):
+            farmers += User.objects.bulk_create([
+                User(
+                    username=f'{prefix}{i}', email=f'{prefix}{i}@seed.invalid', password=password,
+                    first_name=f'Farmer {i}', role=User.Role.FARMER, created=self.spread(rng, now, options['days']),
+                )
+                for i in range(offset, min(offset + options['batch_size'], start + options['farmers']))
+            ])
+        return farmers
+
+    def create_crops(self, rng, now, farmers, options):
+        crop_types = [key for key, _ in Crop.CROP_TYPES]
+        rng.shuffle(crop_types)
+        type_weights = [1 / (rank + 1) ** options['crop_type_skew'] for rank in range(len(crop_types))]
+        # A few farmers record most crops, like the leaderboard's long tail.
+        farmer_weights = [rng.paretovariate(1.2) for _ in farmers]
+
+        remaining, created = options['crops'], 0
+        while remaining:
+            size = min(remaining, options['batch_size'])
+            owners = rng.choices(farmers, farmer_weights, k=size)
+            kinds = rng.choices(crop_types, type_weights, k=size)
+            batch = []
+            for farmer, crop_type in zip(owners, kinds):
+                created_at = max(self.spread(rng, now, options['days']), farmer.created)
+                batch.append(Crop(
+                    farmer=farmer, name=rng.choice(CROP_NAMES[crop_type]), crop_type=crop_type,
+                    quantity=max(1, int(rng.lognormvariate(3, 1))), created=created_at,
+                ))
+            # A plain queryset skips CropQuerySet's per-row totals upkeep.
+            models.QuerySet(Crop).bulk_create(batch)
+            remaining -= size
+            created += size
+        return created
@@ -0,0 +1,69 @@
+# Generated by Django 5.2 on 2026-10-18 15:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_totals(apps, schema_editor):
+    Crop = apps.get_model('crops', 'Crop')
+    FarmerTotal = apps.get_model('crops', 'FarmerTotal')
+    FarmerCropTotal = apps.get_model('crops', 'FarmerCropTotal')
+
+    rows = (
+        Crop.objects.order_by()
+        .values('farmer_id', 'crop_type')
+        .annotate(total_quantity=Sum('quantity'), crop_count=Count('id'))
+    )
+    per_farmer = {}
+    type_totals = []
+    for row in rows:
+        quantity, count = per_farmer.get(row['farmer_id'], (0, 0))
+        per_farmer[row['farmer_id']] = (quantity + row['total_quantity'], count + row['crop_count'])
+        type_totals.append(FarmerCropTotal(**row))
+
+    FarmerTotal.objects.bulk_create(
+        [FarmerTotal(farmer_id=farmer_id, total_quantity=quantity, crop_count=count)
+         for farmer_id, (quantity, count) in per_farmer.items()],
+        batch_size=1000
+    )
+    FarmerCropTotal.objects.bulk_create(type_totals, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0001_initial'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmerTotal',
+            fields=[
+                ('farmer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cropTotal', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_quantity', models.PositiveBigIntegerField(default=0)),
+                ('crop_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_quantity'], name='crops_farmertotal_qty_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FarmerCropTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('crop_type', models.CharField(choices=[('cereal', 'Cereal/Grain'), ('legume', 'Legume'), ('vegetable', 'Vegetable'), ('fruit', 'Fruit'), ('root_tuber', 'Root/Tuber'), ('oil_crop', 'Oil Crop'), ('fodder', 'Fodder/Forage'), ('other', 'Other')], max_length=20)),
+                ('total_quantity', models.PositiveBigIntegerField(default=0)),
+                ('crop_count', models.PositiveIntegerField(default=0)),
+                ('farmer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cropTypeTotals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['crop_type', '-total_quantity'], name='crops_croptypetotal_qty_idx')],
+                'constraints': [models.UniqueConstraint(fields=('farmer', 'crop_type'), name='crops_farmercroptotal_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
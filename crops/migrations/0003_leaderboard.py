@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 15:33
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_buckets(apps, schema_editor):
+    FarmerTotal = apps.get_model('crops', 'FarmerTotal')
+    FarmerCropTotal = apps.get_model('crops', 'FarmerCropTotal')
+    RankBucket = apps.get_model('crops', 'RankBucket')
+
+    buckets = [
+        RankBucket(crop_type='', total_quantity=row['total_quantity'], farmers=row['farmers'])
+        for row in FarmerTotal.objects.filter(total_quantity__gt=0).order_by()
+        .values('total_quantity').annotate(farmers=Count('farmer'))
+    ]
+    buckets += [
+        RankBucket(crop_type=row['crop_type'], total_quantity=row['total_quantity'], farmers=row['farmers'])
+        for row in FarmerCropTotal.objects.filter(total_quantity__gt=0).order_by()
+        .values('crop_type', 'total_quantity').annotate(farmers=Count('farmer'))
+    ]
+    RankBucket.objects.bulk_create(buckets, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0002_farmer_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('crop_type', models.CharField(blank=True, max_length=20)),
+                ('total_quantity', models.PositiveBigIntegerField()),
+                ('farmers', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='farmercroptotal',
+            name='crops_croptypetotal_qty_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='farmertotal',
+            name='crops_farmertotal_qty_idx',
+        ),
+        migrations.AddIndex(
+            model_name='farmercroptotal',
+            index=models.Index(fields=['crop_type', '-total_quantity', 'farmer'], name='crops_croptypetotal_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='farmertotal',
+            index=models.Index(fields=['-total_quantity', 'farmer'], name='crops_farmertotal_rank_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='rankbucket',
+            constraint=models.UniqueConstraint(fields=('crop_type', 'total_quantity'), name='crops_rankbucket_unique'),
+        ),
+        migrations.RunPython(backfill_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 15:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0003_leaderboard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='crop',
+            index=models.Index(fields=['farmer', '-created', '-id'], name='crops_crop_farmer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='crop',
+            index=models.Index(fields=['-created', '-id'], name='crops_crop_created_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-18 16:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    Crop = apps.get_model('crops', 'Crop')
+    DailyCropTotal = apps.get_model('crops', 'DailyCropTotal')
+
+    rows = (
+        Crop.objects.order_by()
+        .values('farmer_id', 'crop_type', day=TruncDate('created'))
+        .annotate(total_quantity=Sum('quantity'), crop_count=Count('id'))
+    )
+    DailyCropTotal.objects.bulk_create((DailyCropTotal(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0004_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCropTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('crop_type', models.CharField(choices=[('cereal', 'Cereal/Grain'), ('legume', 'Legume'), ('vegetable', 'Vegetable'), ('fruit', 'Fruit'), ('root_tuber', 'Root/Tuber'), ('oil_crop', 'Oil Crop'), ('fodder', 'Fodder/Forage'), ('other', 'Other')], max_length=20)),
+                ('day', models.DateField()),
+                ('total_quantity', models.PositiveBigIntegerField(default=0)),
+                ('crop_count', models.PositiveIntegerField(default=0)),
+                ('farmer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cropDailyTotals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='crops_dailytotal_day_idx'), models.Index(fields=['crop_type', 'day'], name='crops_dailytotal_type_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('farmer', 'day', 'crop_type'), name='crops_dailycroptotal_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
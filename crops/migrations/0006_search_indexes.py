@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 18:02
+
+from django.conf import settings
+from core.search import AddSearchIndex
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0005_daily_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='crop',
+            index=models.Index(fields=['crop_type', '-created', '-id'], name='crops_crop_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='crop',
+            index=models.Index(fields=['quantity'], name='crops_crop_quantity_idx'),
+        ),
+        AddSearchIndex(model_name='crop', field='name', name='crops_crop_name_search_idx'),
+    ]
@@ -1,5 +1,60 @@
+from core import caching
 from django.db import models
 from users.models import User
+from django.db import transaction
+from .aggregates import CropDeltas, grouped_totals, rollup_day
+
+# Fields whose changes must be mirrored into the totals tables.
+TRACKED_FIELDS = ('farmer_id', 'crop_type', 'quantity', 'created')
+
+
+class CropQuerySet(models.QuerySet):
+    """
+    Keeps FarmerTotal/FarmerCropTotal/DailyCropTotal in step with set-based writes
+    (bulk_create, update, bulk_update and queryset deletes), and invalidates
+    cached responses since these writes send no model signals.
+    """
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            deltas = CropDeltas()
+            for crop in created:
+                deltas.add_crop(crop)
+            deltas.apply()
+            caching.invalidate('crops')
+        return created
+
+    def update(self, **kwargs):
+        tracked = {'farmer', *TRACKED_FIELDS}
+        if not tracked.intersection(kwargs):
+            rows = super().update(**kwargs)
+            caching.invalidate('crops')
+            return rows
+
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list('pk', flat=True))
+            deltas = CropDeltas()
+            deltas.add_grouped(grouped_totals(self.model.objects.filter(pk__in=pks)), sign=-1)
+            rows = super().update(**kwargs)
+            deltas.add_grouped(grouped_totals(self.model.objects.filter(pk__in=pks)))
+            deltas.apply()
+            caching.invalidate('crops')
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            deltas = CropDeltas()
+            deltas.add_grouped(grouped_totals(self), sign=-1)
+            result = super().delete()
+            deltas.apply()
+            caching.invalidate('crops')
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
 
 
 # Create your models here.
@@ -20,5 +75,138 @@ class Crop(models.Model):
     quantity = models.PositiveIntegerField()
     created = models.DateTimeField(auto_now_add=True)
 
+    objects = CropQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of crop lists, newest first.
+            models.Index(fields=['farmer', '-created', '-id'], name='crops_crop_farmer_created_idx'),
+            models.Index(fields=['-created', '-id'], name='crops_crop_created_idx'),
+            # List filters; name search uses crops_crop_name_search_idx (migration 0006).
+            models.Index(fields=['crop_type', '-created', '-id'], name='crops_crop_type_created_idx'),
+            models.Index(fields=['quantity'], name='crops_crop_quantity_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} - {self.crop_type} - {self.farmer.username}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._persisted = instance._tracked_values()
+        return instance
+
+    def _tracked_values(self):
+        return tuple(self.__dict__.get(field) for field in TRACKED_FIELDS)
+
+    def _locked_values(self):
+        """
+        Values currently stored in the database for this crop, read under a
+        row lock. The snapshot taken at load time may be stale by now: two
+        concurrent writes of one crop would both subtract it from the totals.
+        """
+        return Crop.objects.select_for_update().filter(pk=self.pk).values_list(*TRACKED_FIELDS).first()
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            deltas = CropDeltas()
+            if not self._state.adding:
+                persisted = self._locked_values()
+                if persisted:
+                    deltas.add(persisted[0], persisted[1], -persisted[2], -1, rollup_day(persisted[3]))
+            super().save(*args, **kwargs)
+            deltas.add_crop(self)
+            deltas.apply()
+        self._persisted = self._tracked_values()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deltas = CropDeltas()
+            persisted = self._locked_values()
+            if persisted:
+                deltas.add(persisted[0], persisted[1], -persisted[2], -1, rollup_day(persisted[3]))
+            result = super().delete(*args, **kwargs)
+            deltas.apply()
+            caching.invalidate('crops')
+        return result
+
+
+class FarmerTotal(models.Model):
+    """
+    Running crop totals per farmer, maintained on every Crop write.
+    """
+    farmer = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='cropTotal')
+    total_quantity = models.PositiveBigIntegerField(default=0)
+    crop_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_quantity', 'farmer'], name='crops_farmertotal_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.farmer_id} - {self.total_quantity}'
+
+
+class FarmerCropTotal(models.Model):
+    """
+    Running crop totals per farmer and crop type, maintained on every Crop write.
+    """
+    farmer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cropTypeTotals')
+    crop_type = models.CharField(max_length=20, choices=Crop.CROP_TYPES)
+    total_quantity = models.PositiveBigIntegerField(default=0)
+    crop_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['farmer', 'crop_type'], name='crops_farmercroptotal_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['crop_type', '-total_quantity', 'farmer'], name='crops_croptypetotal_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.farmer_id} - {self.crop_type} - {self.total_quantity}'
+
+
+
+class RankBucket(models.Model):
+    """
+    Number of farmers holding each total, per crop type ('' for all crops).
+    Lets leaderboard ranks be summed over buckets instead of counting farmers.
+    """
+    crop_type = models.CharField(max_length=20, blank=True)
+    total_quantity = models.PositiveBigIntegerField()
+    farmers = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['crop_type', 'total_quantity'], name='crops_rankbucket_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.crop_type or "all"} - {self.total_quantity} - {self.farmers}'
+
+
+class DailyCropTotal(models.Model):
+    """
+    Crop quantity and count per farmer, crop type and creation day, maintained
+    on every Crop write. Analytics series are summed from these rows.
+    """
+    farmer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cropDailyTotals')
+    crop_type = models.CharField(max_length=20, choices=Crop.CROP_TYPES)
+    day = models.DateField()
+    total_quantity = models.PositiveBigIntegerField(default=0)
+    crop_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['farmer', 'day', 'crop_type'], name='crops_dailycroptotal_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='crops_dailytotal_day_idx'),
+            models.Index(fields=['crop_type', 'day'], name='crops_dailytotal_type_day_idx'),
+        ]
+
     def __str__(self):
-        return f'{self.name} - {self.crop_type} - {self.farmer.username}' 
\ No newline at end of file
+        return f'{self.farmer_id} - {self.crop_type} - {self.day} - {self.total_quantity}'
@@ -1,5 +1,6 @@
 from .models import Crop
 from rest_framework import serializers
+from core.readserializers import ValuesSerializer
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -10,4 +11,9 @@ class CropSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Crop
-        fields = ['id', 'farmer', 'farmer_id', 'name', 'crop_type', 'quantity', 'created']
\ No newline at end of file
+        fields = ['id', 'farmer', 'farmer_id', 'name', 'crop_type', 'quantity', 'created']
+
+
+# Crop lists: the same output as CropSerializer from values() rows, with the
+# farmer's username joined in the same query.
+crop_list_serializer = ValuesSerializer(CropSerializer, sources={'farmer': 'farmer__username'})
@@ -0,0 +1,27 @@
+from core import caching
+from django.dispatch import receiver
+from .aggregates import CropDeltas
+from .models import Crop, FarmerCropTotal
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, pre_delete
+
+User = get_user_model()
+
+
+@receiver(pre_delete, sender=User)
+def remove_farmer_totals(sender, instance, **kwargs):
+    """
+    Deleting a farmer cascades away their crops and totals rows without
+    going through Crop.delete(), so take them out of the rank buckets first.
+    """
+    deltas = CropDeltas()
+    for crop_type, quantity, count in FarmerCropTotal.objects.filter(farmer=instance).values_list('crop_type', 'total_quantity', 'crop_count'):
+        deltas.add(instance.id, crop_type, -quantity, -count)
+    deltas.apply()
+
+
+@receiver(post_save, sender=Crop)
+def invalidate_crop_responses(sender, instance, **kwargs):
+    # Deletes and set-based writes invalidate from Crop/CropQuerySet instead:
+    # a post_delete receiver would stop Django fast-deleting a farmer's crops.
+    caching.invalidate('crops')
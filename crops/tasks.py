@@ -0,0 +1,25 @@
+from jobs.queue import task
+from .views import AdminStatsView
+from .aggregates import rebuild_totals
+
+
+@task('crops.admin_stats', max_attempts=1)
+def admin_stats():
+    """
+    The admin dashboard aggregates, for ``Prefer: respond-async`` requests.
+    """
+    view = AdminStatsView()
+    return {
+        'total_farmers': view.count_farmers(),
+        'total_crops': view.sum_crops(),
+        'crops_per_farmer': view.get_crops_per_farmer(),
+    }
+
+
+@task('crops.rebuild_totals', max_attempts=1)
+def rebuild_crop_totals():
+    """
+    Recomputes the totals and daily rollups (``rebuildcroptotals --background``).
+    """
+    farmers, rows, days = rebuild_totals()
+    return {'farmers': farmers, 'crop_type_rows': rows, 'daily_rollups': days}
@@ -1,10 +1,47 @@
 import io
+import os
+import itertools
+import json
+import base64
 import uuid
+import tempfile
+import threading
+from unittest import mock
+from collections import namedtuple
+from decimal import Decimal
+from zoneinfo import ZoneInfo
 from PIL import Image
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from django.db import connection
+from django.db.models import Count
 from rest_framework import status
-from rest_framework.test import APITestCase
+from . import leaderboard, views
+from asgiref.sync import async_to_sync
+from core.asyncviews import gather_queries
+from core import caching, dbpool, metrics, renderers
+from users.revocation import revocations
+from django.core.cache import cache
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from .models import Crop, DailyCropTotal, FarmerTotal
+from .serializers import CropSerializer, crop_list_serializer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils.serializer_helpers import ReturnDict
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from core.testing import APITestCase, MD5, PASSWORD, create_user
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import RefreshToken
+from jobs.queue import enqueue
+from crops.urls import urlpatterns as crop_routes
+from users.urls import urlpatterns as user_routes
+from jobs.urls import urlpatterns as job_routes
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 User = get_user_model()
@@ -58,6 +95,7 @@ class SignupViewTestCase(APITestCase):
 class UserProfileViewsTestCase(AuthTestCase):
     def setUp(self):
         super().setUp()
+        self.use_temporary_media()
         self.profile_url = reverse('user_profile_view')
         self.update_url = reverse('user_profile_update_view')
 
@@ -86,4 +124,1011 @@ class UserProfileViewsTestCase(AuthTestCase):
 
         response = self.client.patch(self.update_url, payload, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['username'], "updatedusername")
\ No newline at end of file
+        self.assertEqual(response.data['username'], "updatedusername")
+
+
+class FarmerCropStatsTestCase(APITestCase):
+    def setUp(self):
+        self.farmer = create_user('farmer1')
+        self.other = create_user('farmer2')
+        self.idle = create_user('farmer3')
+        self.url = reverse('farmer_crop_stats_view')
+        self.authenticate(self.farmer)
+
+    def test_stats_from_totals(self):
+        Crop.objects.create(farmer=self.farmer, name='Maize', crop_type='cereal', quantity=40)
+        Crop.objects.create(farmer=self.farmer, name='Beans', crop_type='legume', quantity=10)
+        Crop.objects.create(farmer=self.other, name='Wheat', crop_type='cereal', quantity=100)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_count'], 50)
+        self.assertEqual(response.data['rank'], 2)
+        cereal = next(item for item in response.data['crops_by_type'] if item['crop_type'] == 'Cereal/Grain')
+        self.assertEqual(cereal, {'name': ['Maize'], 'crop_type': 'Cereal/Grain', 'count': 40})
+
+    def test_farmer_without_crops_ranks_last(self):
+        Crop.objects.create(farmer=self.farmer, name='Maize', crop_type='cereal', quantity=40)
+        self.authenticate(self.idle)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['total_count'], 0)
+        self.assertEqual(response.data['rank'], 2)
+
+    def test_totals_follow_updates_and_deletes(self):
+        crop = Crop.objects.create(farmer=self.farmer, name='Maize', crop_type='cereal', quantity=40)
+        crop.crop_type = 'legume'
+        crop.quantity = 15
+        crop.save()
+        Crop.objects.bulk_create([Crop(farmer=self.other, name='Wheat', crop_type='cereal', quantity=5)])
+        Crop.objects.filter(farmer=self.other).update(quantity=7)
+        Crop.objects.get(pk=crop.pk).delete()
+
+        self.assertEqual(FarmerTotal.objects.get(farmer=self.farmer).total_quantity, 0)
+        self.assertEqual(FarmerTotal.objects.get(farmer=self.other).total_quantity, 7)
+        call_command('rebuildcroptotals', '--verify', stdout=io.StringIO())
+
+    def test_stale_instances_move_totals_from_the_stored_row(self):
+        # Two requests load the same crop before either writes it.
+        crop = Crop.objects.create(farmer=self.farmer, name='Maize', crop_type='cereal', quantity=40)
+        first, second, third = (Crop.objects.get(pk=crop.pk) for _ in range(3))
+        first.quantity = 15
+        first.save()
+        second.crop_type, second.quantity = 'legume', 25
+        second.save()
+        self.assertEqual(FarmerTotal.objects.get(farmer=self.farmer).total_quantity, 25)
+        call_command('rebuildcroptotals', '--verify', stdout=io.StringIO())
+
+        third.delete()
+        self.assertEqual(FarmerTotal.objects.get(farmer=self.farmer).total_quantity, 0)
+        call_command('rebuildcroptotals', '--verify', stdout=io.StringIO())
+
+    def test_rebuild_repairs_drift(self):
+        Crop.objects.create(farmer=self.farmer, name='Maize', crop_type='cereal', quantity=40)
+        FarmerTotal.objects.filter(farmer=self.farmer).update(total_quantity=1)
+        with self.assertRaises(CommandError):
+            call_command('rebuildcroptotals', '--verify', stdout=io.StringIO())
+        call_command('rebuildcroptotals', stdout=io.StringIO())
+        self.assertEqual(FarmerTotal.objects.get(farmer=self.farmer).total_quantity, 40)
+
+
+class CropAnalyticsTestCase(APITestCase):
+    def setUp(self):
+        self.admin = create_user('admin', role='admin')
+        self.farmer = create_user('farmer1')
+        self.other = create_user('farmer2')
+        self.url = reverse('admin_crop_analytics_view')
+        self.authenticate(self.admin)
+
+    def harvest(self, farmer, crop_type, quantity, day):
+        crop = Crop.objects.create(farmer=farmer, name='Crop', crop_type=crop_type, quantity=quantity)
+        # created is auto_now_add; move it with a queryset update, which the rollups follow.
+        Crop.objects.filter(pk=crop.pk).update(created=datetime.combine(day, datetime.min.time(), dt_timezone.utc))
+        return Crop.objects.get(pk=crop.pk)
+
+    def test_daily_series_fills_gaps(self):
+        self.harvest(self.farmer, 'cereal', 10, date(2026, 3, 2))
+        self.harvest(self.farmer, 'legume', 5, date(2026, 3, 2))
+        self.harvest(self.other, 'cereal', 7, date(2026, 3, 4))
+
+        response = self.client.get(self.url, {'start': '2026-03-01', 'end': '2026-03-04'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(point['period'], point['total_quantity'], point['crop_count']) for point in response.data['series']],
+            [('2026-03-01', 0, 0), ('2026-03-02', 15, 2), ('2026-03-03', 0, 0), ('2026-03-04', 7, 1)]
+        )
+
+    def test_weekly_and_monthly_series_with_filters(self):
+        self.harvest(self.farmer, 'cereal', 10, date(2026, 3, 2))
+        self.harvest(self.farmer, 'cereal', 4, date(2026, 3, 8))
+        self.harvest(self.farmer, 'legume', 5, date(2026, 3, 9))
+        self.harvest(self.other, 'cereal', 7, date(2026, 4, 1))
+
+        response = self.client.get(self.url, {'interval': 'week', 'start': '2026-03-02', 'end': '2026-03-15', 'crop_type': 'cereal'})
+        self.assertEqual([(p['period'], p['total_quantity']) for p in response.data['series']], [('2026-03-02', 14), ('2026-03-09', 0)])
+
+        response = self.client.get(self.url, {'interval': 'month', 'start': '2026-03-15', 'end': '2026-04-30', 'farmer': self.other.id})
+        self.assertEqual([(p['period'], p['total_quantity']) for p in response.data['series']], [('2026-03-01', 0), ('2026-04-01', 7)])
+
+    def test_rollups_follow_moves_and_deletes(self):
+        crop = self.harvest(self.farmer, 'cereal', 10, date(2026, 3, 2))
+        crop.quantity = 12
+        crop.save()
+        self.harvest(self.farmer, 'cereal', 3, date(2026, 3, 2)).delete()
+        self.assertEqual(list(DailyCropTotal.objects.filter(crop_count__gt=0).values_list('day', 'total_quantity')), [(date(2026, 3, 2), 12)])
+        call_command('rebuildcroptotals', '--verify', stdout=io.StringIO())
+
+        DailyCropTotal.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuildcroptotals', '--verify', stdout=io.StringIO())
+        call_command('rebuildcroptotals', stdout=io.StringIO())
+        self.assertEqual(DailyCropTotal.objects.get().total_quantity, 12)
+
+    def test_ranges_near_the_ends_of_the_calendar(self):
+        response = self.client.get(self.url, {'start': '0001-01-01', 'end': '0001-01-05'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['series']), 5)
+        response = self.client.get(self.url, {'interval': 'week', 'start': '9999-12-01', 'end': '9999-12-19'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['series'][-1]['period'], '9999-12-13')
+
+    def test_farmers_only_see_their_own_series(self):
+        self.harvest(self.farmer, 'cereal', 10, date(2026, 3, 2))
+        self.harvest(self.other, 'cereal', 7, date(2026, 3, 2))
+        self.authenticate(self.farmer)
+
+        response = self.client.get(reverse('farmer_crop_analytics_view'), {'start': '2026-03-02', 'end': '2026-03-02', 'farmer': self.other.id})
+        self.assertEqual(response.data['farmer'], self.farmer.id)
+        self.assertEqual(response.data['series'][0]['total_quantity'], 10)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_params(self):
+        for params in ({'interval': 'year'}, {'start': 'March'}, {'start': '2026-03-02', 'end': '2026-03-01'}, {'start': '2000-01-01'}, {'farmer': 'x'}, {'farmer': '²'}, {'farmer': '9' * 25},
+                       {'end': '0001-01-05'}, {'start': '9999-12-25', 'end': '9999-12-31'}, {'interval': 'month', 'start': '9999-12-01', 'end': '9999-12-31'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class LeaderboardTestCase(APITestCase):
+    def setUp(self):
+        self.farmers = [
+            create_user(f'farmer{i}')
+            for i in range(5)
+        ]
+        # farmer0: 50, farmer1: 30, farmer2: 30, farmer3: 10, farmer4: no crops
+        for farmer, quantity in zip(self.farmers, [50, 30, 30, 10]):
+            Crop.objects.create(farmer=farmer, name='Maize', crop_type='cereal', quantity=quantity)
+        Crop.objects.create(farmer=self.farmers[3], name='Beans', crop_type='legume', quantity=5)
+        self.authenticate(self.farmers[3])
+
+    def ranks(self, response):
+        return [(row['farmer'], row['rank']) for row in response.data['results']]
+
+    def test_competition_ties(self):
+        response = self.client.get(reverse('leaderboard_view'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ranks(response), [('farmer0', 1), ('farmer1', 2), ('farmer2', 2), ('farmer3', 4)])
+
+    def test_dense_ties_and_offset(self):
+        response = self.client.get(reverse('leaderboard_view'), {'ties': 'dense', 'offset': 2, 'limit': 2})
+        self.assertEqual(self.ranks(response), [('farmer2', 2), ('farmer3', 3)])
+
+    def test_crop_type_ranking(self):
+        response = self.client.get(reverse('leaderboard_view'), {'crop_type': 'legume'})
+        self.assertEqual(self.ranks(response), [('farmer3', 1)])
+
+    def test_invalid_params(self):
+        response = self.client.get(reverse('leaderboard_view'), {'crop_type': 'rice', 'ties': 'random'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_around_me(self):
+        response = self.client.get(reverse('farmer_leaderboard_view'), {'radius': 1})
+        self.assertEqual(response.data['rank'], 4)
+        self.assertEqual(self.ranks(response), [('farmer2', 2), ('farmer3', 4)])
+
+    def test_farmer_without_crops_ranks_after_everyone(self):
+        self.authenticate(self.farmers[4])
+        response = self.client.get(reverse('farmer_leaderboard_view'))
+        self.assertEqual(response.data['rank'], 5)
+        self.assertEqual(response.data['results'], [])
+
+
+class CropPaginationTestCase(APITestCase):
+    def setUp(self):
+        self.farmer = create_user('farmer1')
+        Crop.objects.bulk_create([Crop(farmer=self.farmer, name=f'Crop {i}', crop_type='cereal', quantity=i + 1) for i in range(7)])
+        # Identical timestamps force the id tie-breaker to do its job.
+        Crop.objects.update(created=Crop.objects.first().created)
+        self.url = reverse('farmer_crop_list_create_view')
+        self.authenticate(self.farmer)
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 7)
+
+    def test_cursor_walks_every_crop_once(self):
+        seen = []
+        response = self.client.get(self.url, {'page_size': 3})
+        while True:
+            seen += [crop['id'] for crop in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, sorted(Crop.objects.values_list('id', flat=True), reverse=True))
+
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual([crop['id'] for crop in previous.data['results']], seen[3:6])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor(self):
+        created = Crop.objects.first().created.isoformat()
+        for values in (['notadate', 1], [created, 'abc'], [None, None], [created, 2 ** 70], [created, True], 'ab', [created, 1, 2]):
+            token = base64.urlsafe_b64encode(json.dumps({'v': values}).encode()).decode()
+            with self.subTest(values=values):
+                response = self.client.get(self.url, {'cursor': token})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CropFilterTestCase(APITestCase):
+    def setUp(self):
+        self.admin = create_user('admin', role='admin')
+        self.farmer = create_user('farmer1')
+        other = create_user('farmer2')
+        Crop.objects.create(farmer=self.farmer, name='Maize', crop_type='cereal', quantity=10)
+        Crop.objects.create(farmer=self.farmer, name='Sweet Maize', crop_type='cereal', quantity=50)
+        Crop.objects.create(farmer=self.farmer, name='Mango', crop_type='fruit', quantity=5)
+        Crop.objects.create(farmer=other, name='Beans', crop_type='legume', quantity=20)
+        self.url = reverse('farmer_crop_list_create_view')
+        self.authenticate(self.admin)
+
+    def names(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return sorted(crop['name'] for crop in response.data)
+
+    def test_filters(self):
+        self.assertEqual(self.names({'crop_type': 'cereal'}), ['Maize', 'Sweet Maize'])
+        self.assertEqual(self.names({'quantity_min': 10, 'quantity_max': 20}), ['Beans', 'Maize'])
+        self.assertEqual(self.names({'farmer': self.farmer.id, 'quantity_max': 9}), ['Mango'])
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        self.assertEqual(self.names({'created_after': tomorrow}), [])
+
+    def test_search(self):
+        self.assertEqual(self.names({'search': 'maiz'}), ['Maize', 'Sweet Maize'])
+        self.assertEqual(self.names({'search': 'ma', 'search_mode': 'prefix'}), ['Maize', 'Mango'])
+        self.assertEqual(self.names({'search': 'sweet maize'}), ['Sweet Maize'])
+        self.assertEqual(self.names({'search': 'maize', 'crop_type': 'fruit'}), [])
+
+    def test_farmers_only_filter_their_own_crops(self):
+        self.authenticate(self.farmer)
+        self.assertEqual(self.names({'search': 'bea', 'search_mode': 'prefix'}), [])
+
+    def test_invalid_params(self):
+        for params in ({'crop_type': 'grain'}, {'quantity_min': '-1'}, {'farmer': 'x'}, {'search': 'ma'}, {'search': 'maize', 'search_mode': 'fuzzy'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_out_of_range_integers_are_rejected(self):
+        for params in ({'quantity_min': '²'}, {'quantity_max': '9' * 30}, {'farmer': '²'}, {'farmer': '9' * 25}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(self.client.get(reverse('admin_crop_export_view'), params).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_uses_the_same_filters(self):
+        response = self.client.get(reverse('admin_crop_export_view'), {'output': 'ndjson', 'quantity_min': 20})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(sorted(json.loads(line)['name'] for line in lines), ['Beans', 'Sweet Maize'])
+
+
+class FarmerDeletionTotalsTestCase(APITestCase):
+    def test_deleting_farmer_updates_rank_buckets(self):
+        farmer = create_user('farmer1')
+        other = create_user('farmer2')
+        Crop.objects.create(farmer=farmer, name='Maize', crop_type='cereal', quantity=40)
+        Crop.objects.create(farmer=other, name='Beans', crop_type='legume', quantity=10)
+
+        farmer.delete()
+        self.assertEqual(leaderboard.rank_of(10), 1)
+        call_command('rebuildcroptotals', '--verify', stdout=io.StringIO())
+
+
+class CropImportTestCase(APITestCase):
+    def setUp(self):
+        self.farmer = create_user('farmer1')
+        self.admin = create_user('admin', role='admin')
+        self.url = reverse('farmer_crop_import_view')
+        self.authenticate(self.farmer)
+
+    def test_csv_import_reports_bad_rows(self):
+        body = 'name,crop_type,quantity\nMaize,cereal,10\nRice,grain,5\nBeans,legume,-1\nPeas,legume,7\n'
+        response = self.client.post(f'{self.url}?batch_size=1', body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+        self.assertIn('crop_type', response.data['errors'][0]['errors'])
+        self.assertEqual(FarmerTotal.objects.get(farmer=self.farmer).total_quantity, 17)
+
+    def test_ndjson_import(self):
+        body = '{"name": "Maize", "crop_type": "cereal", "quantity": 3}\n\nnot json\n'
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'], [{'row': 3, 'errors': {'non_field_errors': ['Invalid JSON.']}}])
+
+    def test_abort_rolls_back(self):
+        body = 'name,crop_type,quantity\nMaize,cereal,10\nRice,grain,5\n'
+        response = self.client.post(f'{self.url}?on_error=abort', body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Crop.objects.exists())
+
+    def test_admin_must_name_farmer(self):
+        self.authenticate(self.admin)
+        body = f'name,crop_type,quantity,farmer_id\nMaize,cereal,10,{self.farmer.id}\nRice,cereal,5,\n'
+        response = self.client.post(self.url, body, content_type='text/csv')
+        self.assertEqual(response.data['created'], 1)
+        self.assertIn('farmer_id', response.data['errors'][0]['errors'])
+        self.assertEqual(Crop.objects.get().farmer, self.farmer)
+
+    def test_unsupported_content_type(self):
+        response = self.client.post(self.url, {'name': 'Maize'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+
+class CropBatchTestCase(APITestCase):
+    def setUp(self):
+        self.farmer = create_user('farmer1')
+        self.other = create_user('farmer2')
+        self.maize = Crop.objects.create(farmer=self.farmer, name='Maize', crop_type='cereal', quantity=10)
+        self.beans = Crop.objects.create(farmer=self.farmer, name='Beans', crop_type='legume', quantity=5)
+        self.rice = Crop.objects.create(farmer=self.farmer, name='Rice', crop_type='cereal', quantity=8)
+        self.foreign = Crop.objects.create(farmer=self.other, name='Kale', crop_type='vegetable', quantity=3)
+        self.url = reverse('farmer_crop_batch_view')
+        self.authenticate(self.farmer)
+
+    def test_updates_and_deletes_with_per_item_results(self):
+        response = self.client.post(self.url, {
+            'update': [{'id': self.maize.id, 'quantity': 40, 'crop_type': 'legume'}, {'id': self.foreign.id, 'quantity': 1}],
+            'delete': [self.beans.id, 999999],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['updated'], response.data['deleted'], response.data['failed']), (1, 1, 2))
+        self.assertEqual(
+            [(result['id'], result['status']) for result in response.data['results']],
+            [(self.maize.id, 'updated'), (self.foreign.id, 'failed'), (self.beans.id, 'deleted'), (999999, 'failed')],
+        )
+        self.maize.refresh_from_db()
+        self.assertEqual((self.maize.quantity, self.maize.crop_type, self.maize.name), (40, 'legume', 'Maize'))
+        self.assertFalse(Crop.objects.filter(pk=self.beans.id).exists())
+        self.assertEqual(Crop.objects.get(pk=self.foreign.id).quantity, 3)
+        self.assertEqual(FarmerTotal.objects.get(farmer=self.farmer).total_quantity, 48)
+        call_command('rebuildcroptotals', '--verify', stdout=io.StringIO())
+
+    def test_invalid_items_are_reported(self):
+        response = self.client.post(self.url, {
+            'update': [{'id': self.maize.id, 'quantity': -1}, {'id': self.rice.id}, {'id': self.beans.id, 'name': 'Peas'}],
+            'delete': [self.beans.id, 'x'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        errors = [result.get('errors', {}) for result in response.data['results']]
+        self.assertIn('quantity', errors[0])
+        self.assertIn('non_field_errors', errors[1])
+        self.assertEqual(errors[2], {})
+        self.assertIn('id', errors[3])
+        self.assertIn('id', errors[4])
+        self.assertEqual(Crop.objects.get(pk=self.beans.id).name, 'Peas')
+
+    def test_ids_out_of_range_fail_without_a_query(self):
+        response = self.client.post(self.url, {
+            'update': [{'id': -2 ** 70, 'quantity': 1}, {'id': self.maize.id, 'quantity': 2}], 'delete': [2 ** 70],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']], ['failed', 'updated', 'failed'])
+        self.assertEqual(response.data['results'][2], {'id': 2 ** 70, 'action': 'delete', 'status': 'failed', 'errors': {'id': ['A valid crop id is required.']}})
+
+    def test_abort_rolls_back(self):
+        response = self.client.post(f'{self.url}?on_error=abort', {
+            'update': [{'id': self.maize.id, 'quantity': 40}], 'delete': [self.foreign.id],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([result['status'] for result in response.data['results']], ['skipped', 'failed'])
+        self.assertEqual(Crop.objects.get(pk=self.maize.id).quantity, 10)
+        self.assertEqual(FarmerTotal.objects.get(farmer=self.farmer).total_quantity, 23)
+
+    def test_nothing_applied_is_a_bad_request(self):
+        response = self.client.post(self.url, {'delete': [self.foreign.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Crop.objects.filter(pk=self.foreign.id).exists())
+
+        response = self.client.post(self.url, {'update': 'all'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        crops = Crop.objects.bulk_create([
+            Crop(farmer=self.farmer, name=f'Crop {i}', crop_type='fruit', quantity=i + 1) for i in range(40)
+        ])
+        body = lambda chunk: {'update': [{'id': crop.id, 'quantity': 2} for crop in chunk[::2]], 'delete': [crop.id for crop in chunk[1::2]]}
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, body(crops[:4]), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, body(crops[4:]), format='json')
+        self.assertLessEqual(len(large), len(small) + 2)
+        call_command('rebuildcroptotals', '--verify', stdout=io.StringIO())
+
+
+class CropListSerializerTestCase(APITestCase):
+    def setUp(self):
+        self.admin = create_user('admin', role='admin')
+        self.farmers = [
+            create_user(f'farmer{i}')
+            for i in range(3)
+        ]
+        Crop.objects.bulk_create([
+            Crop(farmer=self.farmers[i % 3], name=f'Crop {i}', crop_type=Crop.CROP_TYPES[i % 8][0], quantity=i + 1)
+            for i in range(12)
+        ])
+
+    def get(self, user, **params):
+        self.authenticate(user)
+        return self.client.get(reverse('farmer_crop_list_create_view'), params)
+
+    def test_list_matches_crop_serializer(self):
+        response = self.get(self.admin)
+        expected = CropSerializer(Crop.objects.select_related('farmer').order_by('-created'), many=True).data
+        self.assertEqual(response.json(), json.loads(JSONRenderer().render(expected)))
+        self.assertEqual({crop['farmer'] for crop in response.json()}, {'farmer0', 'farmer1', 'farmer2'})
+
+    def test_pages_match_crop_serializer(self):
+        response = self.get(self.farmers[0], page_size=3)
+        crops = Crop.objects.filter(farmer=self.farmers[0]).order_by('-created', '-id')[:3]
+        expected = CropSerializer(crops, many=True).data
+        self.assertEqual(response.json()['results'], json.loads(JSONRenderer().render(expected)))
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_datetimes_follow_the_current_timezone(self):
+        crops = Crop.objects.select_related('farmer').order_by('id')
+        with timezone.override('Africa/Nairobi'):
+            expected = CropSerializer(crops, many=True).data
+            compiled = crop_list_serializer.serialize(crop_list_serializer.values(crops))
+        self.assertEqual(compiled, [dict(crop) for crop in expected])
+        self.assertTrue(compiled[0]['created'].endswith('+03:00'))
+
+
+class CropExportTestCase(APITestCase):
+    def setUp(self):
+        self.admin = create_user('admin', role='admin')
+        self.farmer = create_user('farmer1')
+        Crop.objects.create(farmer=self.farmer, name='Maize', crop_type='cereal', quantity=10)
+        Crop.objects.create(farmer=self.farmer, name='Beans', crop_type='legume', quantity=4)
+        self.url = reverse('admin_crop_export_view')
+        self.authenticate(self.admin)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_with_filters(self):
+        response = self.client.get(self.url, {'crop_type': 'cereal', 'include': 'farmer', 'created_after': '2000-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0], 'id,farmer_id,farmer_username,name,crop_type,quantity,created')
+        self.assertEqual(len(lines), 2)
+        self.assertIn('farmer1,Maize,cereal,10', lines[1])
+
+    def test_ndjson_export(self):
+        response = self.client.get(self.url, {'output': 'ndjson', 'created_before': '2000-01-01'})
+        self.assertEqual(self.read(response), '')
+        response = self.client.get(self.url, {'output': 'ndjson', 'farmer': self.farmer.id})
+        self.assertEqual(len(self.read(response).splitlines()), 2)
+
+    def test_invalid_filters(self):
+        response = self.client.get(self.url, {'created_after': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_farmers_cannot_export(self):
+        self.authenticate(self.farmer)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ResponseCacheTestCase(APITestCase):
+    def setUp(self):
+        # Claims are only trusted with a cache every worker shares.
+        self.use_shared_cache(REVOCATION_SYNC_INTERVAL=10 ** 9)
+        cache.clear()
+        # Loaded up front, not by whichever request first passes the sync interval.
+        revocations.sync(force=True)
+        self.admin = create_user('admin', role='admin')
+        self.farmer = create_user('farmer1')
+        self.crop = Crop.objects.create(farmer=self.farmer, name='Maize', crop_type='cereal', quantity=10)
+        self.authenticate(self.admin)
+
+    def test_repeat_requests_are_served_from_cache(self):
+        url = reverse('admin_crop_stats_view')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['total_crops'], 10)
+        self.assertEqual(caching.stats()['hits'], 1)
+        self.assertEqual(caching.stats()['misses'], 1)
+
+    def test_writes_invalidate_cached_responses(self):
+        url = reverse('admin_crop_stats_view')
+        self.client.get(url)
+
+        Crop.objects.create(farmer=self.farmer, name='Beans', crop_type='legume', quantity=5)
+        self.assertEqual(self.client.get(url).data['total_crops'], 15)
+        Crop.objects.filter(pk=self.crop.pk).update(quantity=1)
+        self.assertEqual(self.client.get(url).data['total_crops'], 6)
+        Crop.objects.get(pk=self.crop.pk).delete()
+        self.assertEqual(self.client.get(url).data['total_crops'], 5)
+        self.farmer.delete()
+        self.assertEqual(self.client.get(url).data['total_farmers'], 0)
+
+    def test_conditional_get_skips_queries(self):
+        url = reverse('farmer_crop_list_create_view')
+        response = self.client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+        Crop.objects.create(farmer=self.farmer, name='Beans', crop_type='legume', quantity=5)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_writes_within_a_second_are_not_hidden_by_if_modified_since(self):
+        url = reverse('farmer_crop_list_create_view')
+        # Both generations fall within the same second.
+        with mock.patch('core.caching.time.time_ns', side_effect=itertools.count(1_800_000_000 * 10 ** 9)):
+            cache.clear()
+            response = self.client.get(url)
+            Crop.objects.create(farmer=self.farmer, name='Beans', crop_type='legume', quantity=5)
+            changed = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(changed['Last-Modified'], response['Last-Modified'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(changed.data), 2)
+
+    def test_entries_are_per_user(self):
+        url = reverse('farmer_crop_list_create_view')
+        self.client.get(url)
+        other = create_user('farmer2')
+        self.authenticate(other)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data, [])
+
+
+class AsyncViewsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.admin = create_user('admin', role='admin')
+        self.farmer = create_user('farmer1')
+        Crop.objects.create(farmer=self.farmer, name='Maize', crop_type='cereal', quantity=10)
+        Crop.objects.create(farmer=self.farmer, name='Beans', crop_type='legume', quantity=4)
+
+    def call(self, view_class, user, path='/', **params):
+        request = self.factory.get(path, params)
+        force_authenticate(request, user=user)
+        response = async_to_sync(view_class.as_view())(request)
+        cache.clear()
+        return response
+
+    def test_async_views_match_sync_views(self):
+        cases = [
+            (views.AdminStatsView, views.AsyncAdminStatsView, self.admin, {}),
+            (views.FarmerCropStatsView, views.AsyncFarmerCropStatsView, self.farmer, {}),
+            (views.FarmerCropListCreateView, views.AsyncFarmerCropListCreateView, self.farmer, {}),
+            (views.FarmerCropListCreateView, views.AsyncFarmerCropListCreateView, self.admin, {'page_size': 1}),
+        ]
+        for sync_view, async_view, user, params in cases:
+            with self.subTest(view=async_view.__name__, params=params):
+                request = self.factory.get('/', params)
+                force_authenticate(request, user=user)
+                expected = sync_view.as_view()(request)
+                cache.clear()
+                response = self.call(async_view, user, **params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data, expected.data)
+
+    def test_async_views_check_permissions(self):
+        response = self.call(views.AsyncAdminStatsView, self.farmer)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class GatherQueriesTestCase(TransactionTestCase):
+    def test_queries_run_on_their_own_connections(self):
+        farmer = create_user('farmer1')
+        Crop.objects.create(farmer=farmer, name='Maize', crop_type='cereal', quantity=10)
+        threads = set()
+
+        def query(result):
+            threads.add(threading.get_ident())
+            return result()
+
+        results = async_to_sync(gather_queries)(
+            lambda: query(Crop.objects.count),
+            lambda: query(lambda: User.objects.get(pk=farmer.pk).username),
+        )
+        self.assertEqual(results, [1, 'farmer1'])
+        self.assertNotIn(threading.get_ident(), threads)
+
+
+class SeedDataTestCase(APITestCase):
+    def seed(self, *args):
+        call_command('seeddata', '--farmers', '20', '--crops', '300', '--days', '30', '--batch-size', '64', *args, stdout=io.StringIO())
+
+    def test_seeds_skewed_crops_with_consistent_totals(self):
+        self.seed()
+        seeded = User.objects.filter(username__startswith='seed_')
+        self.assertEqual(seeded.count(), 20)
+        self.assertEqual(Crop.objects.filter(farmer__in=seeded).count(), 300)
+        self.assertTrue(seeded.first().check_password('Seed@12345'))
+
+        created = Crop.objects.order_by('created').values_list('created', flat=True)
+        self.assertGreater(created.last() - created.first(), timedelta(days=7))
+        self.assertGreaterEqual(created.first(), seeded.order_by('created').first().created)
+        per_type = sorted(Crop.objects.values('crop_type').annotate(n=Count('id')).values_list('n', flat=True))
+        self.assertGreater(per_type[-1], 2 * per_type[0])
+        call_command('rebuildcroptotals', '--verify', stdout=io.StringIO())
+
+    def test_clear_replaces_the_seeded_farmers(self):
+        self.seed()
+        self.seed('--clear')
+        self.assertEqual(User.objects.filter(username__startswith='seed_').count(), 20)
+        self.assertEqual(Crop.objects.count(), 300)
+        call_command('rebuildcroptotals', '--verify', stdout=io.StringIO())
+
+
+class BenchApiTestCase(TransactionTestCase):
+    def test_reports_every_scenario_as_json(self):
+        User.objects.create_user(username='admin', email='admin@example.com', password='Admin@123', role='admin')
+        call_command('seeddata', '--farmers', '5', '--crops', '50', stdout=io.StringIO())
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+            call_command(
+                'benchapi', '--requests', '4', '--warmup', '1', '--concurrency', '1', '--unique', '--output', output.name,
+                '--only', 'profile', 'admin stats', 'farmer crop create', stdout=io.StringIO()
+            )
+            report = json.load(output)
+
+        self.assertEqual(set(report['results']), {'profile', 'admin stats', 'farmer crop create'})
+        stats = report['results']['admin stats']
+        self.assertEqual(stats['requests'], 4)
+        self.assertEqual(stats['statuses'], {'200': 4})
+        self.assertGreater(stats['queries_per_request'], 0)
+        self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+        self.assertEqual(report['results']['farmer crop create']['statuses'], {'201': 4})
+        # Crops added by the benchmark are removed again.
+        self.assertEqual(Crop.objects.count(), 50)
+
+
+class PoolOptionsTestCase(SimpleTestCase):
+    def test_defaults_enable_a_checked_pool(self):
+        options = dbpool.pool_options({})
+        self.assertEqual((options['min_size'], options['max_size']), (2, 10))
+        self.assertIs(options['check'], dbpool.check_connection)
+
+    def test_environment_overrides(self):
+        options = dbpool.pool_options({'DB_POOL_MAX_SIZE': '32', 'DB_POOL_MAX_IDLE': '60', 'DB_POOL_CHECK': '0'})
+        self.assertEqual((options['max_size'], options['max_idle']), (32, 60.0))
+        self.assertNotIn('check', options)
+        self.assertIsNone(dbpool.pool_options({'DB_POOL': 'false'}))
+
+
+class PoolStatsTestCase(SimpleTestCase):
+    def test_stats_report_in_use_and_idle_connections(self):
+        pool = mock.Mock(min_size=2, max_size=10)
+        pool.get_stats.return_value = {
+            'pool_min': 2, 'pool_max': 10, 'pool_size': 6, 'pool_available': 2,
+            'requests_waiting': 1, 'requests_num': 40, 'requests_wait_ms': 125,
+        }
+        handler = {'default': mock.Mock(pool=pool), 'other': mock.Mock(spec=[])}
+        with mock.patch('django.db.connections', handler):
+            stats = dbpool.pool_stats()
+
+        self.assertEqual(list(stats), ['default'])
+        self.assertEqual(stats['default']['in_use'], 4)
+        self.assertEqual(stats['default']['idle'], 2)
+        self.assertEqual(stats['default']['waiting'], 1)
+        self.assertEqual(stats['default']['wait_ms_total'], 125)
+
+
+def rich_payload():
+    return ReturnDict({
+        'created': datetime(2025, 3, 1, 8, 30, 0, 123456, tzinfo=ZoneInfo('UTC')),
+        'local': datetime(2025, 7, 1, 8, 30, tzinfo=ZoneInfo('Africa/Nairobi')),
+        'day': date(2025, 3, 1),
+        'quantity': Decimal('12.50'),
+        'icon': f'ProfileIcons/{uuid.UUID(int=7)}.png',
+        'token': uuid.UUID(int=7),
+        'label': gettext_lazy('Farmer'),
+        'elapsed': timedelta(seconds=90),
+        'by_id': {1: 'one', 2: 'two'},
+        'text': 'caf\u00e9\u2028line\u2029end',
+        'rows': [{'farmer': 'amina', 'totalCrops': 2 ** 40}, None, True, 1.5],
+    }, serializer=None)
+
+
+class FastJSONRendererTestCase(SimpleTestCase):
+    def test_output_matches_drf(self):
+        content = renderers.FastJSONRenderer().render(rich_payload())
+        self.assertEqual(content, JSONRenderer().render(rich_payload()))
+        self.assertIn(b'caf\xc3\xa9\\u2028line\\u2029end', content)
+
+    def test_indented_output_uses_the_stdlib(self):
+        context = {'indent': 4}
+        self.assertEqual(renderers.FastJSONRenderer().render(rich_payload(), renderer_context=context), JSONRenderer().render(rich_payload(), renderer_context=context))
+        self.assertIn(b'\n    "', renderers.FastJSONRenderer().render(rich_payload(), 'application/json; indent=4'))
+
+    def test_values_orjson_cannot_encode_fall_back(self):
+        data = {'big': 2 ** 70}
+        self.assertEqual(renderers.FastJSONRenderer().render(data), b'{"big":1180591620717411303424}')
+        with self.assertRaises(TypeError):
+            renderers.FastJSONRenderer().render({'unknown': object()})
+
+    def test_works_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(rich_payload()), JSONRenderer().render(rich_payload()))
+            self.assertEqual(renderers.FastJSONParser().parse(io.BytesIO(b'{"a":[1,2]}')), {'a': [1, 2]})
+
+
+class FastJSONParserTestCase(SimpleTestCase):
+    def test_parses_like_drf(self):
+        body = JSONRenderer().render(rich_payload())
+        self.assertEqual(renderers.FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+    def test_invalid_json_is_a_parse_error(self):
+        for body in (b'{"a": ', b'{"a": NaN}', b'\xff'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                renderers.FastJSONParser().parse(io.BytesIO(body))
+
+    def test_integers_beyond_64_bits_keep_every_digit(self):
+        for number in (2 ** 64, -2 ** 63 - 1, 10 ** 30):
+            with self.subTest(number=number):
+                parsed = renderers.FastJSONParser().parse(io.BytesIO(b'{"id": %d, "ids": [1, %d]}' % (number, number)))
+                self.assertEqual(parsed, {'id': number, 'ids': [1, number]})
+                self.assertIsInstance(parsed['id'], int)
+
+    def test_other_charsets_use_the_stdlib(self):
+        body = '{"name": "café"}'.encode('latin-1')
+        parsed = renderers.FastJSONParser().parse(io.BytesIO(body), parser_context={'encoding': 'latin-1'})
+        self.assertEqual(parsed, {'name': 'café'})
+
+
+@override_settings(PASSWORD_HASHERS=[MD5], METRICS_TOKEN='scrape-secret')
+class MetricsTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin', role='admin')
+        cls.farmer = create_user('farmer')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_admins_get_server_timing(self):
+        self.authenticate(self.admin)
+        response = self.client.get(reverse('admin_crop_stats_view'))
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for name in ('db;dur=', 'app;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(name, timing)
+        self.assertNotIn('desc="0 queries"', timing)
+
+    def test_farmers_do_not_get_server_timing(self):
+        self.authenticate(self.farmer)
+        response = self.client.get(reverse('farmer_crop_stats_view'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_requests_are_aggregated_per_view(self):
+        self.authenticate(self.farmer)
+        view = 'farmer_crop_stats_view'
+        before = metrics.registry.views.get((view, 'GET'), {}).get('count', 0)
+        self.client.get(reverse(view))
+        self.client.get(reverse(view))
+        entry = metrics.registry.views[(view, 'GET')]
+        self.assertEqual(entry['count'], before + 2)
+        self.assertGreater(entry['queries'], 0)
+        self.assertEqual(sum(entry['buckets']), entry['count'])
+
+    def test_metrics_endpoint_exports_prometheus_text(self):
+        self.authenticate(self.farmer)
+        self.client.get(reverse('farmer_crop_stats_view'))
+        self.client.credentials()
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{view="farmer_crop_stats_view",method="GET",le="+Inf"}', body)
+        self.assertIn('http_requests_total{view="farmer_crop_stats_view",method="GET",status="200"}', body)
+        self.assertIn('# TYPE auth_user_cache_hits_total counter', body)
+        self.assertIn('response_cache_misses_total', body)
+
+    def test_metrics_endpoint_requires_the_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        with self.settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+    def test_snapshots_of_all_workers_are_summed(self):
+        self.authenticate(self.farmer)
+        self.client.get(reverse('farmer_crop_stats_view'))
+        metrics.registry.flush(force=True)
+        own = cache.get(f'metrics:worker:{metrics.os.getpid()}')
+        cache.set('metrics:worker:other', own)
+        cache.set(metrics.WORKERS_KEY, [*cache.get(metrics.WORKERS_KEY), 'metrics:worker:other', 'metrics:worker:gone'])
+
+        views, gauges, _ = metrics.collect()
+        entry = next(e for e in own['views'] if e['view'] == 'farmer_crop_stats_view')
+        self.assertGreaterEqual(views[('farmer_crop_stats_view', 'GET')]['count'], 2 * entry['count'])
+        self.assertNotIn('metrics:worker:gone', cache.get(metrics.WORKERS_KEY))
+
+    def test_recorder_keeps_outer_execute_wrappers_balanced(self):
+        connection.execute_wrappers.remove(metrics.record_query)
+        self.authenticate(self.farmer)
+        counted = []
+
+        def count(execute, *args):
+            counted.append(1)
+            return execute(*args)
+
+        with connection.execute_wrapper(count):
+            # The recorder is installed by this request, inside the block.
+            self.client.get(reverse('farmer_crop_stats_view'))
+        self.assertEqual(connection.execute_wrappers, [metrics.record_query])
+        self.assertTrue(counted)
+
+
+# Writes take a couple of extra queries the first time a totals row or rank
+# bucket has to be created; anything beyond that is growth with the data.
+GROWTH_TOLERANCE = 2
+
+
+# A non-form request body, e.g. a CSV upload.
+RawBody = namedtuple('RawBody', ['body', 'content_type'])
+
+
+def fresh_farmer(case):
+    suffix = uuid.uuid4().hex[:8]
+    return create_user(f'victim_{suffix}')
+
+
+def fresh_crop(case):
+    return Crop.objects.create(farmer=case.farmer, name='Spare', crop_type='other', quantity=1)
+
+
+def batch_payload(case):
+    crops = [fresh_crop(case) for _ in range(6)]
+    return RawBody(json.dumps({
+        'update': [{'id': crop.pk, 'quantity': 9} for crop in crops[:3]], 'delete': [crop.pk for crop in crops[3:]],
+    }), 'application/json')
+
+
+def prefer_async(case):
+    case.authenticate(case.admin, HTTP_PREFER='respond-async')
+
+
+def farmer_job(case):
+    return {'pk': enqueue('crops.admin_stats', created_by=case.farmer).pk}
+
+
+def signup_payload(case):
+    suffix = uuid.uuid4().hex[:8]
+    return {'username': f'new_{suffix}', 'email': f'new_{suffix}@example.com', 'password': PASSWORD}
+
+
+# (url name, method, user, budget, url kwargs, payload, extra request setup)
+ENDPOINTS = [
+    ('admin_crop_stats_view', 'get', 'admin', 4, None, None, None),
+    ('admin_crop_stats_view', 'get', 'admin', 5, None, lambda case: {'fresh': uuid.uuid4().hex}, prefer_async),
+    ('farmer_crop_stats_view', 'get', 'farmer', 4, None, None, None),
+    ('admin_crop_analytics_view', 'get', 'admin', 1, None, {'interval': 'week'}, None),
+    ('farmer_crop_analytics_view', 'get', 'farmer', 1, None, None, None),
+    ('admin_crop_export_view', 'get', 'admin', 2, None, {'include': 'farmer', 'output': 'ndjson'}, None),
+    ('farmer_crop_list_create_view', 'get', 'admin', 2, None, None, None),
+    ('farmer_crop_list_create_view', 'get', 'farmer', 2, None, {'page_size': 20}, None),
+    ('farmer_crop_list_create_view', 'get', 'admin', 2, None, {'crop_type': 'cereal', 'quantity_min': 5, 'search': 'crop', 'page_size': 20}, None),
+    ('farmer_crop_list_create_view', 'post', 'farmer', 18, None, {'name': 'Maize', 'crop_type': 'cereal', 'quantity': 3}, None),
+    ('farmer_crop_import_view', 'post', 'farmer', 20, None, RawBody('name,crop_type,quantity\n' + 'Maize,cereal,4\n' * 50, 'text/csv'), None),
+    ('farmer_crop_batch_view', 'post', 'farmer', 22, None, batch_payload, None),
+    ('farmer_crop_detail_view', 'get', 'farmer', 2, lambda case: {'pk': fresh_crop(case).pk}, None, None),
+    ('farmer_crop_detail_view', 'patch', 'farmer', 20, lambda case: {'pk': fresh_crop(case).pk}, {'quantity': 9}, None),
+    ('farmer_crop_detail_view', 'delete', 'farmer', 16, lambda case: {'pk': fresh_crop(case).pk}, None, None),
+    ('farmer_leaderboard_view', 'get', 'farmer', 8, None, None, None),
+    ('leaderboard_view', 'get', 'farmer', 4, None, None, None),
+    ('signup_view', 'post', None, 5, None, signup_payload, None),
+    ('login_view', 'post', None, 1, None, lambda case: {'email': case.farmer.email, 'password': PASSWORD}, None),
+    ('logout_view', 'post', None, 1, None, None, lambda case: case.client.cookies.load({'refreshToken': str(RefreshToken.for_user(case.farmer))})),
+    ('token_refresh', 'post', None, 1, None, lambda case: {'refresh': str(RefreshToken.for_user(case.farmer))}, None),
+    ('user_profile_view', 'get', 'farmer', 1, None, None, None),
+    ('user_profile_update_view', 'patch', 'farmer', 3, None, {'username': 'farmer_renamed'}, None),
+    ('farmer_list_create_view', 'get', 'admin', 2, None, None, None),
+    ('farmer_list_create_view', 'get', 'admin', 2, None, {'search': 'farmer_', 'search_mode': 'prefix'}, None),
+    ('farmer_list_create_view', 'get', 'admin', 3, None, {'include': 'totals', 'ordering': '-total_quantity', 'page_size': 20}, None),
+    ('farmer_list_create_view', 'post', 'admin', 5, None, signup_payload, None),
+    ('farmer_export_view', 'get', 'admin', 2, None, None, None),
+    ('farmer_detail_view', 'get', 'admin', 2, lambda case: {'pk': case.farmer.pk}, None, None),
+    ('farmer_detail_view', 'get', 'admin', 3, lambda case: {'pk': case.farmer.pk}, {'include': 'totals'}, None),
+    ('farmer_detail_view', 'patch', 'admin', 3, lambda case: {'pk': case.farmer.pk}, {'first_name': 'Jane'}, None),
+    ('farmer_detail_view', 'delete', 'admin', 11, lambda case: {'pk': fresh_farmer(case).pk}, None, None),
+    ('job_list_view', 'get', 'farmer', 2, None, {'page_size': 20}, None),
+    ('job_detail_view', 'get', 'farmer', 2, farmer_job, None, None),
+]
+
+
+# Hashing dominates otherwise and is irrelevant to query counts. The token
+# revocation list is loaded once up front instead of on whichever request
+# first passes the sync interval.
+@override_settings(PASSWORD_HASHERS=[MD5], REVOCATION_SYNC_INTERVAL=10 ** 9)
+class QueryBudgetTestCase(APITestCase):
+    """
+    Query-budget regression suite.
+
+    Every route in ``crops/urls.py``, ``users/urls.py`` and ``jobs/urls.py`` is exercised at growing
+    data volumes. The test fails when an endpoint's query count changes with the
+    number of rows (an N+1) or exceeds the budget declared in ``ENDPOINTS``.
+
+    Set ``QUERY_BUDGET_REPORT=/path/report.json`` to save the counts and SQL.
+    """
+    volumes = (10, 1000, 10000)
+    farmer_count = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin', role='admin')
+        cls.farmer = create_user('farmer')
+        cls.farmers = [cls.farmer] + User.objects.bulk_create([
+            User(username=f'farmer_{i}', email=f'farmer_{i}@example.com', password='!', role='farmer')
+            for i in range(cls.farmer_count - 1)
+        ])
+
+    def setUp(self):
+        # Claims are only trusted with a cache every worker shares.
+        self.use_shared_cache()
+        revocations.sync(force=True)
+
+    def seed_crops(self, volume):
+        existing = Crop.objects.count()
+        crop_types = [key for key, _ in Crop.CROP_TYPES]
+        Crop.objects.bulk_create([
+            Crop(farmer=self.farmers[i % len(self.farmers)], name=f'Crop {i}', crop_type=crop_types[i % len(crop_types)], quantity=i % 50 + 1)
+            for i in range(existing, volume)
+        ], batch_size=2000)
+
+    def measure(self, name, method, role, kwargs, payload, setup):
+        self.client.credentials()
+        self.client.cookies.clear()
+        if role:
+            user = self.admin if role == 'admin' else self.farmer
+            self.authenticate(user)
+        if setup:
+            setup(self)
+        url = reverse(name, kwargs=kwargs(self) if kwargs else None)
+        data = payload(self) if callable(payload) else payload
+
+        options = {}
+        if isinstance(data, RawBody):
+            data, options = data.body, {'content_type': data.content_type}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, **options)
+            if response.streaming:
+                # Streamed exports run their query while the body is consumed.
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f'{method.upper()} {url} failed: {response.status_code} {getattr(response, "data", "")}')
+        return len(queries), [query['sql'] for query in queries.captured_queries]
+
+    def test_every_route_has_a_budget(self):
+        budgeted = {endpoint[0] for endpoint in ENDPOINTS}
+        routes = {route.name for route in crop_routes + user_routes + job_routes}
+        self.assertEqual(routes - budgeted, set(), 'Declare a query budget for new routes in ENDPOINTS.')
+
+    def test_query_counts_stay_flat_as_data_grows(self):
+        report = {}
+        for volume in self.volumes:
+            self.seed_crops(volume)
+            for name, method, role, budget, kwargs, payload, setup in ENDPOINTS:
+                count, sql = self.measure(name, method, role, kwargs, payload, setup)
+                report.setdefault(f'{method.upper()} {name} ({role or "anonymous"})', {})[volume] = {
+                    'budget': budget, 'queries': count, 'sql': sql
+                }
+
+        path = os.environ.get('QUERY_BUDGET_REPORT')
+        if path:
+            with open(path, 'w') as handle:
+                json.dump(report, handle, indent=2)
+
+        for endpoint, runs in report.items():
+            with self.subTest(endpoint=endpoint):
+                counts = {volume: run['queries'] for volume, run in runs.items()}
+                largest = runs[self.volumes[-1]]
+                self.assertLessEqual(
+                    max(counts.values()) - min(counts.values()), GROWTH_TOLERANCE,
+                    f'Query count grows with data {counts}:\n' + '\n'.join(largest['sql'])
+                )
+                self.assertLessEqual(
+                    largest['queries'], largest['budget'],
+                    f'Over budget ({largest["queries"]} > {largest["budget"]}):\n' + '\n'.join(largest['sql'])
+                )
@@ -1,11 +1,25 @@
 from django.urls import path
-from .views import FarmerCropListCreateView, FarmerCropRetrieveUpdateDestroyView, FarmerCropStatsView, AdminStatsView 
+from django.conf import settings
+from .views import FarmerCropListCreateView, FarmerCropRetrieveUpdateDestroyView, FarmerCropBatchView, FarmerCropStatsView, AdminStatsView, CropExportView, CropImportView, LeaderboardView, LeaderboardAroundMeView
+from .views import CropAnalyticsView, FarmerCropAnalyticsView
+from .views import AsyncAdminStatsView, AsyncFarmerCropListCreateView, AsyncFarmerCropStatsView
+
+if settings.ASYNC_VIEWS:
+    AdminStatsView, FarmerCropStatsView, FarmerCropListCreateView = AsyncAdminStatsView, AsyncFarmerCropStatsView, AsyncFarmerCropListCreateView
 
 urlpatterns = [
     # Admin routes
     path('v1/crops/stats/', AdminStatsView.as_view(), name='admin_crop_stats_view'),
+    path('v1/crops/export/', CropExportView.as_view(), name='admin_crop_export_view'),
+    path('v1/crops/analytics/', CropAnalyticsView.as_view(), name='admin_crop_analytics_view'),
     # Farmer routes
     path('v1/farmer/crops/stats/', FarmerCropStatsView.as_view(), name='farmer_crop_stats_view'),
+    path('v1/farmer/crops/analytics/', FarmerCropAnalyticsView.as_view(), name='farmer_crop_analytics_view'),
     path('v1/farmer/crops/', FarmerCropListCreateView.as_view(), name='farmer_crop_list_create_view'),
+    path('v1/farmer/crops/import/', CropImportView.as_view(), name='farmer_crop_import_view'),
+    path('v1/farmer/crops/batch/', FarmerCropBatchView.as_view(), name='farmer_crop_batch_view'),
     path('v1/farmer/crops/<int:pk>/', FarmerCropRetrieveUpdateDestroyView.as_view(), name='farmer_crop_detail_view'),
+    path('v1/farmer/leaderboard/', LeaderboardAroundMeView.as_view(), name='farmer_leaderboard_view'),
+    # Shared routes
+    path('v1/leaderboard/', LeaderboardView.as_view(), name='leaderboard_view'),
 ]
\ No newline at end of file
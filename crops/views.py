@@ -1,12 +1,25 @@
-from .models import Crop
+from . import analytics, batch, importer, leaderboard
+from core import streaming
+from core.search import SearchFilter
+from core.caching import cached_response, conditional
+from core.asyncviews import AsyncAPIView, AsyncListMixin, gather_queries, run_sync
+from core.readserializers import CompiledListMixin
+from jobs.queue import enqueue
+from jobs.views import accepted, prefers_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Crop, FarmerCropTotal
+from .filters import CropFilter, crop_filters, parse_integer
 from django.db.models import Sum
-from rest_framework import generics
-from .serializers import CropSerializer
+from rest_framework import generics, status
+from rest_framework.views import APIView
+from .serializers import CropSerializer, crop_list_serializer
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from users.permissions import IsAdmin, IsFarmer 
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 
 User = get_user_model()
 
@@ -20,50 +33,46 @@ class FarmerCropStatsView(generics.GenericAPIView):
     """
     permission_classes = [IsAuthenticated, IsFarmer]
 
+    @conditional('crops', 'users')
+    @cached_response('crops', 'users')
     def get(self, request, *args, **kwargs): 
-        stats = (
-            Crop.objects.filter(farmer=request.user)
-            .values('crop_type')
-            .annotate(total_quantity=Sum('quantity'))
+        totals = self.get_totals(request.user.id)
+        names_by_type = self.get_names_by_type(request.user.id)
+        crop_data, total_count = self.summarize(totals, names_by_type)
+        rank = leaderboard.rank_of(total_count)
+
+        return Response({
+            "username": request.user.username,
+            'crops_by_type': crop_data,
+            'total_count': total_count,
+            'rank': rank
+        })
+
+    def get_totals(self, farmer_id):
+        return dict(
+            FarmerCropTotal.objects.filter(farmer_id=farmer_id)
+            .values_list('crop_type', 'total_quantity')
         )
- 
+
+    def get_names_by_type(self, farmer_id):
         names_by_type = {}
-        for crop in Crop.objects.filter(farmer=request.user):
-            names_by_type.setdefault(crop.crop_type, []).append(crop.name)
+        for crop_type, name in Crop.objects.filter(farmer_id=farmer_id).order_by('id').values_list('crop_type', 'name'):
+            names_by_type.setdefault(crop_type, []).append(name)
+        return names_by_type
 
-        all_types = dict(Crop.CROP_TYPES)
+    def summarize(self, totals, names_by_type):
         crop_data = []
         total_count = 0
 
-        for key, label in all_types.items():
-            matched = next((item for item in stats if item['crop_type'] == key), None)
-            count = matched['total_quantity'] if matched else 0
+        for key, label in Crop.CROP_TYPES:
+            count = totals.get(key, 0)
             crop_data.append({
                 'name': names_by_type.get(key, []),  
                 'crop_type': label,
                 'count': count
             })
             total_count += count
- 
-        farmer_totals = (
-            Crop.objects
-            .values('farmer')
-            .annotate(total_crops=Sum('quantity'))
-            .order_by('-total_crops')
-        )
-
-        rank = 1
-        for i, f in enumerate(farmer_totals, start=1):
-            if f['farmer'] == request.user.id:
-                rank = i
-                break
-
-        return Response({
-            "username": request.user.username,
-            'crops_by_type': crop_data,
-            'total_count': total_count,
-            'rank': rank
-        })
+        return crop_data, total_count
     
 
 class AdminStatsView(generics.GenericAPIView):
@@ -72,52 +81,149 @@ class AdminStatsView(generics.GenericAPIView):
     - total farmers
     - total crops
     - crops per farmer for chart
+    With ``Prefer: respond-async`` (and nothing cached), returns 202 and a
+    ``crops.admin_stats`` job whose result has the same fields but username.
     """
     permission_classes = [IsAuthenticated, IsAdmin]
+    # Aggregates over every farmer (see core/throttling.py).
+    throttle_cost = 10
 
+    @conditional('crops', 'users')
+    @cached_response('crops', 'users')
     def get(self, request, *args, **kwargs): 
-        total_farmers = User.objects.filter(role=User.Role.FARMER).count()
-        total_crops = Crop.objects.aggregate(total=Sum('quantity'))['total'] or 0
- 
+        if prefers_async(request):
+            return self.enqueue_stats(request)
+        return Response({
+            "username": request.user.username,
+            "total_farmers": self.count_farmers(),
+            "total_crops": self.sum_crops(),
+            "crops_per_farmer": self.get_crops_per_farmer()
+        })
+
+    def enqueue_stats(self, request):
+        # Admins asking at the same time share one queued job.
+        return accepted(request, enqueue('crops.admin_stats', created_by=request.user, key='crops.admin_stats'))
+
+    def count_farmers(self):
+        return User.objects.filter(role=User.Role.FARMER).count()
+
+    def sum_crops(self):
+        return Crop.objects.aggregate(total=Sum('quantity'))['total'] or 0
+
+    def get_crops_per_farmer(self):
         crops_per_farmer_qs = (
             Crop.objects.values('farmer__username')
             .annotate(total_crops=Sum('quantity'))
             .order_by('farmer__username')
         )
-        crops_per_farmer = [
+        return [
             {'farmer': item['farmer__username'], 'totalCrops': item['total_crops']}
             for item in crops_per_farmer_qs
         ]
-
-        return Response({
-            "username": request.user.username,
-            "total_farmers": total_farmers,
-            "total_crops": total_crops,
-            "crops_per_farmer": crops_per_farmer
-        })
     
 
-class FarmerCropListCreateView(generics.ListCreateAPIView):
+class FarmerCropListCreateView(CompiledListMixin, generics.ListCreateAPIView):
     """
     Provides admin-level statistics:
     - Total number of farmers
     - Total number of crops quantity
     - List of crops per farmer for chart
+    Filters: crop_type, farmer (id), created_after, created_before, quantity_min,
+    quantity_max; ?search= on the crop name (substring, or prefix with ?search_mode=prefix)
     Access: Authenticated user
     """
     serializer_class = CropSerializer
+    # Lists are rendered from values() rows, joined to the farmer's username.
+    read_serializer = crop_list_serializer
     permission_classes = [IsAuthenticated] 
+    filter_backends = [CropFilter, SearchFilter]
+    search_fields = ['name']
+
+    def get_throttle_cost(self, request):
+        # Unpaginated, the admin list reads the whole crop table.
+        params = request.query_params
+        unpaginated = 'page_size' not in params and 'cursor' not in params
+        if request.method == 'GET' and unpaginated and getattr(request.user, 'role', None) == User.Role.ADMIN:
+            return 10
+        return 1
 
     def get_queryset(self):
         user = self.request.user
+        # CropSerializer renders the farmer's username for every row.
+        crops = Crop.objects.select_related('farmer')
         if user.role == User.Role.ADMIN:  
-            return Crop.objects.all().order_by('-created')
-        return Crop.objects.filter(farmer=user).order_by('-created')
+            return crops.order_by('-created')
+        return crops.filter(farmer_id=user.id).order_by('-created')
+
+    @conditional('crops', 'users', shared_by_role=True)
+    @cached_response('crops', 'users', shared_by_role=True)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(farmer=self.request.user)
 
 
+class AsyncFarmerCropStatsView(AsyncAPIView, FarmerCropStatsView):
+    """
+    FarmerCropStatsView for ASGI: the farmer's totals, crop names and username
+    are read concurrently, then the rank for the combined total.
+    Access: Farmers only
+    """
+    @conditional('crops', 'users')
+    @cached_response('crops', 'users')
+    async def get(self, request, *args, **kwargs):
+        user = request.user
+        totals, names_by_type, username = await gather_queries(
+            lambda: self.get_totals(user.id),
+            lambda: self.get_names_by_type(user.id),
+            lambda: user.username,
+        )
+        crop_data, total_count = self.summarize(totals, names_by_type)
+        rank = await run_sync(leaderboard.rank_of, total_count)
+
+        return Response({
+            "username": username,
+            'crops_by_type': crop_data,
+            'total_count': total_count,
+            'rank': rank
+        })
+
+
+class AsyncAdminStatsView(AsyncAPIView, AdminStatsView):
+    """
+    AdminStatsView for ASGI: the three aggregates run concurrently.
+    Access: Admin only
+    """
+    @conditional('crops', 'users')
+    @cached_response('crops', 'users')
+    async def get(self, request, *args, **kwargs):
+        if prefers_async(request):
+            return await run_sync(self.enqueue_stats, request)
+        user = request.user
+        username, total_farmers, total_crops, crops_per_farmer = await gather_queries(
+            lambda: user.username, self.count_farmers, self.sum_crops, self.get_crops_per_farmer
+        )
+        return Response({
+            "username": username,
+            "total_farmers": total_farmers,
+            "total_crops": total_crops,
+            "crops_per_farmer": crops_per_farmer
+        })
+
+
+class AsyncFarmerCropListCreateView(AsyncListMixin, AsyncAPIView, FarmerCropListCreateView):
+    """
+    FarmerCropListCreateView for ASGI: lists are read on a worker thread;
+    creating a crop runs the sync handler the same way.
+    Access: Authenticated user
+    """
+    @conditional('crops', 'users', shared_by_role=True)
+    @cached_response('crops', 'users', shared_by_role=True)
+    async def get(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+
 class FarmerCropRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete crops.
@@ -129,15 +235,241 @@ class FarmerCropRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView)
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Crop.objects.filter(farmer=self.request.user)
+        return Crop.objects.select_related('farmer').filter(farmer=self.request.user)
 
     def perform_update(self, serializer):
-        crop = self.get_object()
-        if crop.farmer != self.request.user:
+        # update() already fetched the crop through get_object().
+        if serializer.instance.farmer_id != self.request.user.id:
             raise PermissionDenied("You can only edit your own crops.")
         serializer.save()
 
     def perform_destroy(self, instance):
-        if instance.farmer != self.request.user:
+        if instance.farmer_id != self.request.user.id:
             raise PermissionDenied("You can only delete your own crops.")
-        instance.delete()
\ No newline at end of file
+        instance.delete()
+
+
+class FarmerCropBatchView(APIView):
+    """
+    Updates and deletes many of the farmer's crops in one transaction. The body
+    is {"update": [{"id": ..., "name"/"crop_type"/"quantity": ...}], "delete": [ids]}.
+    - Farmers can only modify their own crops; others are reported as not found
+    - Invalid or unknown items are skipped and reported, or roll back the whole batch with ?on_error=abort
+    - Returns one result per item, updates first, in request order
+    Access: Authenticated users
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 5
+
+    def post(self, request, *args, **kwargs):
+        abort_on_error = request.query_params.get('on_error') == 'abort'
+        updates, deletes, results = batch.parse_batch(request.data, settings.CROP_BATCH_MAX_ITEMS)
+        report = batch.apply_batch(request.user, updates, deletes, results, abort_on_error)
+
+        if report['failed'] and (abort_on_error or not (report['updated'] or report['deleted'])):
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class CropImportView(APIView):
+    """
+    Bulk-imports crops from a streamed CSV (text/csv, with a header row) or
+    NDJSON (application/x-ndjson) body with name, crop_type and quantity.
+    - Farmers import their own crops; admins add a farmer_id column
+    - Invalid rows are skipped and reported, or roll back the whole import with ?on_error=abort
+    - ?batch_size= overrides CROP_IMPORT_BATCH_SIZE for the INSERT batches
+    Access: Authenticated users
+    """
+    permission_classes = [IsAuthenticated]
+    max_batch_size = 5000
+    throttle_cost = 10
+
+    def post(self, request, *args, **kwargs):
+        content_type = request.content_type.split(';')[0].strip().lower()
+        if content_type not in importer.CSV_TYPES + importer.NDJSON_TYPES:
+            return Response({'error': 'Send text/csv or application/x-ndjson.'}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', settings.CROP_IMPORT_BATCH_SIZE))
+        except ValueError:
+            raise ValidationError({'batch_size': 'A valid integer is required.'})
+        batch_size = max(1, min(batch_size, self.max_batch_size))
+        abort_on_error = request.query_params.get('on_error') == 'abort'
+
+        # Read the underlying request line by line; request.data would buffer the whole body.
+        rows = importer.iter_rows(request._request, content_type)
+        report = importer.import_crops(rows, request.user, batch_size, abort_on_error)
+
+        if report['failed'] and (abort_on_error or not report['created']):
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
+
+class CropExportView(APIView):
+    """
+    Streams the crop book as CSV (default) or NDJSON with ?output=ndjson.
+    Filters: crop_type, farmer (id), created_after, created_before, quantity_min, quantity_max
+    Add ?include=farmer for the farmer's username column.
+    Access: Admin only
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+    throttle_cost = 20
+    columns = ['id', 'farmer_id', 'name', 'crop_type', 'quantity', 'created']
+
+    def get(self, request, *args, **kwargs):
+        output = streaming.export_format(request)
+        filters = crop_filters(request)
+
+        columns = list(self.columns)
+        if request.query_params.get('include') == 'farmer':
+            columns.insert(2, 'farmer__username')
+        queryset = Crop.objects.filter(**filters).order_by('id').values_list(*columns)
+
+        headers = [column.replace('__', '_') for column in columns]
+        return streaming.stream_export(queryset, headers, output, 'crops')
+
+
+class LeaderboardView(generics.GenericAPIView):
+    """
+    Ranks farmers by total crop quantity, globally or for one crop type.
+    Query params:
+    - crop_type: one of Crop.CROP_TYPES (optional)
+    - ties: competition (1, 2, 2, 4) or dense (1, 2, 2, 3)
+    - limit / offset: top-K page
+    Access: Authenticated users
+    """
+    permission_classes = [IsAuthenticated]
+    max_limit = 100
+
+    def get_ranking_params(self):
+        params = self.request.query_params
+        crop_type = params.get('crop_type') or None
+        if crop_type and crop_type not in dict(Crop.CROP_TYPES):
+            raise ValidationError({'crop_type': f'Must be one of: {", ".join(dict(Crop.CROP_TYPES))}.'})
+        ties = params.get('ties', leaderboard.COMPETITION)
+        if ties not in leaderboard.TIE_MODES:
+            raise ValidationError({'ties': f'Must be one of: {", ".join(leaderboard.TIE_MODES)}.'})
+        return crop_type, ties
+
+    def get_int_param(self, name, default, minimum, maximum):
+        value = self.request.query_params.get(name, default)
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValidationError({name: 'A valid integer is required.'})
+        if not minimum <= value <= maximum:
+            raise ValidationError({name: f'Must be between {minimum} and {maximum}.'})
+        return value
+
+    def get(self, request, *args, **kwargs):
+        crop_type, ties = self.get_ranking_params()
+        limit = self.get_int_param('limit', 10, 1, self.max_limit)
+        offset = self.get_int_param('offset', 0, 0, 10 ** 9)
+
+        return Response({
+            'crop_type': crop_type,
+            'ties': ties,
+            'results': leaderboard.top(limit, offset, crop_type, ties)
+        })
+
+
+class LeaderboardAroundMeView(LeaderboardView):
+    """
+    Returns the logged-in farmer's rank and the farmers ranked just above and below.
+    Query params: crop_type, ties, radius (farmers on each side)
+    Access: Farmers only
+    """
+    permission_classes = [IsAuthenticated, IsFarmer]
+    max_radius = 25
+
+    def get(self, request, *args, **kwargs):
+        crop_type, ties = self.get_ranking_params()
+        radius = self.get_int_param('radius', 5, 0, self.max_radius)
+        rank, results = leaderboard.around(request.user.id, radius, crop_type, ties)
+
+        return Response({
+            'crop_type': crop_type,
+            'ties': ties,
+            'rank': rank,
+            'results': results
+        })
+
+
+class CropAnalyticsView(generics.GenericAPIView):
+    """
+    Harvest series (total quantity and crop count per period), from the daily rollups.
+    Query params:
+    - interval: day (default), week or month
+    - start / end: ISO dates, inclusive (default: the last 30 days, 12 weeks or 12 months)
+    - crop_type: one of Crop.CROP_TYPES (optional)
+    - farmer: farmer id (optional, all farmers otherwise)
+    Access: Admin only
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+    throttle_cost = 3
+
+    def get_date_param(self, name, default):
+        value = self.request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: 'Use an ISO 8601 date (YYYY-MM-DD).'})
+        return parsed
+
+    def get_series_params(self):
+        params = self.request.query_params
+        interval = params.get('interval', analytics.DAY)
+        if interval not in analytics.INTERVALS:
+            raise ValidationError({'interval': f'Must be one of: {", ".join(analytics.INTERVALS)}.'})
+        crop_type = params.get('crop_type') or None
+        if crop_type and crop_type not in dict(Crop.CROP_TYPES):
+            raise ValidationError({'crop_type': f'Must be one of: {", ".join(dict(Crop.CROP_TYPES))}.'})
+
+        end = self.get_date_param('end', timezone.localdate())
+        start = self.get_date_param('start', None)
+        if start is None:
+            try:
+                start = analytics.default_start(end, interval)
+            except OverflowError:
+                raise ValidationError({'start': 'Required this close to the earliest supported date.'})
+        if not analytics.within_calendar(start, end, interval):
+            raise ValidationError({'end': 'Outside the supported date range.'})
+        if start > end:
+            raise ValidationError({'start': 'Must not be after end.'})
+        if (end - start).days >= analytics.MAX_RANGE_DAYS:
+            raise ValidationError({'start': f'The range may span at most {analytics.MAX_RANGE_DAYS} days.'})
+        return interval, start, end, crop_type
+
+    def get_farmer_id(self):
+        return parse_integer(self.request.query_params, 'farmer', Crop._meta.get_field('farmer').target_field, 'A valid farmer id is required.')
+
+    @conditional('crops')
+    @cached_response('crops')
+    def get(self, request, *args, **kwargs):
+        interval, start, end, crop_type = self.get_series_params()
+        farmer_id = self.get_farmer_id()
+
+        return Response({
+            'interval': interval,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'farmer': farmer_id,
+            'crop_type': crop_type,
+            'series': analytics.series(start, end, interval, farmer_id, crop_type)
+        })
+
+
+class FarmerCropAnalyticsView(CropAnalyticsView):
+    """
+    Harvest series of the logged-in farmer.
+    Query params: interval, start, end, crop_type
+    Access: Farmers only
+    """
+    permission_classes = [IsAuthenticated, IsFarmer]
+
+    def get_farmer_id(self):
+        return self.request.user.id
@@ -0,0 +1,9 @@
+from .models import Job
+from django.contrib import admin
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'created', 'finished')
+    list_filter = ('status', 'name')
+    raw_id_fields = ('created_by',)
@@ -0,0 +1,56 @@
+import sys
+import signal
+import subprocess
+from jobs.worker import Worker
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs queued background jobs. Each process runs --threads worker threads; '
+        'with --processes above 1, this command supervises that many worker '
+        'processes instead (for CPU-bound tasks). Stops after the running jobs '
+        'finish on SIGINT/SIGTERM.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.JOBS_PROCESSES)
+        parser.add_argument('--threads', type=int, default=settings.JOBS_THREADS)
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL, help='Seconds between polls of an empty queue.')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due instead of polling.')
+
+    def handle(self, *args, **options):
+        if options['processes'] > 1:
+            return self.supervise(options)
+
+        worker = Worker(threads=options['threads'], poll_interval=options['poll_interval'], once=options['once'])
+        stop = lambda signum, frame: worker.stop()
+        previous = {signum: signal.signal(signum, stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            processed = worker.run()
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(f'{worker.name}: ran {processed} job(s).')
+
+    def supervise(self, options):
+        """
+        Starts --processes single-process workers and relays stop signals to them.
+        """
+        command = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runjobs', '--processes', '1',
+            '--threads', str(options['threads']), '--poll-interval', str(options['poll_interval']),
+            *(['--once'] if options['once'] else []),
+        ]
+        children = [subprocess.Popen(command) for _ in range(options['processes'])]
+        relay = lambda signum, frame: [child.send_signal(signal.SIGTERM) for child in children if child.poll() is None]
+        previous = {signum: signal.signal(signum, relay) for signum in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            codes = [child.wait() for child in children]
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        failed = sum(1 for code in codes if code)
+        if failed:
+            self.stderr.write(f'{failed} worker process(es) exited with an error.')
@@ -0,0 +1,56 @@
+from django.db import models
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    A unit of background work (see jobs/queue.py): a registered task's name and
+    its JSON keyword arguments, run by ``manage.py runjobs``.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Enqueueing a key that is already queued returns that job. A running job
+    # does not count: it may have read its input before the new work arrived.
+    key = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    # Lower runs first.
+    priority = models.SmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=1)
+    run_at = models.DateTimeField(default=timezone.now)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    # The worker thread holding the job while it runs.
+    locked_by = models.CharField(max_length=100, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Claiming: the next due queued job. Only queued rows are indexed,
+            # so the index stays small however many finished jobs are kept.
+            models.Index(fields=['priority', 'run_at', 'id'], condition=Q(status='queued'), name='jobs_job_queued_idx'),
+            # Lease recovery of jobs whose worker died.
+            models.Index(fields=['started'], condition=Q(status='running'), name='jobs_job_running_idx'),
+            # Keyset pagination of a user's jobs, newest first.
+            models.Index(fields=['created_by', '-created', '-id'], name='jobs_job_owner_created_idx'),
+            models.Index(fields=['-created', '-id'], name='jobs_job_created_idx'),
+            # Pruning finished jobs.
+            models.Index(fields=['finished'], name='jobs_job_finished_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=Q(status='queued'), name='jobs_job_queued_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,93 @@
+"""
+Database-backed background jobs.
+
+Work too slow for a request is registered as a task and enqueued as a ``Job``
+row; ``manage.py runjobs`` claims and runs it (see jobs/worker.py)::
+
+    @task('users.render_profile_icon', max_attempts=3)
+    def render_profile_icon(name):
+        ...
+
+    enqueue('users.render_profile_icon', {'name': name}, key=f'profile-icon:{name}')
+
+- Tasks live in each app's ``tasks.py``, imported when the jobs app is ready.
+- Keyword arguments and return values are stored as JSON.
+- Enqueued inside a transaction, a job only becomes visible to workers when it
+  commits and disappears if it rolls back.
+- Failed attempts are retried with exponential backoff until ``max_attempts``.
+"""
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from django.db import IntegrityError, transaction
+from django.core.exceptions import ImproperlyConfigured
+from .models import Job
+
+registry = {}
+
+
+class Task:
+    def __init__(self, name, func, max_attempts, priority):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.priority = priority
+
+    def __call__(self, **payload):
+        return self.func(**payload)
+
+
+def task(name, max_attempts=None, priority=0):
+    """
+    Registers the decorated function as the task ``name``. Lower priorities
+    are claimed first.
+    """
+    def register(func):
+        if name in registry:
+            raise ImproperlyConfigured(f'Task {name!r} is registered twice.')
+        registry[name] = Task(name, func, max_attempts or settings.JOBS_MAX_ATTEMPTS, priority)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, *, created_by=None, key=None, delay=0, priority=None):
+    """
+    Queues the task ``name`` with the keyword arguments ``payload`` and returns
+    its Job. With a ``key``, a job with the same key that is still queued is
+    returned instead of adding another.
+    """
+    try:
+        registered = registry[name]
+    except KeyError:
+        raise ImproperlyConfigured(f'No task named {name!r} is registered.')
+    job = Job(
+        name=name, payload=payload or {}, key=key, created_by=created_by,
+        priority=registered.priority if priority is None else priority,
+        max_attempts=registered.max_attempts, run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if key is None:
+        job.save()
+        return job
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                job.save()
+            return job
+        except IntegrityError:
+            existing = Job.objects.filter(key=key, status=Job.Status.QUEUED).first()
+            if existing is not None:
+                return existing
+            # The other job was claimed in between; try again.
+            job.pk = None
+    raise IntegrityError(f'Could not enqueue {name!r} with key {key!r}.')
+
+
+def backoff(attempts):
+    """
+    Seconds to wait before retrying after the ``attempts``-th failure:
+    doubling from JOBS_RETRY_DELAY up to JOBS_RETRY_MAX_DELAY, with jitter so
+    that jobs failing together do not retry together.
+    """
+    delay = min(settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
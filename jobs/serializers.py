@@ -0,0 +1,20 @@
+from .models import Job
+from rest_framework import serializers
+
+
+class JobSerializer(serializers.ModelSerializer):
+    error = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'created', 'started', 'finished', 'result', 'error')
+
+    def get_error(self, job):
+        """
+        The last line of the latest failure, e.g. "ValueError: ...". Admins
+        get the full traceback.
+        """
+        request = self.context.get('request')
+        if not job.error or (request and getattr(request.user, 'role', None) == 'admin'):
+            return job.error or None
+        return job.error.strip().splitlines()[-1]
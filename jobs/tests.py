@@ -0,0 +1,163 @@
+import io
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from django.core.cache import cache
+from rest_framework import status
+from .models import Job
+from . import worker
+from .queue import enqueue, task
+from crops.models import Crop
+from django.test import TransactionTestCase, override_settings
+from django.core.management import call_command
+from core.testing import APITestCase, MD5, create_user
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+calls = []
+
+
+@task('tests.echo')
+def echo(value):
+    calls.append(value)
+    return {'echo': value}
+
+
+@task('tests.flaky', max_attempts=2)
+def flaky():
+    raise ValueError('flaky failure')
+
+
+@override_settings(PASSWORD_HASHERS=[MD5])
+class JobQueueTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        calls.clear()
+        self.admin = create_user('admin', role='admin')
+        self.farmer = create_user('farmer')
+        self.other = create_user('other')
+
+    def test_jobs_run_and_report_their_result(self):
+        job = enqueue('tests.echo', {'value': 7}, created_by=self.farmer)
+        self.assertEqual(worker.run_pending(), 1)
+        self.assertEqual(calls, [7])
+
+        self.authenticate(self.farmer)
+        response = self.client.get(reverse('job_detail_view', kwargs={'pk': job.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'succeeded')
+        self.assertEqual(response.data['result'], {'echo': 7})
+        self.assertEqual(response.data['attempts'], 1)
+
+        # Only the owner and admins see a job.
+        self.authenticate(self.other)
+        self.assertEqual(self.client.get(reverse('job_detail_view', kwargs={'pk': job.pk})).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('job_list_view')).data, [])
+        self.authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('job_detail_view', kwargs={'pk': job.pk})).status_code, status.HTTP_200_OK)
+
+    def test_jobs_run_by_priority_then_due_time(self):
+        enqueue('tests.echo', {'value': 'late'}, delay=3600)
+        enqueue('tests.echo', {'value': 'second'})
+        enqueue('tests.echo', {'value': 'first'}, priority=-1)
+        worker.run_pending()
+        self.assertEqual(calls, ['first', 'second'])
+        self.assertEqual(Job.objects.filter(status=Job.Status.QUEUED).count(), 1)
+
+    def test_queued_keys_are_deduplicated(self):
+        first = enqueue('tests.echo', {'value': 1}, key='echo')
+        self.assertEqual(enqueue('tests.echo', {'value': 1}, key='echo').pk, first.pk)
+
+        # Once claimed, the same key queues a new job.
+        claimed = worker.claim('test-worker')
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertNotEqual(enqueue('tests.echo', {'value': 1}, key='echo').pk, first.pk)
+
+    def test_failures_are_retried_with_backoff(self):
+        job = enqueue('tests.flaky', created_by=self.farmer)
+        before = timezone.now()
+        worker.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 1))
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=5))
+        self.assertIn('ValueError: flaky failure', job.error)
+
+        # Not due yet.
+        self.assertEqual(worker.run_pending(), 0)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        worker.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+
+        self.authenticate(self.farmer)
+        response = self.client.get(reverse('job_list_view'), {'status': 'failed'})
+        self.assertEqual([item['id'] for item in response.data], [job.pk])
+        self.assertEqual(response.data[0]['error'], 'ValueError: flaky failure')
+        self.authenticate(self.admin)
+        response = self.client.get(reverse('job_detail_view', kwargs={'pk': job.pk}))
+        self.assertIn('Traceback', response.data['error'])
+
+    def test_unknown_tasks_fail_without_retrying(self):
+        job = Job.objects.create(name='tests.missing', max_attempts=3)
+        worker.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 1))
+        self.assertIn("No task named 'tests.missing'", job.error)
+
+    def test_expired_leases_are_recovered(self):
+        retried = enqueue('tests.echo', {'value': 1})
+        lost = enqueue('tests.flaky')
+        for _ in range(2):
+            worker.claim('dead-worker')
+        Job.objects.filter(pk=lost.pk).update(attempts=2)
+        Job.objects.update(started=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(worker.recover(), 2)
+        retried.refresh_from_db()
+        lost.refresh_from_db()
+        self.assertEqual(retried.status, Job.Status.QUEUED)
+        self.assertEqual(lost.status, Job.Status.FAILED)
+        # The dead worker can no longer record an outcome.
+        retried.attempts, retried.locked_by = 1, 'dead-worker'
+        self.assertTrue(worker.execute(retried, 'dead-worker'))
+        retried.refresh_from_db()
+        self.assertEqual(retried.status, Job.Status.QUEUED)
+
+    def test_finished_jobs_are_pruned(self):
+        old, recent = enqueue('tests.echo', {'value': 1}), enqueue('tests.echo', {'value': 2})
+        worker.run_pending()
+        Job.objects.filter(pk=old.pk).update(finished=timezone.now() - timedelta(days=30))
+        self.assertEqual(worker.prune(), 1)
+        self.assertEqual(list(Job.objects.values_list('pk', flat=True)), [recent.pk])
+
+    def test_list_rejects_unknown_status(self):
+        self.authenticate(self.farmer)
+        self.assertEqual(self.client.get(reverse('job_list_view'), {'status': 'done'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_stats_can_respond_async(self):
+        Crop.objects.create(farmer=self.farmer, name='Maize', crop_type='cereal', quantity=5)
+        self.authenticate(self.admin)
+        response = self.client.get(reverse('admin_crop_stats_view'), HTTP_PREFER='respond-async, wait=10')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response['Location'], response.data['url'])
+
+        worker.run_pending()
+        job = self.client.get(response['Location']).data
+        self.assertEqual(job['status'], 'succeeded')
+        stats = self.client.get(reverse('admin_crop_stats_view')).data
+        self.assertEqual(job['result'], {key: stats[key] for key in ('total_farmers', 'total_crops', 'crops_per_farmer')})
+
+
+class RunJobsCommandTestCase(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_once_drains_the_queue(self):
+        for value in range(5):
+            enqueue('tests.echo', {'value': value})
+        out = io.StringIO()
+        call_command('runjobs', once=True, threads=1, stdout=out)
+        self.assertIn('ran 5 job(s)', out.getvalue())
+        self.assertEqual(sorted(calls), [0, 1, 2, 3, 4])
+        self.assertFalse(Job.objects.exclude(status=Job.Status.SUCCEEDED).exists())
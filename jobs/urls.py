@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import JobDetailView, JobListView
+
+urlpatterns = [
+    path('v1/jobs/', JobListView.as_view(), name='job_list_view'),
+    path('v1/jobs/<int:pk>/', JobDetailView.as_view(), name='job_detail_view'),
+]
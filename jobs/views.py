@@ -0,0 +1,63 @@
+from .models import Job
+from django.urls import reverse
+from rest_framework import generics, status
+from rest_framework.response import Response
+from .serializers import JobSerializer
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+
+
+def prefers_async(request):
+    """
+    True when the client sent ``Prefer: respond-async`` (RFC 7240), asking for
+    202 and a job to poll instead of waiting for the result.
+    """
+    preferences = request.headers.get('Prefer', '')
+    return 'respond-async' in (preference.split(';')[0].strip().lower() for preference in preferences.split(','))
+
+
+def accepted(request, job):
+    """
+    202 pointing at the job's status endpoint.
+    """
+    url = request.build_absolute_uri(reverse('job_detail_view', kwargs={'pk': job.pk}))
+    return Response({'id': job.pk, 'status': job.status, 'url': url}, status=status.HTTP_202_ACCEPTED, headers={'Location': url})
+
+
+class JobQuerysetMixin:
+    def get_queryset(self):
+        user = self.request.user
+        if user.role == 'admin':
+            return Job.objects.all()
+        return Job.objects.filter(created_by=user)
+
+
+class JobListView(JobQuerysetMixin, generics.ListAPIView):
+    """
+    The caller's background jobs, newest first (every job for admins).
+    Filters: status, name
+    Access: both admin and farmer
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        jobs = super().get_queryset().order_by('-created', '-id')
+        params = self.request.query_params
+        job_status = params.get('status')
+        if job_status:
+            if job_status not in Job.Status.values:
+                raise ValidationError({'status': f'Must be one of: {", ".join(Job.Status.values)}.'})
+            jobs = jobs.filter(status=job_status)
+        if params.get('name'):
+            jobs = jobs.filter(name=params['name'])
+        return jobs
+
+
+class JobDetailView(JobQuerysetMixin, generics.RetrieveAPIView):
+    """
+    A background job's status, attempts and, once it succeeded, its result.
+    Access: the user who started it, and admins
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
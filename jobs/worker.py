@@ -0,0 +1,210 @@
+"""
+Runs queued jobs (see jobs/queue.py) on a pool of threads.
+
+Claiming a job marks it running under the claiming thread's name:
+- PostgreSQL (and other databases with SKIP LOCKED): the next due job is read
+  with ``SELECT ... FOR UPDATE SKIP LOCKED``, so concurrent workers pass over
+  each other's rows instead of waiting on them.
+- SQLite: a few due jobs are read and the first one whose conditional
+  ``UPDATE ... WHERE status = 'queued'`` changes a row is ours; a worker that
+  loses the race moves on to the next.
+
+A job still running ``JOBS_LEASE_TIMEOUT`` seconds after it started is taken to
+have lost its worker and is queued again (or failed, without attempts left).
+Tasks should therefore be safe to run twice.
+"""
+import os
+import time
+import socket
+import logging
+import threading
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from django.db import close_old_connections, connection, transaction
+from .models import Job
+from .queue import backoff, registry
+
+logger = logging.getLogger(__name__)
+
+# Due jobs read per claim attempt where SKIP LOCKED is unavailable.
+CLAIM_CANDIDATES = 10
+LOST = 'The worker running this job stopped before it finished.'
+
+
+def due_jobs(now):
+    return Job.objects.filter(status=Job.Status.QUEUED, run_at__lte=now).order_by('priority', 'run_at', 'id')
+
+
+def without_queued_twin(jobs):
+    """
+    Jobs that can be queued again: not while another queued job has their key,
+    which will redo the work anyway.
+    """
+    return jobs.filter(~Exists(Job.objects.filter(status=Job.Status.QUEUED, key=OuterRef('key'))))
+
+
+def claim(owner, now=None):
+    """
+    Marks the next due job as running for ``owner`` and returns it, or None.
+    """
+    now = now or timezone.now()
+    running = {'status': Job.Status.RUNNING, 'attempts': F('attempts') + 1, 'locked_by': owner, 'started': now}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = due_jobs(now).select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**running)
+        job.status, job.attempts, job.locked_by, job.started = Job.Status.RUNNING, job.attempts + 1, owner, now
+        return job
+
+    for pk in due_jobs(now).values_list('pk', flat=True)[:CLAIM_CANDIDATES]:
+        if Job.objects.filter(pk=pk, status=Job.Status.QUEUED).update(**running):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def execute(job, owner):
+    """
+    Runs a claimed job and records its result, or its error and next attempt.
+    """
+    started = time.monotonic()
+    task = registry.get(job.name)
+    try:
+        if task is None:
+            raise LookupError(f'No task named {job.name!r} is registered.')
+        result = task(**job.payload)
+        finished = Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING, locked_by=owner).update(
+            status=Job.Status.SUCCEEDED, result=result, error='', locked_by='', finished=timezone.now(),
+        )
+    except Exception:
+        error = traceback.format_exc()
+        mine = Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING, locked_by=owner)
+        delay = backoff(job.attempts)
+        if task is not None and job.attempts < job.max_attempts and without_queued_twin(mine).update(
+            status=Job.Status.QUEUED, run_at=timezone.now() + timedelta(seconds=delay), error=error, locked_by='',
+        ):
+            logger.warning('Job %s (%s) failed, attempt %d of %d; retrying in %.0fs:\n%s', job.pk, job.name, job.attempts, job.max_attempts, delay, error)
+        else:
+            mine.update(status=Job.Status.FAILED, finished=timezone.now(), error=error, locked_by='')
+            logger.error('Job %s (%s) failed after %d attempt(s):\n%s', job.pk, job.name, job.attempts, error)
+        return False
+    if finished:
+        logger.info('Job %s (%s) succeeded in %.3fs.', job.pk, job.name, time.monotonic() - started)
+    else:
+        logger.warning('Job %s (%s) finished after its lease expired; its result was dropped.', job.pk, job.name)
+    return True
+
+
+def recover(now=None):
+    """
+    Requeues (or fails, without attempts left) jobs whose lease expired.
+    Returns the number of jobs recovered.
+    """
+    now = now or timezone.now()
+    expired = Job.objects.filter(status=Job.Status.RUNNING, started__lt=now - timedelta(seconds=settings.JOBS_LEASE_TIMEOUT))
+    requeued = without_queued_twin(expired.filter(attempts__lt=F('max_attempts'))).update(status=Job.Status.QUEUED, run_at=now, locked_by='', error=LOST)
+    failed = expired.update(status=Job.Status.FAILED, finished=now, locked_by='', error=LOST)
+    if requeued or failed:
+        logger.warning('Recovered %d job(s) from lost workers, %d of them failed.', requeued + failed, failed)
+    return requeued + failed
+
+
+def prune(now=None, batch_size=1000):
+    """
+    Deletes one batch of jobs finished more than JOBS_RETENTION_DAYS ago.
+    """
+    now = now or timezone.now()
+    pks = list(
+        Job.objects.filter(finished__lt=now - timedelta(days=settings.JOBS_RETENTION_DAYS))
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    return Job.objects.filter(pk__in=pks).delete()[0] if pks else 0
+
+
+def run_pending(owner=None):
+    """
+    Runs due jobs on the calling thread until none is left (tests, management
+    commands). Returns the number of jobs run.
+    """
+    owner = owner or f'{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}'
+    count = 0
+    while (job := claim(owner)) is not None:
+        execute(job, owner)
+        count += 1
+    return count
+
+
+class Worker:
+    """
+    ``threads`` threads claiming and running jobs until ``stop()`` is called,
+    or, with ``once``, until no job is due. Between jobs, idle threads poll
+    every ``poll_interval`` seconds; one of them recovers expired leases and
+    prunes old jobs every JOBS_MAINTENANCE_INTERVAL seconds.
+    """
+    def __init__(self, threads=1, poll_interval=1.0, once=False):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.once = once
+        self.stopping = threading.Event()
+        self.maintenance_lock = threading.Lock()
+        self.maintained = None
+        self.processed = 0
+        self.processed_lock = threading.Lock()
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+
+    def run(self):
+        self.maintain()
+        pool = [threading.Thread(target=self.loop, name=f'jobs-{i}', daemon=True) for i in range(self.threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return self.processed
+
+    def stop(self):
+        self.stopping.set()
+
+    def loop(self):
+        owner = f'{self.name}:{threading.current_thread().name}'
+        try:
+            while not self.stopping.is_set():
+                try:
+                    job = claim(owner)
+                except Exception:
+                    logger.exception('Could not claim a job.')
+                    close_old_connections()
+                    job = None
+                if job is None:
+                    if self.once:
+                        return
+                    self.maintain()
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                try:
+                    execute(job, owner)
+                except Exception:
+                    # Recording the outcome failed; the lease recovers the job.
+                    logger.exception('Could not record the outcome of job %s.', job.pk)
+                with self.processed_lock:
+                    self.processed += 1
+                close_old_connections()
+        finally:
+            connection.close()
+
+    def maintain(self):
+        if self.maintained is not None and time.monotonic() - self.maintained < settings.JOBS_MAINTENANCE_INTERVAL:
+            return
+        if not self.maintenance_lock.acquire(blocking=False):
+            return
+        try:
+            self.maintained = time.monotonic()
+            recover()
+            prune()
+        except Exception:
+            logger.exception('Job maintenance failed.')
+        finally:
+            self.maintenance_lock.release()
@@ -0,0 +1,173 @@
+"""
+JWT authentication that avoids the per-request ``User`` lookup.
+
+Access tokens issued at login carry the user's ``role`` claim, which is all
+``IsAdmin``/``IsFarmer`` need. ``ClaimsJWTAuthentication`` returns a lazy user
+exposing ``id``, ``role`` and ``is_authenticated`` straight from the claims; the
+full row is only loaded when a view touches another attribute, and then comes
+from a bounded in-process cache.
+
+Claims are only trusted when the token was issued after the user's last
+change. Every ``User`` save/delete stamps a per-user version in the shared
+Django cache (see users/signals.py); a token older than that version, e.g.
+one carrying a role the user no longer has, falls back to the stored row.
+Refreshed access tokens take the role from the stored row (users/views.py),
+not from the refresh token, since their fresh ``iat`` passes this check.
+
+That stamp only reaches other workers through a shared backend. With a
+per-process one (local memory, dummy) a change made on another worker is never
+seen here, so every request loads the stored row instead.
+
+Tokens revoked at logout are rejected before either path (users/revocation.py).
+"""
+import copy
+import time
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.db import transaction
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .revocation import revocations
+
+User = get_user_model()
+
+
+def _version_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def versions_shared():
+    """
+    True when CACHES['default'] is shared between worker processes, so that
+    every worker sees the versions stamped by the others.
+    """
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def user_version(user_id):
+    """
+    Time (ns) of the user's last change, starting now if the stamp was lost,
+    which only makes older tokens fall back to the stored row.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    """
+    Stamps a new version now and again on commit, so a row read by another
+    request before the change committed is not cached under the new version.
+    """
+    def bump():
+        cache.set(_version_key(user_id), time.time_ns(), timeout=None)
+        user_cache.discard(user_id)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+class UserCache:
+    """
+    Bounded LRU of user rows with a TTL. An entry is only used while the
+    user's shared version still matches the one it was loaded under, so a change
+    made by another worker is seen on the next request that hits this one.
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, version):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry and entry[1] == version and entry[2] > now:
+                self.entries.move_to_end(user_id)
+                self.hits += 1
+                # Callers may modify request.user; never hand out the cached instance.
+                return copy.copy(entry[0])
+            self.misses += 1
+
+        user = User.objects.get(pk=user_id)
+        with self.lock:
+            self.entries[user_id] = (user, version, now + self.ttl)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return copy.copy(user)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    Lazy user whose id and role are known without loading the row.
+    """
+    def __init__(self, user_id, role, loader):
+        super().__init__(loader)
+        self.__dict__.update(id=user_id, pk=user_id, role=role, is_authenticated=True, is_anonymous=False)
+
+    def __bool__(self):
+        return True
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` without a database query for tokens that carry a
+    current ``role`` claim; other tokens use the cached user row. Without a
+    shared cache, every token loads the stored row.
+    """
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if revocations.is_revoked(token[api_settings.JTI_CLAIM]):
+            raise InvalidToken(_('Token has been revoked'))
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        shared = versions_shared()
+        version = user_version(user_id) if shared else None
+
+        def load():
+            try:
+                user = user_cache.get(user_id, version) if shared else User.objects.get(pk=user_id)
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            if not user.is_active:
+                raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+            return user
+
+        role = validated_token.get('role')
+        issued_at = validated_token.get('iat')
+        if shared and role and issued_at and issued_at * 10 ** 9 > version:
+            return ClaimsUser(user_id, role, load)
+        return load()
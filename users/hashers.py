@@ -0,0 +1,155 @@
+"""
+Password hashing with a bounded cost.
+
+Every hash or verification (login, signup, password changes, and the dummy
+hash Django runs for unknown emails) goes through one small thread pool per
+process. ``PASSWORD_HASHING_WORKERS`` caps how many run at once, so a login
+spike cannot occupy every worker thread: token refreshes and reads keep being
+served while logins queue. When ``PASSWORD_HASHING_QUEUE`` more are already
+waiting, the request is answered with 503 and Retry-After instead of piling up.
+hashlib releases the GIL while hashing, so the pool threads run in parallel
+with request threads.
+
+New hashes use scrypt, which is memory-hard, with the cost from settings.
+PBKDF2 hashes still verify, and Django re-hashes them with the preferred
+hasher on the user's next successful login, as it does when the scrypt cost
+settings change.
+"""
+import time
+import base64
+import hashlib
+import threading
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from concurrent.futures import ThreadPoolExecutor
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+class HashingOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins in progress. Please retry shortly.'
+    default_code = 'hashing_overloaded'
+    # Sent as Retry-After by DRF's exception handler.
+    wait = 1
+
+
+class HashingPool:
+    """
+    Runs hashing calls on at most ``workers`` threads, with at most
+    ``queue_size`` more waiting; further calls raise HashingOverloaded.
+    """
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._stats = {
+            'submitted': 0, 'completed': 0, 'rejected': 0, 'active': 0, 'queued': 0,
+            'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0, 'hash_seconds_total': 0.0,
+        }
+
+    def _count(self, **changes):
+        with self._lock:
+            for key, value in changes.items():
+                self._stats[key] += value
+
+    def run(self, func, *args, **kwargs):
+        if getattr(_local, 'inside', False):
+            # Hashers call encode() from verify(); that runs on this pool thread already.
+            return func(*args, **kwargs)
+        if not self._slots.acquire(blocking=False):
+            self._count(rejected=1)
+            raise HashingOverloaded()
+
+        submitted = time.perf_counter()
+        self._count(submitted=1, queued=1)
+
+        def job():
+            started = time.perf_counter()
+            waited = started - submitted
+            with self._lock:
+                self._stats['queued'] -= 1
+                self._stats['active'] += 1
+                self._stats['wait_seconds_total'] += waited
+                self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+            _local.inside = True
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _local.inside = False
+                self._count(active=-1, completed=1, hash_seconds_total=time.perf_counter() - started)
+
+        try:
+            return self._executor.submit(job).result()
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, 'queue_size': self.queue_size, **self._stats}
+
+
+def pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE)
+        return _pool
+
+
+def stats():
+    return pool().stats()
+
+
+class BoundedHasherMixin:
+    """
+    Runs a hasher's encode() and verify() on the hashing pool.
+    """
+    def encode(self, *args, **kwargs):
+        return pool().run(super().encode, *args, **kwargs)
+
+    def verify(self, *args, **kwargs):
+        return pool().run(super().verify, *args, **kwargs)
+
+
+class ScryptPasswordHasher(BoundedHasherMixin, hashers.ScryptPasswordHasher):
+    """
+    Django's scrypt hasher with its cost read from PASSWORD_SCRYPT_* settings.
+    Hashes made with another cost are upgraded on the next login.
+    """
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        return pool().run(self._encode, password, salt, n, r, p)
+
+    def _encode(self, password, salt, n, r, p):
+        # Django's encode() with maxmem sized for the cost being computed:
+        # OpenSSL refuses more than 32 MB unless allowed, and hashes made
+        # before a cost change must still verify.
+        self._check_encode_args(password, salt)
+        n, r, p = n or self.work_factor, r or self.block_size, p or self.parallelism
+        hash_ = hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=2 * 128 * n * r * p, dklen=64)
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+
+class PBKDF2PasswordHasher(BoundedHasherMixin, hashers.PBKDF2PasswordHasher):
+    """
+    Verifies existing PBKDF2 hashes on the hashing pool until they are upgraded.
+    """
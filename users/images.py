@@ -0,0 +1,109 @@
+"""
+Profile icon pipeline.
+
+Uploads are read and decoded once on the request thread, then stored under
+the SHA-256 of their bytes, so identical uploads share one file. Fixed-size
+square thumbnails, in the original format and as WebP, are rendered by the
+``users.render_profile_icon`` background job (users/tasks.py), queued in the
+request's transaction; identical uploads share a job until it starts.
+"""
+import io
+import hashlib
+from django.conf import settings
+from PIL import Image, ImageOps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.exceptions import ValidationError
+
+UPLOAD_DIR = 'ProfileIcons'
+FORMATS = {'PNG': 'png', 'JPEG': 'jpg'}
+
+
+def variant_name(name, size, extension):
+    root = name.rsplit('.', 1)[0]
+    return f'{root}_{size}.{extension}'
+
+
+def variant_names(name):
+    """
+    (size, format, storage name) of every thumbnail of the icon stored as ``name``.
+    """
+    extension = name.rsplit('.', 1)[-1]
+    return [
+        (size, fmt, variant_name(name, size, fmt))
+        for size in settings.PROFILE_ICON_SIZES
+        for fmt in (extension, 'webp')
+    ]
+
+
+def decode(upload):
+    """
+    Reads and decodes an uploaded icon, returning (bytes, image, extension).
+    Raises ValidationError for anything that is not a PNG/JPEG within limits.
+    """
+    if hasattr(upload, 'seek'):
+        upload.seek(0)
+    data = upload.read(settings.PROFILE_ICON_MAX_BYTES + 1)
+    if len(data) > settings.PROFILE_ICON_MAX_BYTES:
+        raise ValidationError(f'Profile icon must be at most {settings.PROFILE_ICON_MAX_BYTES // 1024} KB.')
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format not in FORMATS:
+            raise ValidationError('Profile icon must be a PNG or JPEG image.')
+        # Checked from the header, before any pixel is decoded.
+        width, height = image.size
+        if width * height > settings.PROFILE_ICON_MAX_PIXELS:
+            raise ValidationError(f'Profile icon must be at most {settings.PROFILE_ICON_MAX_PIXELS:,} pixels.')
+        image.load()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValidationError('Upload a valid image. The file you uploaded was either not an image or a corrupted image.')
+    return data, ImageOps.exif_transpose(image), FORMATS[image.format]
+
+
+def store_profile_icon(upload):
+    """
+    Stores an uploaded icon under its content hash and queues its thumbnails.
+    Returns the storage name and the thumbnail sizes that already exist,
+    which is all of them when the same image was uploaded before.
+    """
+    from jobs.queue import enqueue
+
+    data, _, extension = decode(upload)
+    name = f'{UPLOAD_DIR}/{hashlib.sha256(data).hexdigest()}.{extension}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+
+    if all(default_storage.exists(variant) for _, _, variant in variant_names(name)):
+        return name, list(settings.PROFILE_ICON_SIZES)
+    enqueue('users.render_profile_icon', {'name': name}, key=f'profile-icon:{name}')
+    return name, []
+
+
+def render_variants(name, image):
+    """
+    Writes the missing thumbnails of ``name`` and marks them ready on every
+    user whose icon it is.
+    """
+    from .models import User
+    from core import caching
+    from .authentication import bump_user_version
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'P') else 'RGB')
+    for size, fmt, variant in variant_names(name):
+        if default_storage.exists(variant):
+            continue
+        thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        if fmt == 'jpg' and thumbnail.mode == 'RGBA':
+            thumbnail = thumbnail.convert('RGB')
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, {'jpg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP'}[fmt], optimize=True, quality=85)
+        default_storage.save(variant, ContentFile(buffer.getvalue()))
+
+    sizes = list(settings.PROFILE_ICON_SIZES)
+    user_ids = list(User.objects.filter(profile_icon=name).exclude(profile_icon_variants=sizes).values_list('id', flat=True))
+    if user_ids:
+        User.objects.filter(id__in=user_ids).update(profile_icon_variants=sizes)
+        for user_id in user_ids:
+            bump_user_version(user_id)
+        caching.invalidate('users')
@@ -0,0 +1,63 @@
+import time
+import statistics
+from django.db import connection, transaction
+from rest_framework.request import Request
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from users.authentication import ClaimsJWTAuthentication, user_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures per-request authentication overhead (token validation plus the '
+        'role lookup a permission check does) for each authentication path. '
+        'The benchmark user is created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Authenticated requests per path.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        self.stdout.write(f'{"path":<34} {"p50 us":>9} {"p95 us":>9} {"queries/req":>12}')
+
+        with transaction.atomic():
+            user = User.objects.create_user(username='bench_auth', email='bench_auth@bench.invalid', password='!')
+            stale = AccessToken.for_user(user)
+            stale['role'] = user.role
+            # A token from a later login is the common case for claims.
+            current = AccessToken.for_user(user)
+            current['role'] = user.role
+            current['iat'] += 1
+
+            paths = [
+                ('JWTAuthentication (DB lookup)', JWTAuthentication(), stale),
+                ('claims token', ClaimsJWTAuthentication(), current),
+                ('older token, cached user row', ClaimsJWTAuthentication(), stale),
+            ]
+            for name, authenticator, token in paths:
+                user_cache.clear()
+                p50, p95, queries = self.measure(authenticator, str(token), options['requests'])
+                self.stdout.write(f'{name:<34} {p50:>9.1f} {p95:>9.1f} {queries:>12.2f}')
+            transaction.set_rollback(True)
+
+    def measure(self, authenticator, token, count):
+        factory = APIRequestFactory()
+        samples, queries = [], []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            for _ in range(count):
+                request = Request(factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+                started = time.perf_counter()
+                user, _ = authenticator.authenticate(request)
+                user.role
+                samples.append((time.perf_counter() - started) * 10 ** 6)
+        samples.sort()
+        return statistics.median(samples), samples[int(len(samples) * 0.95) - 1], len(queries) / count
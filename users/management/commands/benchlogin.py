@@ -0,0 +1,93 @@
+import json
+import time
+import threading
+import http.client
+from collections import Counter
+from urllib.parse import urlsplit
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs a login storm against a running server while other clients keep '
+        'reading an authenticated endpoint, then reports logins/sec and the '
+        'latency percentiles of both. Clients back off for Retry-After on 503. '
+        'Compare PASSWORD_HASHING_* values, or PBKDF2 against scrypt, by '
+        'restarting the server between runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', help='Server root, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--email', required=True, help='Account to log in as (its password is given with --password).')
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--read-path', default='/api/v1/profile/', help='Endpoint the readers request.')
+        parser.add_argument('--login-clients', type=int, default=32)
+        parser.add_argument('--read-clients', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=20.0, help='Seconds to run.')
+
+    def handle(self, *args, **options):
+        base = urlsplit(options['base_url'])
+        if base.scheme != 'http':
+            raise CommandError('Only http:// URLs are supported.')
+        User = get_user_model()
+        try:
+            user = User.objects.get(email=options['email'].lower())
+        except User.DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]!r}.')
+        refresh = RefreshToken.for_user(user)
+        refresh['role'] = user.role
+
+        login_body = json.dumps({'email': options['email'], 'password': options['password']})
+        login = ('POST', '/api/v1/login/', login_body, {'Content-Type': 'application/json'})
+        read = ('GET', options['read_path'], None, {'Authorization': f'Bearer {refresh.access_token}'})
+
+        deadline = time.perf_counter() + options['duration']
+        lock = threading.Lock()
+        results = {'login': ([], Counter()), 'read': ([], Counter())}
+
+        def client(kind, request):
+            method, path, body, headers = request
+            latencies, statuses = results[kind]
+            connection = None
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    connection = connection or http.client.HTTPConnection(base.netloc, timeout=120)
+                    connection.request(method, path, body=body, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    status = response.status
+                    retry_after = response.getheader('Retry-After')
+                except (OSError, http.client.HTTPException):
+                    connection, retry_after = None, None
+                    status = 'error'
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[status] += 1
+                if retry_after:
+                    # Back off like a well-behaved client when the server sheds load.
+                    time.sleep(min(float(retry_after), max(deadline - time.perf_counter(), 0)))
+
+        threads = [threading.Thread(target=client, args=('login', login)) for _ in range(options['login_clients'])]
+        threads += [threading.Thread(target=client, args=('read', read)) for _ in range(options['read_clients'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started
+
+        self.stdout.write(f'{"":<8} {"req/s":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}  statuses')
+        for kind, (latencies, statuses) in results.items():
+            if not latencies:
+                continue
+            latencies.sort()
+            percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+            rate = statuses[200] / duration
+            counts = '  '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str))
+            self.stdout.write(
+                f'{kind:<8} {rate:>8.1f} {percentile(0.5):>9.1f} {percentile(0.95):>9.1f} {percentile(0.99):>9.1f}  {counts}'
+            )
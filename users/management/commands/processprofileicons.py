@@ -0,0 +1,43 @@
+from users import images
+from django.db import transaction
+from django.core.files.storage import default_storage
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves existing profile icons to content-hash names and queues jobs to '
+        'render their thumbnails (run them with runjobs). Users sharing an '
+        'identical image end up sharing one file.'
+    )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        counts, stored = {'converted': 0, 'failed': 0}, {}
+        users = User.objects.exclude(profile_icon='').exclude(profile_icon__isnull=True).only('id', 'email', 'profile_icon', 'profile_icon_variants')
+
+        # Thumbnail jobs become visible on commit, once every user row points at its new name.
+        with transaction.atomic():
+            self.convert(users, stored, counts)
+
+        files = len({result[0] for result in stored.values() if result})
+        self.stdout.write(self.style.SUCCESS(f'{counts["converted"]} users now share {files} icon files; {counts["failed"]} failed.'))
+
+    def convert(self, users, stored, counts):
+        for user in users.iterator(chunk_size=500):
+            name = user.profile_icon.name
+            if name not in stored:
+                try:
+                    with default_storage.open(name) as icon:
+                        stored[name] = images.store_profile_icon(icon)
+                except (OSError, ValidationError) as exc:
+                    self.stderr.write(f'user {user.id}: cannot process {name}: {exc}')
+                    stored[name] = None
+            if stored[name] is None:
+                counts['failed'] += 1
+                continue
+            user.profile_icon, user.profile_icon_variants = stored[name]
+            user.save(update_fields=['profile_icon', 'profile_icon_variants'])
+            counts['converted'] += 1
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_icon_variants',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2 on 2026-10-18 18:02
+
+from django.db import migrations
+from core.search import AddSearchIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_revoked_tokens'),
+    ]
+
+    operations = [
+        AddSearchIndex(model_name='user', field='username', name='users_user_username_search_idx'),
+        AddSearchIndex(model_name='user', field='email', name='users_user_email_search_idx'),
+    ]
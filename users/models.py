@@ -1,4 +1,6 @@
 from django.db import models  
+from django.db import transaction
+from . import images
 from .imageUID import profileIconUID
 from django.contrib.auth.models import AbstractUser 
 from django.core.validators import FileExtensionValidator
@@ -14,15 +16,48 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     role = models.CharField(max_length=20, choices=Role.choices, default=Role.FARMER)
     profile_icon = models.ImageField(upload_to=profileIconUID, null=True, blank=True, default='profileIcon.png', validators=[FileExtensionValidator(['png', 'jpeg', 'jpg'])])
+    # Thumbnail sizes rendered for profile_icon so far (see users/images.py).
+    profile_icon_variants = models.JSONField(default=list, blank=True)
     created = models.DateTimeField(auto_now_add=True)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pagination of the farmer list, newest first. Username/email
+            # search uses the indexes added by migration 0005.
+            models.Index(fields=['role', '-created', '-id'], name='users_user_role_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.username}"
     
     def save(self, *args, **kwargs): 
         if self.email:
             self.email = self.email.lower()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        if self.profile_icon and not self.profile_icon._committed:
+            # A fresh upload: store it by content hash and queue its thumbnails,
+            # which start once this row is committed.
+            with transaction.atomic():
+                self.profile_icon, self.profile_icon_variants = images.store_profile_icon(self.profile_icon)
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'profile_icon_variants'}
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
+
+class RevokedToken(models.Model):
+    """
+    A JWT revoked before its expiry (see users/revocation.py). Rows are
+    pruned once the token would have expired anyway.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    # Not a foreign key: a deleted user's cookie can still be revoked at logout.
+    user_id = models.BigIntegerField(null=True, blank=True)
+    token_type = models.CharField(max_length=16, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.token_type} {self.jti} (user {self.user_id})'
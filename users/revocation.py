@@ -0,0 +1,179 @@
+"""
+Revocation of JWTs by ``jti`` (logout).
+
+Revoked tokens are stored in ``RevokedToken`` until they would have expired
+anyway. Every authenticated request asks ``revocations.is_revoked(jti)``;
+each process keeps a bloom filter of the revoked jtis, so the common answer,
+"not revoked", costs one hash and no I/O. Only jtis the filter reports (every
+revoked one plus about ``REVOCATION_FILTER_ERROR_RATE`` of the rest) are
+confirmed against the table's unique index.
+
+Workers stay in sync through a counter in the shared Django cache, bumped on
+every revocation. A worker compares it with the last value it loaded at most
+every ``REVOCATION_SYNC_INTERVAL`` seconds and then reads only the newly
+revoked rows. Expired rows are deleted by whichever worker first passes
+``REVOCATION_PRUNE_INTERVAL``, and each filter is rebuilt from the remaining
+rows every ``REVOCATION_REBUILD_INTERVAL`` seconds, as bloom filters cannot
+forget entries.
+"""
+import math
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+from django.db import transaction
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+
+GENERATION_KEY = 'auth:revocations'
+PRUNE_KEY = 'auth:revocations:prune'
+# Rows revoked this long before a sync started are read again by the next one,
+# covering transactions that committed after the sync's query ran.
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter of strings, using double hashing over one BLAKE2b digest.
+    """
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class RevocationList:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.filter = None
+        self.generation = None
+        self.checked_at = 0.0
+        self.built_at = 0.0
+        self.synced_from = None
+        self.confirmed = {}
+        self.stats = {'checks': 0, 'filter_hits': 0, 'lookups': 0, 'revoked': 0, 'syncs': 0, 'rebuilds': 0}
+
+    def revoke(self, token):
+        """
+        Revokes a validated simplejwt token until its expiry.
+        """
+        from .models import RevokedToken
+
+        jti = token[api_settings.JTI_CLAIM]
+        # One INSERT; revoking the same token twice is a no-op.
+        RevokedToken.objects.bulk_create([RevokedToken(
+            jti=jti,
+            user_id=token.get(api_settings.USER_ID_CLAIM),
+            token_type=token.get(api_settings.TOKEN_TYPE_CLAIM, ''),
+            expires_at=datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc),
+        )], ignore_conflicts=True)
+        with self.lock:
+            if self.filter is not None:
+                self.filter.add(jti)
+        # Other workers load the row once it is visible to them.
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        cache.add(GENERATION_KEY, 0, timeout=None)
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            # Evicted in between: any new value makes every worker reload.
+            cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+    def is_revoked(self, jti):
+        self.sync()
+        with self.lock:
+            self.stats['checks'] += 1
+            if jti not in self.filter:
+                return False
+            self.stats['filter_hits'] += 1
+            expires = self.confirmed.get(jti)
+        if expires is not None:
+            return expires > timezone.now()
+        return self._confirm(jti)
+
+    def _confirm(self, jti):
+        from .models import RevokedToken
+
+        with self.lock:
+            self.stats['lookups'] += 1
+        expires = RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).values_list('expires_at', flat=True).first()
+        if expires is None:
+            return False
+        with self.lock:
+            self.stats['revoked'] += 1
+            if len(self.confirmed) >= settings.REVOCATION_CONFIRMED_CACHE_SIZE:
+                self.confirmed.clear()
+            self.confirmed[jti] = expires
+        return True
+
+    def sync(self, force=False):
+        """
+        Loads revocations made by other workers, at most every
+        REVOCATION_SYNC_INTERVAL seconds unless forced.
+        """
+        now = time.monotonic()
+        if not force and self.filter is not None and now - self.checked_at < settings.REVOCATION_SYNC_INTERVAL:
+            return
+        self.checked_at = now
+        generation = cache.get(GENERATION_KEY)
+        self.prune_expired()
+
+        if force or self.filter is None or now - self.built_at >= settings.REVOCATION_REBUILD_INTERVAL:
+            self.rebuild(generation)
+        elif generation != self.generation:
+            self.load_since(generation)
+
+    def rebuild(self, generation):
+        from .models import RevokedToken
+
+        started = timezone.now()
+        fresh = BloomFilter(settings.REVOCATION_FILTER_CAPACITY, settings.REVOCATION_FILTER_ERROR_RATE)
+        for jti in RevokedToken.objects.filter(expires_at__gt=started).values_list('jti', flat=True).iterator(chunk_size=5000):
+            fresh.add(jti)
+        with self.lock:
+            self.filter, self.generation, self.synced_from = fresh, generation, started - SYNC_OVERLAP
+            self.built_at = time.monotonic()
+            self.confirmed.clear()
+            self.stats['rebuilds'] += 1
+
+    def load_since(self, generation):
+        from .models import RevokedToken
+
+        started = timezone.now()
+        jtis = list(RevokedToken.objects.filter(revoked_at__gte=self.synced_from).values_list('jti', flat=True))
+        with self.lock:
+            for jti in jtis:
+                self.filter.add(jti)
+            self.generation, self.synced_from = generation, started - SYNC_OVERLAP
+            self.stats['syncs'] += 1
+
+    def prune_expired(self):
+        """
+        Deletes expired rows; the first worker past REVOCATION_PRUNE_INTERVAL does it.
+        """
+        from .models import RevokedToken
+
+        if cache.add(PRUNE_KEY, 1, timeout=settings.REVOCATION_PRUNE_INTERVAL):
+            return RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+        return 0
+
+
+revocations = RevocationList()
@@ -1,4 +1,8 @@
+from . import images
 from rest_framework import serializers
+from core.readserializers import ValuesSerializer
+from django.core.files.storage import default_storage
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.contrib.auth import get_user_model
 from rest_framework.validators import UniqueValidator
 from django.contrib.auth.password_validation import validate_password
@@ -7,10 +11,83 @@ User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
     profile_icon = serializers.ImageField(max_length=None, use_url=True, required=False) 
+    profile_icon_thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ('id', 'username', 'email', 'password', 'role', 'profile_icon', 'created')
+        fields = ('id', 'username', 'email', 'password', 'role', 'profile_icon', 'profile_icon_thumbnails', 'created')
+
+    def validate_profile_icon(self, value):
+        return validate_profile_icon(value)
+
+    def get_profile_icon_thumbnails(self, user):
+        """
+        URLs of the rendered thumbnails by size and format, e.g.
+        {"64": {"png": ..., "webp": ...}}. Empty until they have been rendered;
+        use profile_icon meanwhile.
+        """
+        return profile_icon_thumbnails(user, self.context.get('request'))
+
+
+def validate_profile_icon(upload):
+    """
+    Rejects icons users.images cannot store (not a PNG/JPEG, corrupt, too
+    large) with a 400 instead of failing later in User.save().
+    """
+    if upload:
+        try:
+            images.decode(upload)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages[0])
+    return upload
+
+
+def profile_icon_thumbnails(user, request=None):
+    return thumbnail_urls(user.profile_icon.name, user.profile_icon_variants, request)
+
+
+def thumbnail_urls(name, variants, request=None):
+    if not name:
+        return {}
+    thumbnails = {}
+    for size, fmt, variant in images.variant_names(name):
+        if size in variants:
+            url = default_storage.url(variant)
+            thumbnails.setdefault(str(size), {})[fmt] = request.build_absolute_uri(url) if request else url
+    return thumbnails
+
+
+# Farmer lists: the same output as UserSerializer from values() rows.
+user_list_serializer = ValuesSerializer(UserSerializer, computed={
+    'profile_icon_thumbnails': (
+        ('profile_icon', 'profile_icon_variants'),
+        lambda row, context: thumbnail_urls(row['profile_icon'], row['profile_icon_variants'], context.get('request')),
+    ),
+})
+
+
+class FarmerTotalsSerializer(UserSerializer):
+    """
+    UserSerializer plus the farmer's crop totals, for users annotated by
+    ``crops.directory.with_totals``. The per-type breakdowns are looked up in
+    the ``crops_by_type`` context entry by farmer id.
+    """
+    total_quantity = serializers.IntegerField(read_only=True)
+    crop_count = serializers.IntegerField(read_only=True)
+    last_harvest = serializers.DateField(read_only=True)
+    crops_by_type = serializers.SerializerMethodField()
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ('total_quantity', 'crop_count', 'last_harvest', 'crops_by_type')
+
+    def get_crops_by_type(self, user):
+        return self.context.get('crops_by_type', {}).get(user.pk, {})
+
+
+user_totals_list_serializer = ValuesSerializer(FarmerTotalsSerializer, computed={
+    **user_list_serializer.computed,
+    'crops_by_type': (('id',), lambda row, context: context.get('crops_by_type', {}).get(row['id'], {})),
+})
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -31,6 +108,9 @@ class RegisterSerializer(serializers.ModelSerializer):
     def validate_email(self, value):
         return value.lower()
 
+    def validate_profile_icon(self, value):
+        return validate_profile_icon(value)
+
     def create(self, validated_data):
         return User.objects.create_user(
             username=validated_data['username'],
@@ -0,0 +1,21 @@
+from core import caching
+from .authentication import bump_user_version
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_responses(sender, instance, **kwargs):
+    # Tokens issued before this change no longer vouch for the user's role.
+    bump_user_version(instance.pk)
+    caching.invalidate('users')
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user_responses(sender, instance, **kwargs):
+    bump_user_version(instance.pk)
+    # The farmer's crops went with them.
+    caching.invalidate('users', 'crops')
@@ -0,0 +1,13 @@
+from . import images
+from jobs.queue import task
+from django.core.files.storage import default_storage
+
+
+@task('users.render_profile_icon')
+def render_profile_icon(name):
+    """
+    Renders the missing thumbnails of the stored icon ``name``.
+    """
+    with default_storage.open(name) as icon:
+        _, image, _ = images.decode(icon)
+    images.render_variants(name, image)
@@ -1,10 +1,35 @@
 import io
+import os
+import json
+import base64
+import shutil
+import tempfile
+import threading
+from unittest import mock
 from PIL import Image
+from users import hashers, images
+from django.contrib.auth.hashers import make_password
+from users.serializers import UserSerializer
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.core.files.storage import default_storage
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from core import metrics, throttling
+from core.testing import APITestCase, APITransactionTestCase, MD5, create_user
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from users.authentication import ClaimsJWTAuthentication, _version_key, user_cache
+from users.revocation import PRUNE_KEY, BloomFilter, RevocationList
+from users.models import RevokedToken
+from crops.models import Crop
+from jobs import worker
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 User = get_user_model()
@@ -74,9 +99,50 @@ class AuthViewsTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class PasswordHashingTestCase(APITestCase):
+    def setUp(self):
+        self.login_url = reverse('login_view')
+        self.credentials = {'email': 'hasher@example.com', 'password': 'Testpass@123'}
+        self.user = User.objects.create_user(username='hasher', **self.credentials)
+
+    def test_new_passwords_use_scrypt(self):
+        self.assertTrue(self.user.password.startswith('scrypt$16384$'))
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password(self.credentials['password'], hasher='pbkdf2_sha256'))
+        response = self.client.post(self.login_url, self.credentials)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+
+    @override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** 12)
+    def test_cost_change_rehashes_on_login(self):
+        self.client.post(self.login_url, self.credentials)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$4096$'))
+
+    def test_full_pool_answers_503(self):
+        pool, release = hashers.HashingPool(workers=1, queue_size=0), threading.Event()
+        worker = threading.Thread(target=pool.run, args=(release.wait,))
+        worker.start()
+        try:
+            while not pool.stats()['active']:
+                pass
+            with mock.patch.object(hashers, '_pool', pool):
+                response = self.client.post(self.login_url, self.credentials)
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(pool.stats()['rejected'], 1)
+        self.assertEqual(pool.stats()['completed'], 1)
+
+
 class UserProfileViewsTestCase(AuthTestCase):
     def setUp(self):
         super().setUp()
+        self.use_temporary_media()
         self.profile_url = reverse('user_profile_view')
         self.update_url = reverse('user_profile_update_view')
 
@@ -93,12 +159,22 @@ class UserProfileViewsTestCase(AuthTestCase):
         self.assertIn('error', response.data)
 
     def test_update_profile_duplicate_email(self):
-        other_user = User.objects.create_user(username='other', email='other@example.com', password='Testpass@123')
+        other_user = create_user('other')
         payload = {'email': 'other@example.com'}
         response = self.client.patch(self.update_url, payload)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('error', response.data)
 
+    def test_profile_conditional_get(self):
+        etag = self.client.get(self.profile_url)['ETag']
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(self.update_url, {'username': 'renamed'})
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['username'], 'renamed')
+
     def test_profile_unauthenticated(self):
         self.client.credentials()
         response = self.client.get(self.profile_url)
@@ -107,8 +183,8 @@ class UserProfileViewsTestCase(AuthTestCase):
 
 class FarmerViewsTestCase(APITestCase):
     def setUp(self):
-        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='Testpass@123', role='admin')
-        self.farmer = User.objects.create_user(username='farmer1', email='farmer1@example.com', password='Testpass@123', role='farmer')
+        self.admin = create_user('admin', role='admin')
+        self.farmer = create_user('farmer1')
         self.accessToken = str(RefreshToken.for_user(self.admin).access_token)
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.accessToken}')
         self.list_url = reverse('farmer_list_create_view')
@@ -119,6 +195,44 @@ class FarmerViewsTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(any(f['username'] == self.farmer.username for f in response.data))
 
+    def test_list_farmers_paginated(self):
+        for i in range(3):
+            create_user(f'farmer{i + 2}')
+        first = self.client.get(self.list_url, {'page_size': 2})
+        self.assertEqual(len(first.data['results']), 2)
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        self.assertEqual(len(second.data['results']), 2)
+        self.assertIsNone(second.data['next'])
+        usernames = [f['username'] for f in first.data['results'] + second.data['results']]
+        self.assertEqual(len(set(usernames)), 4)
+
+    def test_list_matches_user_serializer(self):
+        User.objects.filter(pk=self.farmer.pk).update(profile_icon='ProfileIcons/abc.png', profile_icon_variants=[64])
+        create_user('farmer2', role='farmer', profile_icon='')
+        response = self.client.get(self.list_url)
+
+        farmers = User.objects.filter(role=User.Role.FARMER).order_by('-created')
+        expected = UserSerializer(farmers, many=True, context={'request': response.wsgi_request}).data
+        self.assertEqual(response.json(), json.loads(JSONRenderer().render(expected)))
+        self.assertTrue(response.json()[1]['profile_icon'].startswith('http://testserver/media/'))
+        self.assertEqual(list(response.json()[1]['profile_icon_thumbnails']), ['64'])
+
+    def test_search_farmers(self):
+        create_user('otieno', email='wanjiru@example.com')
+        usernames = lambda params: sorted(farmer['username'] for farmer in self.client.get(self.list_url, params).data)
+        self.assertEqual(usernames({'search': 'wanjiru'}), ['otieno'])
+        self.assertEqual(usernames({'search': 'OTI', 'search_mode': 'prefix'}), ['otieno'])
+        self.assertEqual(usernames({'search': 'farmer1@'}), ['farmer1'])
+        self.assertEqual(self.client.get(self.list_url, {'search': 'ot'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_farmers(self):
+        response = self.client.get(reverse('farmer_export_view'), {'output': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn('"username":"farmer1"', lines[0])
+
     def test_create_farmer_success(self):
         payload = {'username': 'newfarmer', 'email': 'newfarmer@example.com', 'password': 'Testpass@123'}
         response = self.client.post(self.list_url, payload)
@@ -150,9 +264,76 @@ class FarmerViewsTestCase(APITestCase):
         self.assertFalse(User.objects.filter(id=self.farmer.id).exists())
 
 
+class FarmerDirectoryTestCase(APITestCase):
+    def setUp(self):
+        self.admin = create_user('admin', role='admin')
+        self.farmers = [
+            create_user(f'farmer{i}')
+            for i in range(4)
+        ]
+        Crop.objects.create(farmer=self.farmers[0], name='Maize', crop_type='cereal', quantity=10)
+        Crop.objects.create(farmer=self.farmers[0], name='Beans', crop_type='legume', quantity=5)
+        Crop.objects.create(farmer=self.farmers[1], name='Rice', crop_type='cereal', quantity=40)
+        Crop.objects.create(farmer=self.farmers[2], name='Kale', crop_type='vegetable', quantity=15)
+        self.list_url = reverse('farmer_list_create_view')
+        self.authenticate(self.admin)
+
+    def test_tampered_cursor(self):
+        for ordering, values in (('-total_quantity', ['abc', 1]), ('-total_quantity', [1.5, 1]), ('-created', ['2024-13-45T00:00:00', 1]), ('-created', [None, None])):
+            token = base64.urlsafe_b64encode(json.dumps({'v': values}).encode()).decode()
+            with self.subTest(ordering=ordering, values=values):
+                response = self.client.get(self.list_url, {'include': 'totals', 'ordering': ordering, 'cursor': token})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_includes_totals(self):
+        response = self.client.get(self.list_url, {'include': 'totals'})
+        farmers = {farmer['username']: farmer for farmer in response.data}
+        self.assertEqual(farmers['farmer0']['total_quantity'], 15)
+        self.assertEqual(farmers['farmer0']['crop_count'], 2)
+        self.assertEqual(farmers['farmer0']['last_harvest'], timezone.localdate().isoformat())
+        self.assertEqual(farmers['farmer0']['crops_by_type'], {
+            'cereal': {'total_quantity': 10, 'crop_count': 1}, 'legume': {'total_quantity': 5, 'crop_count': 1},
+        })
+        self.assertEqual(
+            (farmers['farmer3']['total_quantity'], farmers['farmer3']['last_harvest'], farmers['farmer3']['crops_by_type']),
+            (0, None, {}),
+        )
+        self.assertNotIn('total_quantity', self.client.get(self.list_url).data[0])
+
+    def test_sorted_by_total_and_paginated(self):
+        seen = []
+        response = self.client.get(self.list_url, {'ordering': '-total_quantity', 'page_size': 3})
+        while True:
+            seen += [(farmer['username'], farmer['total_quantity']) for farmer in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, [('farmer1', 40), ('farmer2', 15), ('farmer0', 15), ('farmer3', 0)])
+
+        response = self.client.get(self.list_url, {'ordering': 'crop_count', 'include': 'totals'})
+        self.assertEqual([farmer['crop_count'] for farmer in response.data], [0, 1, 1, 2])
+
+    def test_totals_follow_crop_writes(self):
+        self.client.get(self.list_url, {'include': 'totals'})
+        Crop.objects.filter(farmer=self.farmers[1]).delete()
+        farmers = {farmer['username']: farmer for farmer in self.client.get(self.list_url, {'include': 'totals'}).data}
+        self.assertEqual((farmers['farmer1']['total_quantity'], farmers['farmer1']['last_harvest']), (0, None))
+
+    def test_detail_includes_totals(self):
+        url = reverse('farmer_detail_view', kwargs={'pk': self.farmers[0].id})
+        response = self.client.get(url, {'include': 'totals'})
+        self.assertEqual((response.data['total_quantity'], response.data['crop_count']), (15, 2))
+        self.assertEqual(set(response.data['crops_by_type']), {'cereal', 'legume'})
+        self.assertNotIn('crops_by_type', self.client.get(url).data)
+
+    def test_invalid_ordering(self):
+        response = self.client.get(self.list_url, {'ordering': 'password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class LogoutViewTestCase(APITestCase):
     def setUp(self):
-        self.user = User.objects.create_user(username='user', email='user@example.com', password='Testpass@123')
+        self.user = create_user('user')
         self.logout_url = reverse('logout_view')
         self.refresh_token = str(RefreshToken.for_user(self.user))
         self.client.cookies['refreshToken'] = self.refresh_token
@@ -163,14 +344,401 @@ class LogoutViewTestCase(APITestCase):
         self.assertEqual(response.data['message'], 'Successfully logged out!')
         self.assertEqual(response.cookies['refreshToken'].value, '')
 
+    def test_logout_revokes_refresh_and_access_tokens(self):
+        access = str(RefreshToken.for_user(self.user).access_token)
+        other_access = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.client.post(self.logout_url)
+
+        response = self.client.post(reverse('token_refresh'), {'refresh': self.refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(reverse('user_profile_view')).status_code, status.HTTP_401_UNAUTHORIZED)
+        # Other sessions of the same user are unaffected.
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {other_access}')
+        self.assertEqual(self.client.get(reverse('user_profile_view')).status_code, status.HTTP_200_OK)
+
+
+@override_settings(REVOCATION_SYNC_INTERVAL=0)
+class RevocationListTestCase(APITestCase):
+    def setUp(self):
+        self.user = create_user('user')
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        values = [f'jti-{i}' for i in range(1000)]
+        for value in values:
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in values))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_revocations_reach_other_workers(self):
+        worker, other_worker = RevocationList(), RevocationList()
+        token = RefreshToken.for_user(self.user)
+        other_worker.sync(force=True)
+        self.assertFalse(other_worker.is_revoked(token['jti']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            worker.revoke(token)
+        self.assertTrue(worker.is_revoked(token['jti']))
+        self.assertTrue(other_worker.is_revoked(token['jti']))
+        self.assertEqual(other_worker.stats['syncs'], 1)
+
+    def test_expired_revocations_are_pruned(self):
+        cache.delete(PRUNE_KEY)
+        RevokedToken.objects.create(jti='expired', expires_at=timezone.now() - timedelta(minutes=1))
+        RevokedToken.objects.create(jti='live', expires_at=timezone.now() + timedelta(minutes=1))
+        worker = RevocationList()
+        worker.sync(force=True)
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+        self.assertFalse(worker.is_revoked('expired'))
+        self.assertTrue(worker.is_revoked('live'))
+
 
 class TokenRefreshTestCase(APITestCase):
     def setUp(self):
-        self.user = User.objects.create_user(username='user2', email='user2@example.com', password='Testpass@123')
+        self.user = create_user('user2')
         self.refresh_url = reverse('token_refresh')
         self.refresh_token = str(RefreshToken.for_user(self.user))
 
     def test_token_refresh_success(self):
         response = self.client.post(self.refresh_url, {'refresh': self.refresh_token})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('access', response.data)
\ No newline at end of file
+        self.assertIn('access', response.data)
+
+    def test_refresh_after_demotion_carries_the_current_role(self):
+        cache.clear()
+        admin = create_user('boss', role='admin')
+        login = self.client.post(reverse('login_view'), {'email': 'boss@example.com', 'password': 'Testpass@123'})
+        refresh = login.data['refresh']
+        admin.role = 'farmer'
+        admin.save()
+
+        response = self.client.post(self.refresh_url, {'refresh': refresh})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'farmer')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.client.get(reverse('admin_crop_stats_view')).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(reverse('farmer_list_create_view')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_refresh_is_refused_for_inactive_users(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.post(self.refresh_url, {'refresh': self.refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class ClaimsAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        # Claims are only trusted with a cache every worker shares.
+        self.use_shared_cache()
+        cache.clear()
+        user_cache.clear()
+        self.auth = ClaimsJWTAuthentication()
+        self.user = create_user('farmer1')
+
+    def token(self, issued_later=True):
+        token = AccessToken.for_user(self.user)
+        token['role'] = self.user.role
+        if issued_later:
+            # Logged in after the account was created rather than in the same second.
+            token['iat'] += 1
+        return token
+
+    def test_current_role_claim_needs_no_query(self):
+        with self.assertNumQueries(0):
+            user = self.auth.get_user(self.token())
+            self.assertEqual((user.id, user.role), (self.user.id, 'farmer'))
+            self.assertTrue(user.is_authenticated)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.username, 'farmer1')
+
+    def test_rows_come_from_the_user_cache(self):
+        token = self.token(issued_later=False)
+        with self.assertNumQueries(1):
+            self.auth.get_user(token)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.auth.get_user(token).username, 'farmer1')
+
+    def test_role_change_overrides_older_claims(self):
+        token = self.token(issued_later=False)
+        self.user.role = User.Role.ADMIN
+        self.user.save()
+        self.assertEqual(self.auth.get_user(token).role, 'admin')
+
+    def demote_elsewhere(self, token, other_worker):
+        # Another worker demotes the admin and stamps the change in its own cache connection.
+        User.objects.filter(pk=self.user.pk).update(role=User.Role.FARMER)
+        other_worker.set(_version_key(self.user.pk), (token['iat'] + 1) * 10 ** 9, timeout=None)
+
+    def test_versions_stamped_by_other_workers_apply(self):
+        self.user.role = User.Role.ADMIN
+        token = self.token()
+        self.assertEqual(self.auth.get_user(token).role, 'admin')
+        self.demote_elsewhere(token, caches.create_connection('default'))
+        self.assertEqual(self.auth.get_user(token).role, 'farmer')
+
+    def test_process_local_caches_always_load_the_row(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'this-worker'}}):
+            self.user.role = User.Role.ADMIN
+            User.objects.filter(pk=self.user.pk).update(role=User.Role.ADMIN)
+            token = self.token()
+            with self.assertNumQueries(1):
+                self.assertEqual(self.auth.get_user(token).role, 'admin')
+            # The other worker's stamp never reaches this process's cache.
+            self.demote_elsewhere(token, LocMemCache('other-worker', {}))
+            self.assertEqual(self.auth.get_user(token).role, 'farmer')
+
+    def test_deactivated_and_deleted_users_are_rejected(self):
+        token = self.token(issued_later=False)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(token)
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(token)
+
+
+class ProfileIconPipelineTestCase(APITransactionTestCase):
+    def setUp(self):
+        self.use_temporary_media()
+        self.user = create_user('farmer1')
+        self.other = create_user('farmer2')
+
+    def upload(self, user, image):
+        self.authenticate(user)
+        return self.client.patch(reverse('user_profile_update_view'), {'profileIcon': image}, format='multipart')
+
+    def test_identical_uploads_share_files_and_get_thumbnails(self):
+        first = self.upload(self.user, generate_test_image('one.png'))
+        second = self.upload(self.other, generate_test_image('two.png'))
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data['profile_icon'], second.data['profile_icon'])
+
+        worker.run_pending()
+        self.user.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.user.profile_icon_variants, [64, 128, 256])
+        self.assertEqual(self.other.profile_icon_variants, [64, 128, 256])
+
+        thumbnails = UserSerializer(self.user).data['profile_icon_thumbnails']
+        self.assertEqual(set(thumbnails), {'64', '128', '256'})
+        self.assertEqual(set(thumbnails['64']), {'png', 'webp'})
+        with default_storage.open(images.variant_name(self.user.profile_icon.name, 64, 'webp')) as thumbnail:
+            self.assertEqual(Image.open(thumbnail).size, (64, 64))
+
+        # The same image again is complete at once.
+        self.upload(self.user, generate_test_image('three.png'))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_icon_variants, [64, 128, 256])
+
+    def image_as_png(self, fmt):
+        buf = io.BytesIO()
+        Image.new('RGB', (20, 20), color=(10, 20, 30)).save(buf, format=fmt)
+        return SimpleUploadedFile('icon.png', buf.getvalue(), content_type='image/png')
+
+    def test_signup_rejects_icons_that_cannot_be_stored(self):
+        uploads = [self.image_as_png('GIF'), self.image_as_png('WEBP')]
+        with override_settings(PROFILE_ICON_MAX_BYTES=100):
+            uploads.append(generate_test_image('large.png'))
+            for number, upload in enumerate(uploads):
+                response = self.client.post(reverse('signup_view'), {
+                    'username': f'icon{number}', 'email': f'icon{number}@example.com', 'password': 'Testpass@123', 'profile_icon': upload,
+                }, format='multipart')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('profile_icon', response.data)
+        self.assertFalse(User.objects.filter(username__startswith='icon').exists())
+
+    def test_oversized_images_are_rejected_before_decoding(self):
+        upload = generate_test_image('large.png')
+        with override_settings(PROFILE_ICON_MAX_PIXELS=99 * 99), mock.patch.object(Image.Image, 'load', side_effect=AssertionError('decoded')):
+            response = self.upload(self.user, upload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pixels', str(response.data))
+
+    def test_admin_farmer_create_rejects_icons_that_cannot_be_stored(self):
+        admin = create_user('admin1', role='admin')
+        self.authenticate(admin)
+        response = self.client.post(reverse('farmer_list_create_view'), {
+            'username': 'gif', 'email': 'gif@example.com', 'password': 'Testpass@123', 'profile_icon': self.image_as_png('GIF'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('profile_icon', response.data)
+
+    def test_rejected_update_stores_no_icon(self):
+        self.authenticate(self.user)
+        response = self.client.patch(reverse('user_profile_update_view'), {
+            'profileIcon': generate_test_image('one.png'), 'email': self.other.email,
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(default_storage.exists(images.UPLOAD_DIR) and default_storage.listdir(images.UPLOAD_DIR)[1])
+
+    def test_invalid_upload_is_rejected(self):
+        response = self.upload(self.user, SimpleUploadedFile('fake.png', b'not an image', content_type='image/png'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_icon.name, 'profileIcon.png')
+
+
+HASHED = 'ProfileIcons/' + 'ab' * 32 + '_64.webp'
+
+
+class MediaServingTestCase(SimpleTestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media, MEDIA_ACCEL_REDIRECT=''))
+        os.makedirs(os.path.join(media, 'ProfileIcons'))
+        for name in (HASHED, 'profileIcon.png'):
+            with open(os.path.join(media, name), 'wb') as handle:
+                handle.write(bytes(range(100)))
+
+    def test_content_hashed_files_are_immutable(self):
+        response = self.client.get(f'/media/{HASHED}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(100)))
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        plain = self.client.get('/media/profileIcon.png')
+        self.assertNotIn('immutable', plain['Cache-Control'])
+
+    def test_conditional_request(self):
+        etag = self.client.get(f'/media/{HASHED}')['ETag']
+        response = self.client.get(f'/media/{HASHED}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(f'/media/{HASHED}', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+
+        suffix = self.client.get(f'/media/{HASHED}', HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(suffix.streaming_content), bytes(range(95, 100)))
+
+        self.assertEqual(self.client.get(f'/media/{HASHED}', HTTP_RANGE='bytes=200-').status_code, 416)
+        stale = self.client.get(f'/media/{HASHED}', HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_missing_and_escaping_paths(self):
+        self.assertEqual(self.client.get('/media/ProfileIcons/missing.png').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+    def test_accel_redirect(self):
+        with override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/'):
+            response = self.client.get(f'/media/{HASHED}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{HASHED}')
+        self.assertEqual(response.content, b'')
+
+
+BUCKETS = {'user': (1, 5), 'ip': (1, 50), 'auth': (0.1, 2)}
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle-tests'}})
+class TakeTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_then_refill(self):
+        for _ in range(3):
+            self.assertEqual(throttling.take('bucket', 1, rate=1, burst=3, now=100), 0)
+        self.assertAlmostEqual(throttling.take('bucket', 1, rate=1, burst=3, now=100), 1.0)
+        # Half a second refills half a token: one more is still 0.5s away.
+        self.assertAlmostEqual(throttling.take('bucket', 1, rate=1, burst=3, now=100.5), 0.5)
+        self.assertEqual(throttling.take('bucket', 1, rate=1, burst=3, now=101), 0)
+
+    def test_refused_requests_take_no_tokens(self):
+        self.assertEqual(throttling.take('bucket', 3, rate=1, burst=3, now=100), 0)
+        for _ in range(5):
+            self.assertAlmostEqual(throttling.take('bucket', 2, rate=1, burst=3, now=100), 2.0)
+        self.assertEqual(throttling.take('bucket', 2, rate=1, burst=3, now=102), 0)
+
+    def test_idle_bucket_is_full_again(self):
+        throttling.take('bucket', 3, rate=1, burst=3, now=100)
+        for _ in range(3):
+            self.assertEqual(throttling.take('bucket', 1, rate=1, burst=3, now=200), 0)
+        self.assertGreater(throttling.take('bucket', 1, rate=1, burst=3, now=200), 0)
+
+    def test_cost_above_burst_is_capped(self):
+        self.assertEqual(throttling.take('bucket', 50, rate=1, burst=3, now=100), 0)
+        self.assertAlmostEqual(throttling.take('bucket', 1, rate=1, burst=3, now=100), 1.0)
+
+
+@override_settings(PASSWORD_HASHERS=[MD5], THROTTLE_ENABLED=True, THROTTLE_BUCKETS=BUCKETS, METRICS_TOKEN='scrape-secret')
+class ThrottleTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin', role='admin')
+        cls.farmer = create_user('farmer')
+
+    def setUp(self):
+        cache.clear()
+        metrics.db_latency.reset()
+        self.addCleanup(metrics.db_latency.reset)
+
+    def test_user_bucket_refuses_with_retry_after(self):
+        self.authenticate(self.farmer)
+        for _ in range(5):
+            self.assertEqual(self.client.get(reverse('farmer_crop_stats_view')).status_code, 200)
+        response = self.client.get(reverse('farmer_crop_stats_view'))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+        # Buckets are per user.
+        self.authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('farmer_list_create_view'), {'page_size': 10}).status_code, 200)
+
+    def test_expensive_requests_cost_more(self):
+        self.authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('admin_crop_stats_view')).status_code, 200)
+        response = self.client.get(reverse('admin_crop_stats_view'))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '5')
+
+    def test_auth_scope_is_per_ip(self):
+        url = reverse('login_view')
+        payload = {'email': 'farmer@example.com', 'password': 'wrong'}
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, payload).status_code, 401)
+        self.assertEqual(self.client.post(url, payload).status_code, 429)
+        self.assertEqual(self.client.post(url, payload, REMOTE_ADDR='10.0.0.2').status_code, 401)
+
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        url = reverse('login_view')
+        payload = {'email': 'farmer@example.com', 'password': 'wrong'}
+        codes = [self.client.post(url, payload, HTTP_X_FORWARDED_FOR=f'203.0.113.{i}').status_code for i in range(5)]
+        self.assertEqual(codes, [401, 401, 429, 429, 429])
+
+    def test_forwarded_for_is_trusted_behind_proxies(self):
+        url = reverse('login_view')
+        payload = {'email': 'farmer@example.com', 'password': 'wrong'}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            codes = [self.client.post(url, payload, HTTP_X_FORWARDED_FOR=f'203.0.113.{i}').status_code for i in range(3)]
+        self.assertEqual(codes, [401, 401, 401])
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_disabled(self):
+        self.authenticate(self.farmer)
+        for _ in range(10):
+            self.assertEqual(self.client.get(reverse('farmer_crop_stats_view')).status_code, 200)
+
+    def test_expensive_requests_are_shed_while_the_database_is_slow(self):
+        self.authenticate(self.admin)
+        metrics.db_latency.observe(5.0)
+        with override_settings(THROTTLE_BUCKETS={**BUCKETS, 'user': (1, 100)}):
+            response = self.client.get(reverse('admin_crop_stats_view'))
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '5')
+            # Cheap requests still go through.
+            self.assertEqual(self.client.get(reverse('farmer_list_create_view'), {'page_size': 10}).status_code, 200)
+
+    def test_refusals_are_exported(self):
+        self.authenticate(self.farmer)
+        for _ in range(6):
+            self.client.get(reverse('farmer_crop_stats_view'))
+        self.client.credentials()
+        body = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret').content.decode()
+        self.assertRegex(body, r'throttled_requests_total\{[^}]*reason="rate_limited"[^}]*\} [1-9]')
+        self.assertIn('db_query_seconds_average_max', body)
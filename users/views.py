@@ -1,19 +1,30 @@
+from core import streaming
+from core.search import SearchFilter
+from core.caching import cached_response, conditional
+from core.asyncviews import AsyncAPIView, AsyncListMixin
+from core.readserializers import CompiledListMixin
 from django.db import transaction  
 from users.permissions import IsAdmin
-from .serializers import UserSerializer
+from . import images
+from crops import directory
+from .serializers import UserSerializer, profile_icon_thumbnails, user_list_serializer
+from .serializers import FarmerTotalsSerializer, user_totals_list_serializer
 from rest_framework.views import APIView
 from .serializers import RegisterSerializer
 from rest_framework import generics, status
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from rest_framework.permissions import AllowAny
-from rest_framework.renderers import JSONRenderer
+from core.renderers import FastJSONRenderer
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from .revocation import revocations
 
 User = get_user_model()
 
@@ -36,6 +47,38 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_scope = 'auth'
+
+
+class RevocationAwareTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuses refresh tokens revoked at logout or belonging to inactive or deleted
+    users. The new access token carries the user's current role rather than
+    the one copied from the refresh token: its fresh ``iat`` makes
+    ClaimsJWTAuthentication trust that claim without loading the row.
+    """
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if revocations.is_revoked(refresh[api_settings.JTI_CLAIM]):
+            raise TokenError('Token has been revoked')
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        refresh['role'] = user.role
+        access = refresh.access_token
+        data = {'access': str(access)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = RevocationAwareTokenRefreshSerializer
+    throttle_scope = 'auth'
 
 
 class SignupView(generics.CreateAPIView):
@@ -46,6 +89,7 @@ class SignupView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [AllowAny]
     serializer_class = RegisterSerializer
+    throttle_scope = 'auth'
 
     @transaction.atomic
     def create(self, request, *args, **kwargs):
@@ -82,6 +126,10 @@ class UserProfileView(generics.RetrieveAPIView):
     def get_object(self):
         return self.request.user
 
+    @conditional('users')
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 class UserProfileUpdateView(APIView):
     """
@@ -92,6 +140,7 @@ class UserProfileUpdateView(APIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @transaction.atomic
     def patch(self, request):
         user = request.user
         data = request.data
@@ -107,12 +156,19 @@ class UserProfileUpdateView(APIView):
             if User.objects.filter(email=email).exclude(id=user.id).exists():
                 return Response({'error': 'Email already taken'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Stored only once everything else is valid, so a rejected update leaves no file behind.
+        profile_icon = request.FILES.get('profileIcon')
+        if profile_icon:
+            try:
+                icon, variants = images.store_profile_icon(profile_icon)
+            except ValidationError as exc:
+                return Response({'error': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+
         user.username = username
         user.email = email
  
-        profile_icon = request.FILES.get('profileIcon')
         if profile_icon:
-            user.profile_icon = profile_icon
+            user.profile_icon, user.profile_icon_variants = icon, variants
         user.save()
 
         return Response({
@@ -120,17 +176,68 @@ class UserProfileUpdateView(APIView):
             'username': user.username,
             'email': user.email,
             'role': user.role,
-            'profile_icon': user.profile_icon.url if user.profile_icon else None
+            'profile_icon': user.profile_icon.url if user.profile_icon else None,
+            'profile_icon_thumbnails': profile_icon_thumbnails(user)
         }, status=status.HTTP_200_OK)
     
 
-class FarmerListCreateView(generics.ListCreateAPIView):
+class FarmerTotalsMixin:
+    """
+    ?include=totals adds each farmer's total quantity, crop count, last harvest
+    date and per-type breakdown, read from the maintained crop totals.
+    """
+    @property
+    def include_totals(self):
+        return self.request.query_params.get('include') == 'totals'
+
+    def farmers(self):
+        farmers = User.objects.filter(role=User.Role.FARMER)
+        return directory.with_totals(farmers) if self.include_totals else farmers
+
+
+class FarmerListCreateView(FarmerTotalsMixin, CompiledListMixin, generics.ListCreateAPIView):
     """
     List all farmers or create a new farmer (Admin only). 
+    ?search= matches username or email (substring, or prefix with ?search_mode=prefix).
+    ?include=totals adds crop totals; ?ordering= sorts by created, total_quantity or
+    crop_count (prefix - for descending), and sorting by a total includes the totals.
     """
-    queryset = User.objects.filter(role=User.Role.FARMER).order_by('-created')
     serializer_class = UserSerializer
+    read_serializer = user_list_serializer
     permission_classes = [IsAuthenticated, IsAdmin]
+    filter_backends = [SearchFilter]
+    search_fields = ['username', 'email']
+
+    def get_throttle_cost(self, request):
+        params = request.query_params
+        unpaginated = 'page_size' not in params and 'cursor' not in params
+        return 5 if request.method == 'GET' and unpaginated else 1
+
+    @property
+    def keyset_ordering(self):
+        return directory.ordering(self.request.query_params.get('ordering')) or ('-created', '-id')
+
+    @property
+    def include_totals(self):
+        return super().include_totals or self.keyset_ordering[0].lstrip('-') in directory.TOTALS
+
+    def get_queryset(self):
+        return self.farmers().order_by(*self.keyset_ordering)
+
+    def get_read_serializer(self):
+        return user_totals_list_serializer if self.include_totals else self.read_serializer
+
+    def get_read_context(self, rows):
+        context = super().get_read_context(rows)
+        if self.include_totals:
+            context['crops_by_type'] = directory.breakdowns([row['id'] for row in rows])
+        return context
+
+    # Crop writes change the totals, so they invalidate the list as well.
+    @conditional('users', 'crops', shared_by_role=True)
+    @cached_response('users', 'crops', shared_by_role=True)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
         """
@@ -146,25 +253,68 @@ class FarmerListCreateView(generics.ListCreateAPIView):
         return Response(UserSerializer(farmer).data, status=status.HTTP_201_CREATED)
 
 
-class FarmerDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AsyncFarmerListCreateView(AsyncListMixin, AsyncAPIView, FarmerListCreateView):
+    """
+    FarmerListCreateView for ASGI: the farmer list is read on a worker thread;
+    creating a farmer runs the sync handler the same way.
+    """
+    @conditional('users', 'crops', shared_by_role=True)
+    @cached_response('users', 'crops', shared_by_role=True)
+    async def get(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+
+class FarmerDetailView(FarmerTotalsMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a specific farmer (Admin only).
+    ?include=totals adds the farmer's crop totals.
     """
-    queryset = User.objects.filter(role=User.Role.FARMER)
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
 
+    def get_queryset(self):
+        return self.farmers()
+
+    def get_serializer_class(self):
+        return FarmerTotalsSerializer if self.include_totals else UserSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.include_totals and 'pk' in self.kwargs:
+            context['crops_by_type'] = directory.breakdowns([self.kwargs['pk']])
+        return context
+
+
+class FarmerExportView(APIView):
+    """
+    Streams all farmers as CSV (default) or NDJSON with ?output=ndjson.
+    Filters: created_after, created_before
+    Access: Admin only
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+    throttle_cost = 20
+    columns = ['id', 'username', 'email', 'role', 'created']
+
+    def get(self, request):
+        output = streaming.export_format(request)
+        queryset = (
+            User.objects.filter(role=User.Role.FARMER, **streaming.parse_created_range(request))
+            .order_by('id')
+            .values_list(*self.columns)
+        )
+        return streaming.stream_export(queryset, self.columns, output, 'farmers')
+
 
 class LogoutView(APIView):
     """
     Logs out a user by:
-    - Blacklisting the refresh token (if present)
+    - Revoking the refresh token cookie and the access token sent with the request (if present)
     - Clearing the refresh token cookie
     Access: Public (anyone can call)
     Method: POST only
     """
     permission_classes = [AllowAny] 
-    renderer_classes = [JSONRenderer]
+    renderer_classes = [FastJSONRenderer]
     http_method_names = ["post"]
 
     def post(self, request):
@@ -172,10 +322,11 @@ class LogoutView(APIView):
 
         if refresh_token:
             try:
-                token = RefreshToken(refresh_token)
-                token.blacklist()
-            except Exception:
-                pass  # token already invalid/blacklisted
+                revocations.revoke(RefreshToken(refresh_token))
+            except TokenError:
+                pass  # expired or invalid: nothing left to revoke
+        if request.auth is not None:
+            revocations.revoke(request.auth)
 
         # Always clear the cookie, even if token invalid
         response = Response({"message": "Successfully logged out!"}, status=status.HTTP_200_OK)